@@ -1,17 +1,52 @@
-from flask import Flask, render_template, request, jsonify, send_file
-import plotly.graph_objects as go
-import plotly.utils
+from flask import Flask, Response, render_template, request, jsonify, send_file, stream_with_context
 import json
+import hashlib
 import os
-from f1_realistic_simulation import F1RealisticSimulation
-import io
-import base64
-import matplotlib
-matplotlib.use('Agg')  # Use non-interactive backend
-import matplotlib.pyplot as plt
+import uuid
+from dataclasses import asdict
+from datetime import datetime, timezone
+from f1_realistic_simulation import F1RealisticSimulation, WeatherCondition
+from f1_engines import DEFAULT_BACKEND, available_backends
+from f1_exports import MIMETYPES, export_filename, export_stream
+from f1_live import LiveSimulator, RaceState
+from f1_result_store import ResultStore
+from f1_scenarios import Scenario, run_scenarios
+from f1_scheduler import Overloaded, Scheduler
+from f1_singleflight import SingleFlight
+from f1_warmup import STANDARD_COUNTS, ForecastCache, Warmup
 
 app = Flask(__name__)
 f1_sim = F1RealisticSimulation()
+result_store = None  # Run history database, opened on first use so importing app creates no file
+forecast_cache = ForecastCache()
+simulation_flights = SingleFlight()  # Identical concurrent requests share one run
+# F1_SIMULATION_SLOTS: simulations run at once; the rest queue by priority
+scheduler = Scheduler(slots=int(os.environ.get('F1_SIMULATION_SLOTS', 0)) or None)
+warmup = None
+metadata_cache = None  # (json body, etag, last modified), built on first request
+live_simulators = {}  # Track name -> LiveSimulator, kept between in-race updates
+live_builds = SingleFlight()  # Concurrent first updates for a track build its simulator once
+
+# F1_WARMUP: off, background (serve while warming) or blocking (warm essentials before serving)
+WARMUP_MODE = os.environ.get('F1_WARMUP', 'off')
+WARMUP_COUNTS = [int(count) for count in os.environ.get('F1_WARMUP_COUNTS', '').split(',') if count] or STANDARD_COUNTS
+# F1_ENSEMBLE_DIR: keep every run's full ensemble there, so it can be downloaded later
+ENSEMBLE_DIR = os.environ.get('F1_ENSEMBLE_DIR')
+
+def get_result_store():
+    global result_store
+    if result_store is None:
+        result_store = ResultStore()
+    return result_store
+
+def start_warmup(mode=WARMUP_MODE):
+    """Precompute every track's forecasts with a worker pool"""
+    global warmup
+    if mode == 'off' or warmup is not None:
+        return
+    warmup = Warmup(f1_sim, forecast_cache, counts=WARMUP_COUNTS, backend=DEFAULT_BACKEND).start()
+    if mode == 'blocking':
+        warmup.wait_until_ready()
 
 @app.route('/')
 def index():
@@ -20,18 +55,141 @@ def index():
     drivers = list(f1_sim.drivers.keys())
     teams = list(set([driver.team for driver in f1_sim.drivers.values()]))
     
-    return render_template('index.html', tracks=tracks, drivers=drivers, teams=teams)
+    return render_template('index.html', tracks=tracks, drivers=drivers, teams=teams,
+                           backends=available_backends(), default_backend=DEFAULT_BACKEND)
+
+@app.route('/backends')
+def backends():
+    """List the simulation backends a request can choose from"""
+    return jsonify({
+        'default': DEFAULT_BACKEND,
+        'backends': {name: capabilities.to_dict() for name, capabilities in available_backends().items()}
+    })
+
+def client_id():
+    """Who a request's compute is charged to: the remote address
+
+    Not a client-supplied header, which a client could change on every request to get a fresh budget.
+    """
+    return request.remote_addr or 'local'
+
+def run_requested_simulation(data, client='local'):
+    """Run the simulation described by a request body on the backend it asks for
+    
+    Unseeded requests are answered from the forecast cache when a warm result exists.
+    A 'weather_forecast' (condition -> probability, or true for the track default)
+    samples the weather per simulation instead of fixing it; 'variance_reduction'
+    lists f1_variance methods, 'importance_target' names a driver whose
+    long-shot odds to importance-sample and 'qmc' samples qualifying
+    quasi-randomly. Identical requests arriving while one is running wait for
+    it and share its result.
+    
+    New work goes through the scheduler, charged to the client: under load or
+    past a budget the simulation count is reduced, or an unseeded request is
+    answered with the largest cached forecast for its track; Overloaded is
+    raised when neither is possible. 'priority' is 'interactive' (default) or
+    'batch', which waits behind interactive work.
+    """
+    track_name = data.get('track', 'Silverstone')
+    if track_name not in f1_sim.tracks:
+        raise ValueError(f"Unknown track '{track_name}'")
+    num_simulations = int(data.get('simulations', 5000))
+    priority = data.get('priority', 'interactive')
+    seed = data.get('seed')
+    seed = int(seed) if seed is not None else None
+    backend = data.get('backend') or DEFAULT_BACKEND
+    weather = WeatherCondition(data['weather']) if data.get('weather') else None
+    weather_forecast = data.get('weather_forecast')
+    options = {'weather_forecast': weather_forecast} if weather_forecast else {}
+    if data.get('variance_reduction'):
+        options['variance_reduction'] = data['variance_reduction']
+    if data.get('importance_target'):
+        options['importance_target'] = data['importance_target']
+    if data.get('qmc'):
+        options['qmc'] = True
+    
+    cache_key = None
+    if seed is None and not options:
+        cache_key = forecast_cache.key(f1_sim, track_name, num_simulations, weather, backend)
+        cached = forecast_cache.get(cache_key)
+        if cached is not None:
+            if cached.get('run_id') is None:
+                # Warm-up forecasts are stored on first use so they can be downloaded by id
+                cached['run_id'] = get_result_store().save(cached)
+            return {**cached, 'cached': True}
+    
+    model = f1_sim
+    if weather is not None and weather != f1_sim.tracks[track_name].weather:
+        model = f1_sim.with_weather(track_name, weather)
+    
+    def simulate(num_simulations, cache_key):
+        store_path = None
+        # Importance-weighted ensembles are not stored, since their races do not count equally
+        if ENSEMBLE_DIR and 'importance_target' not in options:
+            os.makedirs(ENSEMBLE_DIR, exist_ok=True)
+            store_path = os.path.join(ENSEMBLE_DIR, f'{track_name.lower().replace(" ", "_")}-{uuid.uuid4().hex}.f1e')
+        results = model.run_monte_carlo_simulation(
+            track_name, num_simulations,
+            backend=backend,
+            seed=seed,
+            store_path=store_path,
+            **options
+        )
+        results['weather'] = 'forecast' if weather_forecast else model.tracks[track_name].weather.value
+        results['run_id'] = get_result_store().save(results)
+        if cache_key is not None:
+            forecast_cache.put(cache_key, results)
+        return results
+    
+    def admit_and_run():
+        fallback = forecast_cache.nearest(cache_key) if cache_key is not None else None
+        admission = scheduler.admit(client, track_name, num_simulations, backend,
+                                    cached_available=fallback is not None)
+        if admission.action == 'serve_cached':
+            if fallback.get('run_id') is None:
+                fallback['run_id'] = get_result_store().save(fallback)
+            return {**fallback, 'cached': True, 'admission': admission.to_dict()}
+        admitted_key = cache_key
+        if admission.num_simulations != num_simulations and cache_key is not None:
+            admitted_key = forecast_cache.key(f1_sim, track_name, admission.num_simulations, weather, backend)
+        results = scheduler.run(client, admission, lambda: simulate(admission.num_simulations, admitted_key),
+                                priority, backend=backend, track=track_name)
+        return {**results, 'cached': False, 'admission': admission.to_dict()}
+    
+    # Unseeded requests are interchangeable on the same backend; seeded ones also need the same seed.
+    # The key holds the requested count, so requests that admission would cut differently still meet.
+    seed_policy = ('random',) if seed is None else ('seed', seed)
+    flight_key = (track_name, model.tracks[track_name].weather.value, json.dumps(options, sort_keys=True),
+                  num_simulations, model.model_hash(), seed_policy, backend)
+    # Only the request that starts a run is admitted and charged; those that join it wait for free
+    results, coalesced = simulation_flights.do(flight_key, admit_and_run)
+    return {**results, 'coalesced': coalesced}
+
+@app.route('/ready')
+def ready():
+    """Readiness probe: 503 until the common forecasts are warm"""
+    status = warmup.status.to_dict() if warmup is not None else {'ready': True, 'running': False}
+    return jsonify(status), 200 if status['ready'] else 503
+
+@app.route('/warmup_status')
+def warmup_status():
+    """Progress of the forecast warm-up"""
+    status = warmup.status.to_dict() if warmup is not None else {'ready': True, 'running': False}
+    return jsonify({'mode': WARMUP_MODE, 'cached_forecasts': len(forecast_cache), **status})
+
+@app.route('/load')
+def load():
+    """Simulation work in flight, the scheduler queue and how many requests joined an existing run"""
+    return jsonify({'simulations': simulation_flights.stats(), 'scheduler': scheduler.stats()})
 
 @app.route('/run_simulation', methods=['POST'])
 def run_simulation():
     """Run Monte Carlo simulation and return results"""
     try:
         data = request.get_json()
-        track_name = data.get('track', 'Silverstone')
-        num_simulations = int(data.get('simulations', 5000))
         
         # Run simulation
-        results = f1_sim.run_monte_carlo_simulation(track_name, num_simulations)
+        results = run_requested_simulation(data, client_id())
         
         # Generate summary
         summary = f1_sim.get_prediction_summary(results)
@@ -42,6 +200,15 @@ def run_simulation():
         return jsonify({
             'success': True,
             'summary': summary,
+            'run_id': results.get('run_id'),
+            'cached': results['cached'],
+            'coalesced': results.get('coalesced', False),
+            'backend': results['backend'],
+            'weather_breakdown': results.get('weather_breakdown'),
+            'admission': results.get('admission'),
+            'variance_reduction': results.get('variance_reduction'),
+            'importance_sampling': results.get('importance_sampling'),
+            'qmc': results.get('qmc'),
             'charts': charts,
             'results': {
                 'win_probabilities': results['win_probabilities'],
@@ -50,6 +217,84 @@ def run_simulation():
             }
         })
     
+    except Overloaded as e:
+        return overloaded_response(e)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        })
+
+def overloaded_response(error):
+    response = jsonify({'success': False, 'error': str(error), 'retry_after': round(error.retry_after)})
+    response.headers['Retry-After'] = str(max(1, round(error.retry_after)))
+    return response, 429
+
+@app.route('/run_scenarios', methods=['POST'])
+def run_what_if_scenarios():
+    """Evaluate a list of driver/car override sets against the baseline in one batched run"""
+    try:
+        data = request.get_json()
+        scenarios = [Scenario.parse(scenario, f'scenario {i + 1}')
+                     for i, scenario in enumerate(data.get('scenarios', []))]
+        options = {'weather_forecast': data['weather_forecast']} if data.get('weather_forecast') else {}
+        seed = data.get('seed')
+        track_name = data.get('track', 'Silverstone')
+        num_simulations = int(data.get('simulations', 2000))
+        # The baseline and every scenario are simulated in one batch on the NumPy engine
+        copies = len(scenarios) + 1
+        client = client_id()
+        admission = scheduler.admit(client, track_name, copies * num_simulations, 'numpy')
+        admission.num_simulations -= admission.num_simulations % copies
+        results = scheduler.run(client, admission, lambda: run_scenarios(
+            f1_sim, track_name, scenarios,
+            num_simulations=admission.num_simulations // copies,
+            seed=int(seed) if seed is not None else None,
+            **options
+        ), data.get('priority', 'interactive'), backend='numpy', track=track_name)
+        return jsonify({'success': True, **results, 'admission': admission.to_dict()})
+    
+    except Overloaded as e:
+        return overloaded_response(e)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        })
+
+def live_simulator(track_name):
+    """The track's LiveSimulator, built and calibrated once however many first updates arrive together"""
+    def build():
+        if track_name not in live_simulators:
+            live_simulators[track_name] = LiveSimulator(f1_sim, track_name)
+        return live_simulators[track_name]
+    return live_simulators.get(track_name) or live_builds.do(track_name, build)[0]
+
+@app.route('/live_update', methods=['POST'])
+def live_update():
+    """Odds from a race underway: simulate the remaining laps from the posted race state"""
+    try:
+        data = request.get_json()
+        track_name = data.get('track', 'Silverstone')
+        if track_name not in f1_sim.tracks:
+            raise ValueError(f"Unknown track '{track_name}'. Available tracks: {', '.join(f1_sim.tracks)}")
+        live = live_simulator(track_name)
+        state = RaceState.parse(data['state'])
+        num_simulations = data.get('simulations')
+        num_simulations = int(num_simulations) if num_simulations is not None else live.default_simulations(state)
+        seed = data.get('seed')
+        # Live updates share the compute budgets and queue with every other simulation
+        client = client_id()
+        admission = scheduler.admit(client, track_name, num_simulations, 'live')
+        results = scheduler.run(client, admission, lambda: live.update(
+            state,
+            num_simulations=admission.num_simulations,
+            seed=int(seed) if seed is not None else None
+        ), data.get('priority', 'interactive'), backend='live', track=track_name)
+        return jsonify({'success': True, **results, 'admission': admission.to_dict()})
+    
+    except Overloaded as e:
+        return overloaded_response(e)
     except Exception as e:
         return jsonify({
             'success': False,
@@ -58,6 +303,10 @@ def run_simulation():
 
 def create_interactive_charts(results):
     """Create interactive Plotly charts"""
+    # Plotly is only needed once a result is charted, so it stays out of startup
+    import plotly.graph_objects as go
+    import plotly.utils
+    
     charts = {}
     
     # Win probabilities chart
@@ -144,6 +393,75 @@ def create_interactive_charts(results):
     
     return charts
 
+@app.route('/runs')
+def list_runs():
+    """Stored runs, newest first, filtered by track, model_hash, seed and since/until dates"""
+    args = request.args
+    runs = get_result_store().find(
+        track=args.get('track'),
+        model_hash=args.get('model_hash'),
+        seed=args.get('seed', type=int),
+        since=args.get('since'),
+        until=args.get('until'),
+        limit=args.get('limit', 50, type=int)
+    )
+    return jsonify({'runs': runs})
+
+@app.route('/runs/<int:run_id>')
+def get_run(run_id):
+    """A stored run with its probabilities, summary and charts, without resimulating"""
+    results = get_result_store().get(run_id)
+    if results is None:
+        return jsonify({'error': 'Run not found'}), 404
+    
+    return jsonify({
+        'success': True,
+        'run': results,
+        'summary': f1_sim.get_prediction_summary(results),
+        'charts': create_interactive_charts(results)
+    })
+
+@app.route('/runs/compare')
+def compare_runs():
+    """Compare stored runs, e.g. /runs/compare?ids=12,15"""
+    try:
+        run_ids = [int(run_id) for run_id in request.args.get('ids', '').split(',') if run_id]
+        if len(run_ids) < 2:
+            return jsonify({'error': 'Pass at least two run ids, e.g. ?ids=1,2'}), 400
+        return jsonify(get_result_store().compare(run_ids))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 404
+
+def build_metadata():
+    """Every driver (with their car's headline figures), car and track, serialised once"""
+    drivers = [{**asdict(driver), 'reliability': f1_sim.cars[driver.team].reliability,
+                'car_upgrade_factor': f1_sim.cars[driver.team].car_upgrade_factor}
+               for driver in f1_sim.drivers.values()]
+    tracks = {name: {**asdict(track), 'name': name, 'weather': track.weather.value}
+              for name, track in f1_sim.tracks.items()}
+    body = json.dumps({
+        'model_hash': f1_sim.model_hash(),
+        'drivers': drivers,
+        'cars': {team: asdict(car) for team, car in f1_sim.cars.items()},
+        'tracks': tracks
+    }, separators=(',', ':'))
+    etag = hashlib.sha256(body.encode()).hexdigest()[:32]
+    return body, etag, datetime.now(timezone.utc).replace(microsecond=0)
+
+@app.route('/metadata')
+def metadata():
+    """All drivers, cars and tracks in one cached response; revalidates with ETag/Last-Modified"""
+    global metadata_cache
+    if metadata_cache is None:
+        metadata_cache = build_metadata()
+    body, etag, last_modified = metadata_cache
+    
+    response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.no_cache = True  # Browsers revalidate and get a 304 while unchanged
+    return response.make_conditional(request)
+
 @app.route('/driver_stats/<driver_name>')
 def driver_stats(driver_name):
     """Get detailed statistics for a specific driver"""
@@ -190,33 +508,47 @@ def track_info(track_name):
     
     return jsonify(info)
 
-@app.route('/download_results', methods=['POST'])
-def download_results():
-    """Download simulation results as JSON"""
+def download_run(run_id, fmt='json', content='summary', compress=False):
+    """Stream a stored run as a file download, chunk by chunk"""
+    results = get_result_store().get(run_id)
+    if results is None:
+        return jsonify({'success': False, 'error': 'Run not found'}), 404
     try:
-        data = request.get_json()
-        track_name = data.get('track', 'Silverstone')
-        num_simulations = int(data.get('simulations', 5000))
-        
-        # Run simulation
-        results = f1_sim.run_monte_carlo_simulation(track_name, num_simulations)
-        
-        # Create JSON file
-        output = io.StringIO()
-        json.dump(results, output, indent=2, default=str)
-        output.seek(0)
-        
-        return jsonify({
-            'success': True,
-            'data': output.getvalue(),
-            'filename': f'f1_simulation_{track_name.lower()}.json'
-        })
+        stream = export_stream(results, fmt, content, compress)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except (LookupError, FileNotFoundError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 404
     
-    except Exception as e:
-        return jsonify({
-            'success': False,
-            'error': str(e)
-        })
+    filename = export_filename(results, fmt, content, compress)
+    return Response(stream_with_context(stream),
+                    mimetype='application/gzip' if compress else MIMETYPES[fmt],
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+@app.route('/runs/<int:run_id>/download')
+def download_stored_run(run_id):
+    """Download a stored run, e.g. /runs/12/download?format=csv&content=ensemble&gzip=1
+    
+    format: json, csv or binary (the ensemble file); content: summary or ensemble.
+    """
+    args = request.args
+    return download_run(run_id, args.get('format', 'json'), args.get('content', 'summary'),
+                        args.get('gzip', '0').lower() in ('1', 'true', 'yes'))
+
+@app.route('/download_results', methods=['POST'])
+def download_results():
+    """Download a completed run by run_id, with the same options as /runs/<id>/download"""
+    data = request.get_json() or {}
+    if data.get('run_id') is None:
+        return jsonify({'success': False, 'error': 'Pass the run_id of a completed simulation'}), 400
+    return download_run(int(data['run_id']), data.get('format', 'json'), data.get('content', 'summary'),
+                        bool(data.get('gzip', False)))
+
+if __name__ != '__main__':
+    start_warmup()  # Imported by a WSGI server
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=8080) 
\ No newline at end of file
+    debug = True
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_warmup()  # Skip the debug reloader's watcher process
+    app.run(debug=debug, host='0.0.0.0', port=8080) 
\ No newline at end of file
@@ -4,7 +4,7 @@ F1 Monte Carlo Simulation Demo
 Quick demonstration of the simulation capabilities
 """
 
-from f1_simulation import F1MonteCarloSimulation
+from f1_realistic_simulation import F1RealisticSimulation
 import time
 
 def main():
@@ -12,10 +12,10 @@ def main():
     print("=" * 50)
     
     # Create simulation instance
-    f1_sim = F1MonteCarloSimulation()
+    f1_sim = F1RealisticSimulation()
     
     # Demo tracks
-    tracks = ["Monaco", "Silverstone", "Spa"]
+    tracks = ["Monaco", "Great Britain", "Belgium"]
     
     for track in tracks:
         print(f"\n🏁 Simulating {track} Grand Prix...")
@@ -46,6 +46,7 @@ def main():
     
     print("\n🎯 Demo completed! Run 'python app.py' to use the web interface.")
     print("📊 For more detailed analysis, increase the number of simulations.")
+    print("🗂️  For batch runs with JSON/CSV output, see 'python f1_batch.py --help'.")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
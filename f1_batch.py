@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""Batch runner: simulate many tracks x counts x seeds in parallel and write JSON, CSV or Parquet
+
+    python f1_batch.py --tracks Monaco Spain --simulations 5000 20000 --seeds 1 2 3 \\
+        --backend numpy --workers 4 --output forecasts.csv --profile
+"""
+import argparse
+import csv
+import importlib.util
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from f1_engines import DEFAULT_BACKEND, MODELS, PhaseTimer, available_backends, get_backend, load_model
+from f1_importance import importance_report
+from f1_qmc import qmc_report
+from f1_variance import VARIANCE_METHODS, apply_variance_reduction, parse_methods
+
+FORMATS = ("json", "csv", "parquet")
+PARQUET_ENGINES = ("pyarrow", "fastparquet")  # Either lets pandas write parquet
+
+# Driver-level columns of the CSV/Parquet output, one row per run and driver
+RUN_COLUMNS = ("model", "model_hash", "track", "num_simulations", "seed", "backend", "timestamp")
+DRIVER_COLUMNS = ("driver", "win", "podium", "points")
+
+@dataclass
+class BatchJob:
+    model: str
+    track: str
+    num_simulations: int
+    seed: Optional[int]
+    backend: str
+    options: Dict
+    variance_reduction: Tuple[str, ...] = ()  # f1_variance methods
+
+_models = {}  # Loaded once per worker process
+
+def run_job(job: BatchJob, backend_config: Optional[Dict] = None) -> Dict:
+    """One simulation run as a results dict without race_results, plus its phase timings"""
+    timer = PhaseTimer()
+    if job.model not in _models:
+        _models[job.model] = load_model(job.model)
+    model = _models[job.model]
+    timer.lap("load_model")
+
+    backend = get_backend(job.backend, **(backend_config or {}))
+    run_options = {**job.options, "antithetic": True} if "antithetic" in job.variance_reduction else job.options
+    ensemble = model.run_ensemble(job.track, job.num_simulations, backend, job.seed, **run_options)
+    timer.lap("simulate")
+    # Break the run down into the backend's own phases
+    timer.seconds.pop("simulate")
+    timer.add(backend.timings)
+    results = model.summarise_ensemble(job.track, ensemble, job.backend, job.seed)
+    results.pop("race_results")
+    timer.lap("summarise")
+    if job.variance_reduction:
+        apply_variance_reduction(model, job.track, ensemble, results, job.variance_reduction, job.seed,
+                                 **job.options)
+        timer.lap("variance")
+    if job.options.get("importance_target") is not None:
+        results["importance_sampling"] = importance_report(ensemble, job.options["importance_target"])
+    if ensemble.replicate is not None:
+        results["qmc"] = qmc_report(ensemble)
+
+    results["model"] = job.model
+    results["timings"] = timer.seconds
+    return results
+
+def run_batch(jobs: Sequence[BatchJob], workers: int = 1) -> List[Dict]:
+    """Run jobs on a process pool, returning results in job order
+
+    The multiprocess backend already uses a pool per run, so its jobs run one
+    after another with the workers handed to the backend instead.
+    """
+    if workers <= 1 or len(jobs) <= 1 or any(job.backend == "multiprocess" for job in jobs):
+        config = {"workers": workers} if any(job.backend == "multiprocess" for job in jobs) else {}
+        return [run_job(job, config if job.backend == "multiprocess" else None) for job in jobs]
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+        return list(pool.map(run_job, jobs))
+
+def driver_rows(runs: Sequence[Dict]) -> List[Dict]:
+    """Flatten runs to one row per run and driver"""
+    return [{**{column: run.get(column) for column in RUN_COLUMNS},
+             "driver": driver, "win": win, "podium": run["podium_probabilities"][driver],
+             "points": run["points_probabilities"][driver]}
+            for run in runs for driver, win in run["win_probabilities"].items()]
+
+def write_results(runs: Sequence[Dict], output, fmt: str, profile: bool = False):
+    """Write runs to a path, or '-' for stdout (json and csv only)"""
+    if fmt == "parquet":
+        import pandas as pd
+        if output == "-":
+            raise ValueError("Parquet output needs a file path")
+        pd.DataFrame(driver_rows(runs), columns=RUN_COLUMNS + DRIVER_COLUMNS).to_parquet(output, index=False)
+        return
+
+    stream = sys.stdout if output == "-" else open(output, "w", newline="")
+    try:
+        if fmt == "json":
+            runs = runs if profile else [{key: value for key, value in run.items() if key != "timings"}
+                                         for run in runs]
+            json.dump({"runs": list(runs)}, stream, indent=2, default=str)
+            stream.write("\n")
+        else:
+            writer = csv.DictWriter(stream, fieldnames=RUN_COLUMNS + DRIVER_COLUMNS)
+            writer.writeheader()
+            writer.writerows(driver_rows(runs))
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+
+def format_profile(runs: Sequence[Dict], total_seconds: float) -> str:
+    """Per-run phase timings and totals, for stderr"""
+    phases = []
+    for run in runs:
+        phases.extend(phase for phase in run["timings"] if phase not in phases)
+    header = f"{'track':<16}{'sims':>9}{'seed':>8}" + "".join(f"{phase:>12}" for phase in phases)
+    lines = ["Phase timings (seconds)", header]
+    for run in runs:
+        lines.append(f"{run['track']:<16}{run['num_simulations']:>9}{str(run['seed']):>8}"
+                     + "".join(f"{run['timings'].get(phase, 0.0):>12.3f}" for phase in phases))
+    totals = {phase: sum(run["timings"].get(phase, 0.0) for run in runs) for phase in phases}
+    lines.append(f"{'total':<33}" + "".join(f"{totals[phase]:>12.3f}" for phase in phases))
+    lines.append(f"Batch wall time: {total_seconds:.3f}s over {len(runs)} runs")
+    return "\n".join(lines)
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run F1 Monte Carlo forecasts in batch")
+    parser.add_argument("--model", choices=MODELS, default="realistic")
+    parser.add_argument("--tracks", nargs="+", default=None, help="Tracks to simulate (default: all)")
+    parser.add_argument("--simulations", nargs="+", type=int, default=[10000], help="Simulation counts")
+    parser.add_argument("--seeds", nargs="+", type=int, default=None, help="Seeds (default: one unseeded run)")
+    parser.add_argument("--backend", choices=list(available_backends()), default=DEFAULT_BACKEND)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Parallel processes")
+    parser.add_argument("--weather-forecast", default=None,
+                        help="'default' or JSON like '{\"dry\": 0.7, \"light_rain\": 0.3}' (NumPy backends)")
+    parser.add_argument("--planned-tires", action="store_true", help="Use precomputed stint plans")
+    parser.add_argument("--importance-target", default=None,
+                        help="Driver whose long-shot odds to estimate by importance sampling (NumPy backends)")
+    parser.add_argument("--qmc", action="store_true",
+                        help="Quasi-random (scrambled Sobol) qualifying draws with error estimates (NumPy backends)")
+    parser.add_argument("--variance-reduction", default=None,
+                        help=f"Comma-separated methods: {', '.join(VARIANCE_METHODS)}")
+    parser.add_argument("--output", "-o", default="-", help="Output path, '-' for stdout")
+    parser.add_argument("--format", choices=FORMATS, default=None,
+                        help="Output format (default: from the output suffix, else json)")
+    parser.add_argument("--profile", action="store_true", help="Print per-phase timings to stderr")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or os.path.splitext(args.output)[1].lstrip(".").lower()
+    if fmt not in FORMATS:
+        fmt = "json"
+    if any(count <= 0 for count in args.simulations):
+        parser.error("--simulations must be positive")
+    # Check before simulating, so a missing engine does not throw the batch away
+    if fmt == "parquet" and args.output == "-":
+        parser.error("Parquet output needs a file path")
+    if fmt == "parquet" and not any(importlib.util.find_spec(engine) for engine in PARQUET_ENGINES):
+        parser.error(f"Parquet output needs one of {', '.join(PARQUET_ENGINES)} (pip install pyarrow)")
+
+    tracks = args.tracks or list(load_model(args.model).tracks)
+    options = {}
+    if args.planned_tires:
+        options["planned_tires"] = True
+    if args.importance_target:
+        options["importance_target"] = args.importance_target
+    if args.qmc:
+        options["qmc"] = True
+
+    start = time.perf_counter()
+    try:
+        if args.weather_forecast:
+            options["weather_forecast"] = (True if args.weather_forecast == "default"
+                                           else json.loads(args.weather_forecast))
+        methods = parse_methods(args.variance_reduction)
+        jobs = [BatchJob(args.model, track, count, seed, args.backend, options, methods)
+                for track in tracks for count in args.simulations for seed in (args.seeds or [None])]
+        runs = run_batch(jobs, args.workers)
+        write_start = time.perf_counter()
+        write_results(runs, args.output, fmt, args.profile)
+    except (ValueError, ImportError) as e:
+        parser.error(str(e))
+    if args.profile:
+        end = time.perf_counter()
+        print(format_profile(runs, end - start), file=sys.stderr)
+        print(f"Output written in {end - write_start:.3f}s", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,4 @@
 import requests
-import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import json
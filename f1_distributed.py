@@ -0,0 +1,562 @@
+#!/usr/bin/env python3
+"""Distributed runs: a coordinator splits jobs into seeded shards and workers on any number of nodes simulate them
+
+    python f1_distributed.py coordinator --queue tcp://0.0.0.0:5555 --simulations 1000000 --seeds 1 \\
+        --scenarios scenarios.json --output nightly.json
+    python f1_distributed.py worker --queue tcp://coordinator-host:5555
+
+Shards have fixed sizes and seeds spawned from the job's seed, exactly as in
+the multiprocess backend, and the coordinator adds their position counts in
+shard order. The merged counts are therefore identical however many workers
+took part, and equal to a multiprocess run of the same job (weighted
+importance-sampling counts to rounding, as that backend sums the weights in
+another order). A shard whose worker does not answer within the shard
+timeout is handed out again.
+"""
+import argparse
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from multiprocessing import Process
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from f1_engines import MODELS, NumpyBackend, load_model
+from f1_shared import shard_sizes
+from f1_vectorized import probabilities_from_counts
+
+SHARD_SIZE = 25000  # Same as the multiprocess backend, so distributed counts match its runs
+SHARD_TIMEOUT = 600.0  # Seconds a worker may hold a shard without a result before it is handed out again
+MAX_ATTEMPTS = 3  # Hand-outs of one shard before the run fails
+POLL_INTERVAL = 0.5  # Seconds a coordinator or idle worker waits on the queue per call
+
+class WorkQueue(ABC):
+    """Transport between the coordinator and workers: shard tasks one way, shard results the other
+
+    Tasks and results are JSON-serialisable dicts with an "id" and an
+    "attempt". A taken task is leased for lease seconds: if no result for it
+    arrives in time, the queue hands it out again with the next attempt
+    number, and after max_attempts it reports an error result instead. A
+    worker that was only slow may still answer, so the coordinator ignores
+    duplicate results.
+    """
+
+    def __init__(self, lease: float = SHARD_TIMEOUT, max_attempts: int = MAX_ATTEMPTS):
+        self.lease = lease
+        self.max_attempts = max_attempts
+
+    @abstractmethod
+    def put(self, task: Dict):
+        """Queue a task (coordinator)"""
+
+    @abstractmethod
+    def take(self, timeout: float) -> Optional[Dict]:
+        """Next task, or None if none arrived within timeout (worker)"""
+
+    @abstractmethod
+    def finish(self, result: Dict):
+        """Hand back a task's result (worker)"""
+
+    @abstractmethod
+    def collect(self, timeout: float) -> List[Dict]:
+        """Results handed back so far, waiting up to timeout for the first (coordinator)"""
+
+    def close(self):
+        pass
+
+    def _lease_expired(self, task: Dict):
+        """Hand out a task whose worker went quiet again, or fail it after max_attempts hand-outs"""
+        if task["attempt"] + 1 >= self.max_attempts:
+            self.finish({"id": task["id"], "attempt": task["attempt"], "worker": None,
+                         "error": f"no result after {self.max_attempts} attempts"})
+        else:
+            self.put({**task, "attempt": task["attempt"] + 1})
+
+class MemoryQueue(WorkQueue):
+    """Thread-safe in-process queue; also the store behind TCPQueueServer"""
+
+    def __init__(self, lease: float = SHARD_TIMEOUT, max_attempts: int = MAX_ATTEMPTS):
+        super().__init__(lease, max_attempts)
+        self._tasks = deque()
+        self._leases = {}  # "id.attempt" -> (task, expiry)
+        self._results = []
+        self._changed = threading.Condition()
+
+    def _expire(self):
+        now = time.monotonic()
+        for key, (task, expiry) in list(self._leases.items()):
+            if expiry < now:
+                del self._leases[key]
+                self._lease_expired(task)
+
+    def put(self, task):
+        with self._changed:
+            self._tasks.append(task)
+            self._changed.notify_all()
+
+    def take(self, timeout):
+        with self._changed:
+            self._expire()
+            self._changed.wait_for(lambda: self._tasks, timeout)
+            if not self._tasks:
+                return None
+            task = self._tasks.popleft()
+            self._leases[f"{task['id']}.{task['attempt']}"] = (task, time.monotonic() + self.lease)
+            return task
+
+    def finish(self, result):
+        with self._changed:
+            self._leases.pop(f"{result['id']}.{result['attempt']}", None)
+            self._results.append(result)
+            self._changed.notify_all()
+
+    def collect(self, timeout):
+        with self._changed:
+            self._expire()
+            self._changed.wait_for(lambda: self._results, timeout)
+            results, self._results = self._results, []
+            return results
+
+class FileQueue(WorkQueue):
+    """Queue in a directory, e.g. on a filesystem every node mounts
+
+    Tasks are files in tasks/; a worker claims one by renaming it into
+    taken/, which only one worker can do, and the file's modification time
+    starts the lease. Results are written to results/ under a temporary name
+    and renamed into place, so readers never see a partial file. Leases are
+    checked against the nodes' clocks, which should roughly agree.
+    """
+
+    def __init__(self, directory: str, lease: float = SHARD_TIMEOUT, max_attempts: int = MAX_ATTEMPTS):
+        super().__init__(lease, max_attempts)
+        self.directory = directory
+        for sub in ("tasks", "taken", "results"):
+            os.makedirs(os.path.join(directory, sub), exist_ok=True)
+
+    def _path(self, sub: str, name: str) -> str:
+        return os.path.join(self.directory, sub, name)
+
+    def _write(self, sub: str, name: str, payload: Dict):
+        temporary = self._path(sub, f".{name}.{uuid.uuid4().hex}.tmp")
+        with open(temporary, "w") as f:
+            json.dump(payload, f)
+        os.replace(temporary, self._path(sub, name))
+
+    def _ready(self, sub: str) -> List[str]:
+        return sorted(name for name in os.listdir(os.path.join(self.directory, sub)) if name.endswith(".json"))
+
+    def _claim(self, source: str, target: str) -> Optional[Dict]:
+        """Move a file only this caller may process and read it; None if someone else got there first"""
+        try:
+            os.rename(source, target)
+        except FileNotFoundError:
+            return None
+        with open(target) as f:
+            return json.load(f)
+
+    def _expire(self):
+        cutoff = time.time() - self.lease
+        for name in self._ready("taken"):
+            path = self._path("taken", name)
+            try:
+                if os.path.getmtime(path) >= cutoff:
+                    continue
+            except FileNotFoundError:
+                continue
+            expired = self._path("taken", f".{name}.{uuid.uuid4().hex}.expired")
+            task = self._claim(path, expired)
+            if task is not None:
+                os.remove(expired)
+                self._lease_expired(task)
+
+    def put(self, task):
+        self._write("tasks", f"{task['id']}.{task['attempt']}.json", task)
+
+    def take(self, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            self._expire()
+            for name in self._ready("tasks"):
+                taken = self._path("taken", name)
+                task = self._claim(self._path("tasks", name), taken)
+                if task is not None:
+                    os.utime(taken)  # Start the lease
+                    return task
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(min(POLL_INTERVAL, max(0.0, deadline - time.monotonic())))
+
+    def finish(self, result):
+        name = f"{result['id']}.{result['attempt']}"
+        self._write("results", f"{name}.{uuid.uuid4().hex[:8]}.json", result)
+        try:
+            os.remove(self._path("taken", f"{name}.json"))
+        except FileNotFoundError:
+            pass
+
+    def collect(self, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            self._expire()
+            results = []
+            for name in self._ready("results"):
+                result = self._claim(self._path("results", name), self._path("results", f".{name}.read"))
+                if result is not None:
+                    os.remove(self._path("results", f".{name}.read"))
+                    results.append(result)
+            if results or time.monotonic() >= deadline:
+                return results
+            time.sleep(min(POLL_INTERVAL, max(0.0, deadline - time.monotonic())))
+
+class _QueueHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        queue = self.server.queue
+        try:
+            self._serve(queue)
+        except ConnectionError:
+            pass  # Worker went away; its lease expires
+
+    def _serve(self, queue: MemoryQueue):
+        for line in self.rfile:
+            request = json.loads(line)
+            op = request["op"]
+            if op == "put":
+                reply = queue.put(request["task"])
+            elif op == "take":
+                reply = queue.take(request["timeout"])
+            elif op == "finish":
+                reply = queue.finish(request["result"])
+            elif op == "collect":
+                reply = queue.collect(request["timeout"])
+            else:
+                reply = {"error": f"Unknown operation '{op}'"}
+            self.wfile.write(json.dumps({"reply": reply}).encode() + b"\n")
+
+class _ThreadingServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+class TCPQueueServer:
+    """Serves a MemoryQueue to TCPQueue clients; the coordinator uses .queue directly
+
+    Messages are newline-delimited JSON, never pickles, but there is no
+    authentication: bind to a trusted network.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, lease: float = SHARD_TIMEOUT,
+                 max_attempts: int = MAX_ATTEMPTS):
+        self.queue = MemoryQueue(lease, max_attempts)
+        self._server = _ThreadingServer((host, port), _QueueHandler)
+        self._server.queue = self.queue
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    @property
+    def address(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"tcp://{host}:{port}"
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "TCPQueueServer":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class TCPQueue(WorkQueue):
+    """Client of a TCPQueueServer, reconnecting if the connection drops; leases are kept by the server"""
+
+    def __init__(self, host: str, port: int):
+        super().__init__()
+        self.host = host
+        self.port = port
+        self._stream = None
+
+    def _call(self, **request):
+        for attempt in range(2):
+            try:
+                if self._stream is None:
+                    self._stream = socket.create_connection((self.host, self.port)).makefile("rwb")
+                self._stream.write(json.dumps(request).encode() + b"\n")
+                self._stream.flush()
+                line = self._stream.readline()
+                if not line:
+                    raise ConnectionError("Queue server closed the connection")
+                return json.loads(line)["reply"]
+            except OSError:
+                self.close()
+                if attempt:
+                    raise
+
+    def put(self, task):
+        self._call(op="put", task=task)
+
+    def take(self, timeout):
+        return self._call(op="take", timeout=timeout)
+
+    def finish(self, result):
+        self._call(op="finish", result=result)
+
+    def collect(self, timeout):
+        return self._call(op="collect", timeout=timeout)
+
+    def close(self):
+        if self._stream is not None:
+            try:
+                self._stream.close()
+            except OSError:
+                pass
+            self._stream = None
+
+def open_queue(url: str, lease: float = SHARD_TIMEOUT) -> WorkQueue:
+    """Queue client for 'tcp://host:port', or a FileQueue for 'file:///path' or a plain directory path"""
+    if url.startswith("tcp://"):
+        host, _, port = url[len("tcp://"):].rpartition(":")
+        return TCPQueue(host, int(port))
+    return FileQueue(url[len("file://"):] if url.startswith("file://") else url, lease)
+
+@dataclass
+class DistributedJob:
+    model: str
+    track: str
+    num_simulations: int
+    seed: Optional[int] = None
+    options: Dict = field(default_factory=dict)  # NumPy backend race options
+    scenario: Optional[Dict] = None  # f1_scenarios.Scenario as a dict, realistic model only
+
+def _job_model(name: str, scenario: Optional[Dict]):
+    model = load_model(name)
+    if scenario is not None:
+        if name != "realistic":
+            raise ValueError("Scenarios need the realistic model")
+        from f1_scenarios import Scenario, apply_scenario
+        model = apply_scenario(model, Scenario.parse(scenario))
+    return model
+
+def shard_tasks(job: DistributedJob, job_id: str, model_hash: str, shard_size: int = SHARD_SIZE) -> List[Dict]:
+    """A job's shard tasks, with seeds spawned from the job's seed as the multiprocess backend does"""
+    sizes = shard_sizes(job.num_simulations, shard_size)
+    seeds = np.random.SeedSequence(job.seed).spawn(len(sizes))
+    return [{"id": f"{job_id}-{shard}", "job": job_id, "shard": shard, "attempt": 0,
+             "model": job.model, "model_hash": model_hash, "scenario": job.scenario, "track": job.track,
+             "num_simulations": size, "entropy": seed.entropy, "spawn_key": list(seed.spawn_key),
+             "options": job.options}
+            for shard, (size, seed) in enumerate(zip(sizes, seeds))]
+
+_models = {}  # Loaded once per worker process and scenario
+
+def run_shard(task: Dict, worker: str = "") -> Dict:
+    """Simulate one shard and return its position counts"""
+    key = (task["model"], json.dumps(task["scenario"], sort_keys=True))
+    if key not in _models:
+        _models[key] = _job_model(task["model"], task["scenario"])
+    model = _models[key]
+    if model.model_hash() != task["model_hash"]:
+        raise ValueError(f"Model '{task['model']}' differs from the coordinator's (hash {model.model_hash()} "
+                         f"vs {task['model_hash']})")
+    seed = np.random.SeedSequence(task["entropy"], spawn_key=tuple(task["spawn_key"]))
+    backend = NumpyBackend()
+    ensemble = backend.run(model, task["track"], task["num_simulations"], seed, **task["options"])
+    return {"id": task["id"], "attempt": task["attempt"], "worker": worker,
+            "counts": ensemble.position_counts().tolist(), "timings": backend.timings}
+
+def run_worker(queue: WorkQueue, idle_timeout: Optional[float] = None, max_tasks: Optional[int] = None) -> int:
+    """Take and simulate shards until idle for idle_timeout seconds (None: forever); returns shards done
+
+    A shard that raises is reported back with its error instead of counts.
+    """
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    done = 0
+    idle_since = time.monotonic()
+    while max_tasks is None or done < max_tasks:
+        try:
+            task = queue.take(POLL_INTERVAL)
+        except OSError:
+            task = None  # Coordinator not up yet, or gone
+            time.sleep(POLL_INTERVAL)
+        if task is None:
+            if idle_timeout is not None and time.monotonic() - idle_since > idle_timeout:
+                break
+            continue
+        try:
+            result = run_shard(task, worker)
+        except Exception as e:
+            result = {"id": task["id"], "attempt": task["attempt"], "worker": worker, "error": str(e)}
+        queue.finish(result)
+        done += 1
+        idle_since = time.monotonic()
+    return done
+
+class Coordinator:
+    """Queues every job's shards and merges their counts as the results come in
+
+    Lost shards are handed out again by the queue's leases. Shards are
+    matched to jobs by a per-run prefix, so leftovers from an earlier run on
+    the same queue are ignored.
+    """
+
+    def __init__(self, queue: WorkQueue, shard_size: int = SHARD_SIZE):
+        self.queue = queue
+        self.shard_size = shard_size
+
+    def run(self, jobs: Sequence[DistributedJob]) -> List[Dict]:
+        """Results dicts in job order: probabilities, merged position counts and a distributed report"""
+        run_id = uuid.uuid4().hex[:8]
+        models, tasks = [], {}
+        for index, job in enumerate(jobs):
+            model = _job_model(job.model, job.scenario)
+            if job.track not in model.tracks:
+                raise ValueError(f"Unknown track '{job.track}'. Available: {', '.join(model.tracks)}")
+            NumpyBackend().check_options(job.options)
+            if job.seed is None:
+                # Fix the entropy now, so a retried shard repeats the original draws
+                job = DistributedJob(job.model, job.track, job.num_simulations,
+                                     np.random.SeedSequence().entropy, job.options, job.scenario)
+            models.append((model, job))
+            for task in shard_tasks(job, f"{run_id}-{index}", model.model_hash(), self.shard_size):
+                tasks[task["id"]] = task
+
+        for task in tasks.values():
+            self.queue.put(task)
+        counts = {}
+        workers = {task["job"]: set() for task in tasks.values()}
+        retries = dict.fromkeys(workers, 0)
+        while len(counts) < len(tasks):
+            for result in self.queue.collect(POLL_INTERVAL):
+                if result["id"] not in tasks or result["id"] in counts:
+                    continue  # Another run's shard, or a slow worker answering a shard that was handed out again
+                if "error" in result:
+                    raise RuntimeError(f"Shard {result['id']} failed on {result['worker']}: {result['error']}")
+                job_id = tasks[result["id"]]["job"]
+                counts[result["id"]] = np.array(result["counts"])
+                workers[job_id].add(result["worker"])
+                retries[job_id] += result["attempt"]
+
+        runs = []
+        for index, (model, job) in enumerate(models):
+            names = model.driver_names
+            job_id = f"{run_id}-{index}"
+            shards = [counts[task_id] for task_id, task in tasks.items() if task["job"] == job_id]
+            merged = shards[0].copy()
+            for shard in shards[1:]:
+                merged += shard  # Always in shard order, so weighted (float) counts add up identically
+            runs.append({
+                "track": job.track,
+                "num_simulations": job.num_simulations,
+                "timestamp": datetime.now().isoformat(),
+                "model": job.model,
+                "model_hash": model.model_hash(),
+                "backend": "distributed",
+                "seed": jobs[index].seed,
+                "scenario": job.scenario["name"] if job.scenario else None,
+                **probabilities_from_counts(merged, names, job.num_simulations),
+                "position_counts": dict(zip(names, merged.tolist())),
+                "distributed": {"shards": len(shards), "shard_size": self.shard_size,
+                                "seed_entropy": job.seed, "retries": retries[job_id],
+                                "workers": sorted(workers[job_id])}
+            })
+        return runs
+
+def run_distributed_simulation(queue: WorkQueue, track_name: str, num_simulations: int, model: str = "realistic",
+                               seed: Optional[int] = None, **options) -> Dict:
+    """One job through the coordinator; counts match run_monte_carlo_simulation on the multiprocess backend"""
+    return Coordinator(queue).run([DistributedJob(model, track_name, num_simulations, seed, options)])[0]
+
+def _worker_process(url: str, lease: float):
+    run_worker(open_queue(url, lease))
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Distributed F1 Monte Carlo forecasts")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    coordinator = commands.add_parser("coordinator", help="Split jobs into shards and merge the results")
+    coordinator.add_argument("--queue", required=True,
+                             help="tcp://host:port to serve a queue on, or a directory shared with the workers")
+    coordinator.add_argument("--model", choices=MODELS, default="realistic")
+    coordinator.add_argument("--tracks", nargs="+", default=None, help="Tracks to simulate (default: all)")
+    coordinator.add_argument("--simulations", nargs="+", type=int, default=[1000000])
+    coordinator.add_argument("--seeds", nargs="+", type=int, default=None, help="Seeds (default: one unseeded run)")
+    coordinator.add_argument("--weather-forecast", default=None,
+                             help="'default' or JSON like '{\"dry\": 0.7, \"light_rain\": 0.3}'")
+    coordinator.add_argument("--scenarios", default=None,
+                             help="JSON file with a list of scenarios, each run besides the baseline")
+    coordinator.add_argument("--shard-size", type=int, default=SHARD_SIZE)
+    coordinator.add_argument("--shard-timeout", type=float, default=SHARD_TIMEOUT,
+                             help="Seconds a worker may hold a shard before it is handed out again")
+    coordinator.add_argument("--local-workers", type=int, default=0, help="Also start this many workers here")
+    coordinator.add_argument("--output", "-o", default="-", help="JSON output path, '-' for stdout")
+
+    worker = commands.add_parser("worker", help="Simulate shards from a coordinator's queue")
+    worker.add_argument("--queue", required=True, help="tcp://host:port or the shared queue directory")
+    worker.add_argument("--idle-timeout", type=float, default=None,
+                        help="Exit after this many seconds without work (default: never)")
+    worker.add_argument("--shard-timeout", type=float, default=SHARD_TIMEOUT,
+                        help="The coordinator's shard timeout, for queue directories")
+    args = parser.parse_args(argv)
+
+    if args.command == "worker":
+        done = run_worker(open_queue(args.queue, args.shard_timeout), args.idle_timeout)
+        print(f"Simulated {done} shards", file=sys.stderr)
+        return 0
+
+    if any(count <= 0 for count in args.simulations) or args.shard_size <= 0:
+        parser.error("--simulations and --shard-size must be positive")
+    options = {}
+    if args.weather_forecast:
+        options["weather_forecast"] = True if args.weather_forecast == "default" else json.loads(args.weather_forecast)
+    scenarios = [None]
+    if args.scenarios:
+        with open(args.scenarios) as f:
+            scenarios += json.load(f)
+    tracks = args.tracks or list(load_model(args.model).tracks)
+    jobs = [DistributedJob(args.model, track, count, seed, options, scenario)
+            for scenario in scenarios for track in tracks for count in args.simulations
+            for seed in (args.seeds or [None])]
+
+    server, queue = None, None
+    if args.queue.startswith("tcp://"):
+        host, _, port = args.queue[len("tcp://"):].rpartition(":")
+        server = TCPQueueServer(host, int(port), args.shard_timeout)
+        queue = server.queue
+    else:
+        queue = open_queue(args.queue, args.shard_timeout)
+    url = server.address if server else args.queue
+    local = [Process(target=_worker_process, args=(url, args.shard_timeout), daemon=True) for _ in range(args.local_workers)]
+    for process in local:
+        process.start()
+    start = time.perf_counter()
+    try:
+        runs = Coordinator(queue, args.shard_size).run(jobs)
+    except (ValueError, RuntimeError) as e:
+        parser.error(str(e))
+    finally:
+        for process in local:
+            process.terminate()
+        if server is not None:
+            server.close()
+
+    stream = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        json.dump({"runs": runs}, stream, indent=2)
+        stream.write("\n")
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+    print(f"{len(jobs)} jobs in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,455 @@
+import hashlib
+import os
+import random
+import time
+import numpy as np
+from abc import ABC, abstractmethod
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Dict, FrozenSet, List, Optional, Type
+
+from f1_vectorized import orders_to_names, position_counts, probabilities_from_counts
+
+DEFAULT_BACKEND = os.environ.get("F1_SIM_BACKEND", "reference")
+
+@dataclass
+class RaceEnsemble:
+    """Raw outcome of a batch of simulated races, as driver indices"""
+    driver_names: List[str]
+    grid: np.ndarray  # (simulations, positions) starting grid
+    finish: np.ndarray  # (simulations, positions) finishing order
+    dnf: Optional[np.ndarray] = None  # (simulations, drivers) retired during the race
+    weather: Optional[np.ndarray] = None  # (simulations,) race-start weather index, for weather scenario runs
+    partner: Optional[np.ndarray] = None  # (simulations,) antithetic partner index (-1 unpaired), for antithetic runs
+    weights: Optional[np.ndarray] = None  # (simulations,) likelihood ratios, for importance-sampled runs
+    replicate: Optional[np.ndarray] = None  # (simulations,) randomised-QMC replicate index, for qmc runs
+
+    @property
+    def num_simulations(self) -> int:
+        return len(self.finish)
+
+    def position_counts(self) -> np.ndarray:
+        """Finishing position counts, shape (drivers, positions), weighted for importance-sampled runs"""
+        return position_counts(self.finish, len(self.driver_names), self.weights)
+
+    def race_results(self, limit: Optional[int] = None) -> List[List[str]]:
+        """Finishing orders as driver names, like simulate_race returns"""
+        return orders_to_names(self.finish[:limit], self.driver_names)
+
+    @classmethod
+    def concat(cls, ensembles: List["RaceEnsemble"]) -> "RaceEnsemble":
+        """Join ensembles run on the same model, in order"""
+        dnf = weather = partner = weights = replicate = None
+        if all(ensemble.dnf is not None for ensemble in ensembles):
+            dnf = np.concatenate([ensemble.dnf for ensemble in ensembles])
+        if all(ensemble.weather is not None for ensemble in ensembles):
+            weather = np.concatenate([ensemble.weather for ensemble in ensembles])
+        if all(ensemble.partner is not None for ensemble in ensembles):
+            offsets = np.cumsum([0] + [ensemble.num_simulations for ensemble in ensembles[:-1]])
+            partner = np.concatenate([np.where(ensemble.partner >= 0, ensemble.partner + offset, -1)
+                                      for ensemble, offset in zip(ensembles, offsets)])
+        if all(ensemble.weights is not None for ensemble in ensembles):
+            weights = np.concatenate([ensemble.weights for ensemble in ensembles])
+        if all(ensemble.replicate is not None for ensemble in ensembles):
+            # Replicates of different ensembles are independent, so they keep separate indices
+            offsets = np.cumsum([0] + [int(ensemble.replicate.max()) + 1 for ensemble in ensembles[:-1]])
+            replicate = np.concatenate([ensemble.replicate + offset for ensemble, offset in zip(ensembles, offsets)])
+        return cls(
+            driver_names=ensembles[0].driver_names,
+            grid=np.concatenate([ensemble.grid for ensemble in ensembles]),
+            finish=np.concatenate([ensemble.finish for ensemble in ensembles]),
+            dnf=dnf,
+            weather=weather,
+            partner=partner,
+            weights=weights,
+            replicate=replicate
+        )
+
+    @classmethod
+    def from_names(cls, driver_names: List[str], qualifying_results: List[List[tuple]],
+                   race_results: List[List[str]]) -> "RaceEnsemble":
+        """Encode the list-based output of simulate_qualifying/simulate_race"""
+        index = {name: i for i, name in enumerate(driver_names)}
+        grid = np.array([[index[name] for name, _ in grid] for grid in qualifying_results], dtype=np.int16)
+        finish = np.array([[index[name] for name in race] for race in race_results], dtype=np.int16)
+        return cls(driver_names, grid.reshape(len(race_results), -1), finish.reshape(len(race_results), -1))
+
+@dataclass(frozen=True)
+class BackendCapabilities:
+    """What a backend can do, so callers can pick one per request"""
+    description: str
+    vectorized: bool  # Simulates the ensemble as arrays rather than race by race
+    parallel: bool  # Spreads work over several processes
+    deterministic: bool  # Same seed gives the same ensemble
+    reports_dnf: bool  # Fills RaceEnsemble.dnf
+    race_options: Optional[FrozenSet[str]] = None  # Model options accepted, None for any
+
+    def to_dict(self) -> Dict:
+        """JSON-friendly form for the web API"""
+        capabilities = asdict(self)
+        if self.race_options is not None:
+            capabilities["race_options"] = sorted(self.race_options)
+        return capabilities
+
+class PhaseTimer:
+    """Wall-clock seconds per phase of a run, accumulated by calling lap() at the end of each phase"""
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = {}
+        self._start = time.perf_counter()
+
+    def lap(self, phase: str):
+        now = time.perf_counter()
+        self.seconds[phase] = self.seconds.get(phase, 0.0) + now - self._start
+        self._start = now
+
+    def add(self, seconds: Dict[str, float]):
+        for phase, value in seconds.items():
+            self.seconds[phase] = self.seconds.get(phase, 0.0) + value
+
+class EngineBackend(ABC):
+    """A way of running a model's Monte Carlo ensemble
+
+    After each run, timings holds the seconds spent in each phase.
+    """
+    name: str
+    capabilities: BackendCapabilities
+    timings: Dict[str, float] = {}
+
+    @abstractmethod
+    def run(self, model: "MonteCarloEngine", track_name: str, num_simulations: int,
+            seed: Optional[int] = None, **options) -> RaceEnsemble:
+        """Simulate qualifying and race num_simulations times"""
+
+    def check_options(self, options: Dict):
+        """Reject model options this backend cannot honour"""
+        allowed = self.capabilities.race_options
+        unsupported = sorted(set(options) - allowed) if allowed is not None else []
+        if unsupported:
+            raise ValueError(f"Backend '{self.name}' does not support: {', '.join(unsupported)}")
+
+_BACKENDS: Dict[str, Type[EngineBackend]] = {}
+
+def register_backend(cls: Type[EngineBackend]) -> Type[EngineBackend]:
+    """Class decorator adding a backend to the registry under cls.name"""
+    _BACKENDS[cls.name] = cls
+    return cls
+
+def get_backend(name: Optional[str] = None, **config) -> EngineBackend:
+    """Instantiate a registered backend, e.g. get_backend("multiprocess", workers=4)"""
+    name = name or DEFAULT_BACKEND
+    if name not in _BACKENDS:
+        raise ValueError(f"Unknown backend '{name}'. Available backends: {', '.join(_BACKENDS)}")
+    return _BACKENDS[name](**config)
+
+def available_backends() -> Dict[str, BackendCapabilities]:
+    """Registered backends and their capabilities"""
+    return {name: cls.capabilities for name, cls in _BACKENDS.items()}
+
+MODELS = ("realistic", "2025")
+
+def load_model(name: str = "realistic") -> "MonteCarloEngine":
+    """Create a simulator by short name; imported lazily as both modules build on this one"""
+    if name == "realistic":
+        from f1_realistic_simulation import F1RealisticSimulation
+        return F1RealisticSimulation()
+    if name == "2025":
+        from f1_simulation_2025 import F1MonteCarloSimulation2025
+        return F1MonteCarloSimulation2025()
+    raise ValueError(f"Unknown model '{name}'. Available models: {', '.join(MODELS)}")
+
+@register_backend
+class ReferenceBackend(EngineBackend):
+    """The original list-based simulate_qualifying / simulate_race loops"""
+    name = "reference"
+    capabilities = BackendCapabilities(
+        description="Pure Python reference implementation",
+        vectorized=False, parallel=False, deterministic=True, reports_dnf=False,
+        race_options=frozenset({"event_driven", "planned_tires"})
+    )
+
+    def run(self, model, track_name, num_simulations, seed=None, **options):
+        self.check_options(options)
+        timer = PhaseTimer()
+        if seed is not None:
+            np.random.seed(seed)
+            random.seed(seed)
+        race_options = model.prepare_race_options(track_name, num_simulations, np.random, **options)
+        timer.lap("prepare")
+        qualifying_results = model.simulate_qualifying(track_name, num_simulations)
+        timer.lap("qualifying")
+        race_results = model.simulate_race(track_name, qualifying_results, num_simulations, **race_options)
+        timer.lap("race")
+        ensemble = RaceEnsemble.from_names(model.driver_names, qualifying_results, race_results)
+        timer.lap("encode")
+        self.timings = timer.seconds
+        return ensemble
+
+@register_backend
+class NumpyBackend(EngineBackend):
+    """Batched NumPy qualifying and race over the whole ensemble
+
+    antithetic=True pairs every simulation with one run on mirrored random
+    draws (f1_variance.AntitheticDraws); importance_target="<driver>" tilts
+    that driver's odds upward and weights the ensemble back
+    (f1_importance.ImportanceTilt); qmc=True draws qualifying from scrambled
+    Sobol points in f1_qmc.QMC_REPLICATES independent replicates
+    (f1_qmc.SobolDraws), or from plain draws where the model's qualifying is
+    not random (model.random_qualifying), since Sobol points gain nothing
+    there and cost time. tables, if given, are used instead of compiling the
+    model's tables for the track (e.g. ones mapped from shared memory).
+    """
+    name = "numpy"
+    capabilities = BackendCapabilities(
+        description="Vectorized NumPy engine",
+        vectorized=True, parallel=False, deterministic=True, reports_dnf=True,
+        race_options=frozenset({"planned_tires", "weather_forecast", "antithetic", "importance_target", "qmc"})
+    )
+
+    def __init__(self, tables=None):
+        self.tables = tables
+
+    def run(self, model, track_name, num_simulations, seed=None, **options):
+        self.check_options(options)
+        timer = PhaseTimer()
+        rng = np.random.default_rng(seed)
+        antithetic = options.pop("antithetic", False)
+        if antithetic:
+            from f1_variance import AntitheticDraws
+            rng = AntitheticDraws(rng)
+        importance = {}
+        target = options.pop("importance_target", None)
+        if target is not None:
+            from f1_importance import ImportanceTilt, check_target
+            importance["importance"] = ImportanceTilt(check_target(model.driver_names, target), num_simulations)
+        qmc = options.pop("qmc", False)
+        if qmc and (antithetic or importance):
+            raise ValueError("qmc cannot be combined with antithetic or importance_target")
+        tables = self.tables if self.tables is not None else model.compile_tables(track_name)
+        race_options = model.prepare_race_options(track_name, num_simulations, rng, **options)
+        timer.lap("prepare")
+        qualifying_options = model.qualifying_options(race_options)
+        replicate = None
+        if qmc:
+            from f1_qmc import SobolDraws, replicate_blocks
+            blocks = replicate_blocks(num_simulations)
+            replicate = np.repeat(np.arange(len(blocks), dtype=np.int16), [block.stop - block.start for block in blocks])
+        if qmc and model.random_qualifying(tables, qualifying_options):
+            grid = np.concatenate([
+                model.simulate_qualifying_vectorized(track_name, block.stop - block.start, SobolDraws(rng), tables,
+                                                     **{key: value[block] for key, value in qualifying_options.items()})
+                for block in blocks])
+        else:
+            grid = model.simulate_qualifying_vectorized(track_name, num_simulations, rng, tables,
+                                                        **qualifying_options, **importance)
+        timer.lap("qualifying")
+        finish, dnf = model.simulate_race_vectorized(track_name, grid, rng, tables, **race_options, **importance)
+        timer.lap("race")
+        self.timings = timer.seconds
+        weather = race_options.get("weather")
+        return RaceEnsemble(model.driver_names, grid, finish, dnf,
+                            weather=weather.race[:, 0] if weather is not None else None,
+                            partner=rng.partners(num_simulations) if antithetic else None,
+                            weights=importance["importance"].weights if importance else None,
+                            replicate=replicate)
+
+@register_backend
+class MultiprocessBackend(EngineBackend):
+    """NumPy engine split into fixed-size seeded shards across a process pool
+
+    Shards always have the same size and seeds, so the ensemble does not
+    depend on how many workers ran it. Workers get the model once and map its
+    compiled tables from shared memory, and write their rows of the ensemble
+    straight into shared result buffers (f1_shared). Phase timings are
+    summed over shards, so they are CPU seconds; "wall" is the elapsed time
+    of the pool.
+    """
+    name = "multiprocess"
+    capabilities = BackendCapabilities(
+        description="Vectorized NumPy engine over a process pool",
+        vectorized=True, parallel=True, deterministic=True, reports_dnf=True,
+        race_options=frozenset({"planned_tires", "weather_forecast", "antithetic", "importance_target", "qmc"})
+    )
+
+    def __init__(self, workers: Optional[int] = None, shard_size: int = 25000):
+        self.workers = workers or os.cpu_count() or 1
+        self.shard_size = shard_size
+
+    def run(self, model, track_name, num_simulations, seed=None, **options):
+        self.check_options(options)
+        start = time.perf_counter()
+        from f1_shared import run_shared_shards, shard_sizes
+        sizes = shard_sizes(num_simulations, self.shard_size)
+        seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+        _, ensemble, shard_timings = run_shared_shards(model, track_name, sizes, seeds, options, self.workers)
+
+        timer = PhaseTimer()
+        for timings in shard_timings:
+            timer.add(timings)
+        timer.seconds["wall"] = time.perf_counter() - start
+        self.timings = timer.seconds
+        return ensemble
+
+class MonteCarloEngine:
+    """Shared Monte Carlo driver for the simulators
+
+    Subclasses provide drivers/tracks, the list-based simulate_qualifying and
+    simulate_race, and for the vectorized backends compile_tables plus
+    simulate_qualifying_vectorized / simulate_race_vectorized.
+    """
+    summary_title = "F1 Race Prediction"
+    run_banner = "Monte Carlo"
+    last_outcomes = None  # OutcomeQueries over the latest run's full ensemble, when it asked to keep it
+
+    @property
+    def driver_names(self) -> List[str]:
+        return list(self.drivers.keys())
+
+    def model_hash(self) -> str:
+        """Short fingerprint of the model parameters, so stored runs can be matched to the data behind them"""
+        tables = (type(self).__name__, self.drivers, getattr(self, "cars", None), self.tracks)
+        return hashlib.sha256(repr(tables).encode()).hexdigest()[:16]
+
+    def prepare_race_options(self, track_name: str, num_simulations: int, rng, **options) -> Dict:
+        """Turn run-level options into keyword arguments for the race simulation"""
+        return options
+
+    def qualifying_options(self, race_options: Dict) -> Dict:
+        """Keyword arguments for batched qualifying drawn from the prepared race options"""
+        return {}
+
+    def random_qualifying(self, tables, qualifying_options: Dict) -> bool:
+        """Whether batched qualifying with these tables and options draws anything that moves the grid"""
+        return True
+
+    def run_ensemble(self, track_name: str, num_simulations: int, backend: Optional[str] = None,
+                     seed: Optional[int] = None, **options) -> RaceEnsemble:
+        """Simulate the full ensemble on the chosen backend"""
+        if isinstance(backend, EngineBackend):
+            return backend.run(self, track_name, num_simulations, seed, **options)
+        return get_backend(backend).run(self, track_name, num_simulations, seed, **options)
+
+    def outcome_queries(self, ensemble: RaceEnsemble):
+        """Joint and conditional query layer (f1_queries) over an ensemble, with this model's teams"""
+        from f1_queries import OutcomeQueries
+        return OutcomeQueries.from_ensemble(ensemble, {name: driver.team for name, driver in self.drivers.items()})
+
+    def summarise_ensemble(self, track_name: str, ensemble: RaceEnsemble, backend_name: str,
+                           seed: Optional[int] = None) -> Dict:
+        """Results dict for an ensemble, as run_monte_carlo_simulation returns it"""
+        return {
+            "track": track_name,
+            "num_simulations": ensemble.num_simulations,
+            "timestamp": datetime.now().isoformat(),
+            "model": type(self).__name__,
+            "model_hash": self.model_hash(),
+            "backend": backend_name,
+            "seed": seed,
+            **probabilities_from_counts(ensemble.position_counts(), ensemble.driver_names, ensemble.num_simulations),
+            "race_results": ensemble.race_results(100)  # Store first 100 for analysis
+        }
+
+    def run_monte_carlo_simulation(self, track_name: str, num_simulations: int = 10000,
+                                   backend: Optional[str] = None, seed: Optional[int] = None,
+                                   store_path: Optional[str] = None, variance_reduction=None,
+                                   keep_outcomes: bool = False, **options) -> Dict:
+        """Run complete Monte Carlo simulation
+
+        With keep_outcomes the full ensemble stays queryable through
+        self.last_outcomes until the next run; otherwise it is dropped once
+        summarised. With store_path it is also written there (see
+        f1_ensemble_store).
+
+        variance_reduction names methods from f1_variance ("antithetic",
+        "control_variate", or both); the probabilities are then the reduced
+        estimates and results["variance_reduction"] reports the effective
+        sample size gained.
+
+        importance_target="<driver>" (NumPy backends) samples races tilted in
+        that driver's favour and weights them back, for long-shot odds;
+        results["importance_sampling"] reports the driver's estimates with
+        their standard errors. Weighted ensembles are neither stored nor
+        kept in last_outcomes. qmc=True (NumPy backends) samples qualifying
+        quasi-randomly and results["qmc"] reports pole, grid and win estimates
+        with randomised-QMC standard errors.
+        """
+        print(f"Running {self.run_banner} simulation for {track_name}...")
+        print(f"Number of simulations: {num_simulations}")
+
+        methods = ()
+        if variance_reduction:
+            from f1_variance import parse_methods
+            methods = parse_methods(variance_reduction)
+        target = options.get("importance_target")
+        if target is not None and (methods or store_path is not None):
+            raise ValueError("importance_target cannot be combined with variance_reduction or store_path")
+        run_options = {**options, "antithetic": True} if "antithetic" in methods else options
+        ensemble = self.run_ensemble(track_name, num_simulations, backend, seed, **run_options)
+        backend_name = backend.name if isinstance(backend, EngineBackend) else (backend or DEFAULT_BACKEND)
+        results = self.summarise_ensemble(track_name, ensemble, backend_name, seed)
+        if methods:
+            from f1_variance import apply_variance_reduction
+            apply_variance_reduction(self, track_name, ensemble, results, methods, seed, **options)
+        if target is not None:
+            from f1_importance import importance_report
+            results["importance_sampling"] = importance_report(ensemble, target)
+        if ensemble.replicate is not None:
+            from f1_qmc import qmc_report
+            results["qmc"] = qmc_report(ensemble)
+
+        # Outcome queries count races, which would misread an importance-weighted ensemble
+        self.last_outcomes = self.outcome_queries(ensemble) if keep_outcomes and ensemble.weights is None else None
+        if store_path is not None:
+            from f1_ensemble_store import save_ensemble
+            save_ensemble(store_path, ensemble, {"model": type(self).__name__, "track": track_name,
+                                                 "backend": backend_name, "seed": seed})
+            results["ensemble_path"] = store_path
+
+        self.results.append(results)
+        return results
+
+    def _finish_probabilities(self, race_results: List[List[str]], top: int) -> Dict[str, float]:
+        """Share of races in which each driver finished in the first `top` places"""
+        counts = {driver: 0 for driver in self.drivers.keys()}
+        for race in race_results:
+            for driver in race[:top]:
+                if driver in counts:
+                    counts[driver] += 1
+        return {driver: count / len(race_results) for driver, count in counts.items()}
+
+    def _calculate_win_probabilities(self, race_results: List[List[str]]) -> Dict[str, float]:
+        """Calculate win probabilities"""
+        return self._finish_probabilities(race_results, 1)
+
+    def _calculate_podium_probabilities(self, race_results: List[List[str]]) -> Dict[str, float]:
+        """Calculate podium probabilities"""
+        return self._finish_probabilities(race_results, 3)
+
+    def _calculate_points_probabilities(self, race_results: List[List[str]]) -> Dict[str, float]:
+        """Calculate points probabilities (top 10)"""
+        return self._finish_probabilities(race_results, 10)
+
+    def _championship_points(self, driver) -> int:
+        return driver.championship_points
+
+    def get_prediction_summary(self, results: Dict) -> str:
+        """Generate summary of simulation results"""
+        win_probs = results["win_probabilities"]
+        podium_probs = results["podium_probabilities"]
+
+        # Top 5 most likely winners
+        sorted_winners = sorted(win_probs.items(), key=lambda x: x[1], reverse=True)[:5]
+
+        summary = f"{self.summary_title} - {results['track']}\n"
+        summary += f"Based on {results['num_simulations']:,} Monte Carlo simulations\n\n"
+        summary += "Top 5 Most Likely Winners:\n"
+
+        for i, (driver, prob) in enumerate(sorted_winners, 1):
+            podium_prob = podium_probs[driver]
+            team = self.drivers[driver].team
+            championship_pos = self.drivers[driver].championship_position
+            points = self._championship_points(self.drivers[driver])
+            summary += f"{i}. {driver} ({team}): {prob:.1%} win, {podium_prob:.1%} podium\n"
+            summary += f"   Championship: #{championship_pos} ({points} pts)\n"
+
+        return summary
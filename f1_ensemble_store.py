@@ -0,0 +1,357 @@
+import json
+import os
+import numpy as np
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional
+
+from f1_engines import MonteCarloEngine, RaceEnsemble, get_backend
+
+# On-disk layout: MAGIC, a little-endian uint32 header length, a JSON header,
+# padding to ALIGNMENT, then the grid and finish arrays as int8 driver indices
+# (simulations x positions) and the DNF flags bit-packed per simulation.
+# A 20-driver race takes 43 bytes, so 10M simulations fit in ~430MB.
+MAGIC = b"F1ENSEMB"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+QUERY_CHUNK = 1_000_000  # Simulations read per step when evaluating a query
+
+class EnsembleChunk:
+    """A slice of a stored ensemble, with per-driver views computed on demand"""
+
+    def __init__(self, store: "EnsembleStore", rows: slice):
+        self.store = store
+        self.rows = rows
+        self._cache = {}
+
+    def _cached(self, key: str, compute: Callable[[], np.ndarray]) -> np.ndarray:
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    @property
+    def grid(self) -> np.ndarray:
+        return self._cached("grid", lambda: np.asarray(self.store.grid[self.rows]))
+
+    @property
+    def finish(self) -> np.ndarray:
+        return self._cached("finish", lambda: np.asarray(self.store.finish[self.rows]))
+
+    @property
+    def dnf(self) -> np.ndarray:
+        """Retired flags, (simulations x drivers)"""
+        if not self.store.has_dnf:
+            raise ValueError("This ensemble was stored without DNF flags")
+        return self._cached("dnf", lambda: np.unpackbits(
+            self.store.dnf_bits[self.rows], axis=1, count=self.store.num_drivers).astype(bool))
+
+    @property
+    def finish_position(self) -> np.ndarray:
+        """0-based finishing position of each driver, (simulations x drivers)"""
+        return self._cached("finish_position", lambda: _positions(self.finish))
+
+    @property
+    def grid_position(self) -> np.ndarray:
+        """0-based starting position of each driver, (simulations x drivers)"""
+        return self._cached("grid_position", lambda: _positions(self.grid))
+
+class ArrayChunk(EnsembleChunk):
+    """An ensemble held in memory, queried with the same events as a stored one"""
+
+    def __init__(self, finish: np.ndarray, grid: Optional[np.ndarray] = None, dnf: Optional[np.ndarray] = None):
+        self.store = None
+        self.rows = slice(0, len(finish))
+        self._cache = {key: value for key, value in (("finish", finish), ("grid", grid), ("dnf", dnf))
+                       if value is not None}
+
+    def _cached(self, key: str, compute: Callable[[], np.ndarray]) -> np.ndarray:
+        if key not in self._cache:
+            if key in ("grid", "dnf"):
+                raise ValueError(f"This ensemble has no {key} data")
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    @property
+    def dnf(self) -> np.ndarray:
+        return self._cached("dnf", None)
+
+def _positions(order: np.ndarray) -> np.ndarray:
+    positions = np.empty_like(order)
+    np.put_along_axis(positions, order.astype(np.intp), np.arange(order.shape[1], dtype=order.dtype), axis=1)
+    return positions
+
+class Event:
+    """A per-simulation condition over a stored ensemble; combine with &, | and ~"""
+
+    def __init__(self, evaluate: Callable[[EnsembleChunk], np.ndarray], description: str):
+        self.evaluate = evaluate
+        self.description = description
+
+    def __and__(self, other: "Event") -> "Event":
+        return Event(lambda chunk: self.evaluate(chunk) & other.evaluate(chunk),
+                     f"({self.description} and {other.description})")
+
+    def __or__(self, other: "Event") -> "Event":
+        return Event(lambda chunk: self.evaluate(chunk) | other.evaluate(chunk),
+                     f"({self.description} or {other.description})")
+
+    def __invert__(self) -> "Event":
+        return Event(lambda chunk: ~self.evaluate(chunk), f"not {self.description}")
+
+    def __repr__(self) -> str:
+        return f"Event({self.description})"
+
+@dataclass
+class QueryResult:
+    """Probability of an event, optionally conditional on another"""
+    event: str
+    given: Optional[str]
+    count: int  # Simulations where the event (and the condition) held
+    total: int  # Simulations where the condition held
+    probability: float
+    std_error: float
+
+class EventBuilders:
+    """Event constructors shared by stored (EnsembleStore) and in-memory (f1_queries) ensembles
+
+    Subclasses provide driver_names.
+    """
+    driver_names: List[str]
+
+    def _index(self, driver: str) -> int:
+        if driver not in self.driver_names:
+            raise ValueError(f"Unknown driver '{driver}'")
+        return self.driver_names.index(driver)
+
+    def finishes_top(self, driver: str, places: int) -> Event:
+        d = self._index(driver)
+        return Event(lambda chunk: chunk.finish_position[:, d] < places, f"{driver} top {places}")
+
+    def all_top(self, drivers: List[str], places: int) -> Event:
+        """Every one of the drivers finishes in the first `places`"""
+        columns = [self._index(driver) for driver in drivers]
+        return Event(lambda chunk: (chunk.finish_position[:, columns] < places).all(axis=1),
+                     f"{', '.join(drivers)} all top {places}")
+
+    def wins(self, driver: str) -> Event:
+        d = self._index(driver)
+        return Event(lambda chunk: chunk.finish[:, 0] == d, f"{driver} wins")
+
+    def podium(self, driver: str) -> Event:
+        return self.finishes_top(driver, 3)
+
+    def points(self, driver: str) -> Event:
+        return self.finishes_top(driver, 10)
+
+    def finishes(self, driver: str, position: int) -> Event:
+        """Driver finishes in exactly this (1-based) position"""
+        d = self._index(driver)
+        return Event(lambda chunk: chunk.finish_position[:, d] == position - 1, f"{driver} P{position}")
+
+    def starts(self, driver: str, position: int) -> Event:
+        """Driver starts from this (1-based) grid slot"""
+        d = self._index(driver)
+        return Event(lambda chunk: chunk.grid_position[:, d] == position - 1, f"{driver} starts P{position}")
+
+    def ahead(self, driver: str, rival: str) -> Event:
+        d, r = self._index(driver), self._index(rival)
+        return Event(lambda chunk: chunk.finish_position[:, d] < chunk.finish_position[:, r],
+                     f"{driver} ahead of {rival}")
+
+    def dnf(self, driver: str) -> Event:
+        d = self._index(driver)
+        return Event(lambda chunk: chunk.dnf[:, d], f"{driver} DNF")
+
+class EnsembleStore(EventBuilders):
+    """Read-only, memory-mapped view of a stored ensemble"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not an ensemble file")
+            header_length = int(np.frombuffer(f.read(4), dtype="<u4")[0])
+            self.metadata = json.loads(f.read(header_length))
+        if self.metadata["format_version"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported ensemble format version {self.metadata['format_version']}")
+
+        shape = (self.num_simulations, self.num_drivers)
+        offsets = self.metadata["offsets"]
+        self.grid = np.memmap(path, dtype=np.int8, mode="r", offset=offsets["grid"], shape=shape)
+        self.finish = np.memmap(path, dtype=np.int8, mode="r", offset=offsets["finish"], shape=shape)
+        self.dnf_bits = np.memmap(path, dtype=np.uint8, mode="r", offset=offsets["dnf"],
+                                  shape=(self.num_simulations, _packed_width(self.num_drivers)))
+
+    @property
+    def driver_names(self) -> List[str]:
+        return self.metadata["driver_names"]
+
+    @property
+    def num_simulations(self) -> int:
+        return self.metadata["num_simulations"]
+
+    @property
+    def num_drivers(self) -> int:
+        return len(self.driver_names)
+
+    @property
+    def has_dnf(self) -> bool:
+        return self.metadata["has_dnf"]
+
+    def chunks(self, chunk_size: int = QUERY_CHUNK) -> Iterator[EnsembleChunk]:
+        for start in range(0, self.num_simulations, chunk_size):
+            yield EnsembleChunk(self, slice(start, min(start + chunk_size, self.num_simulations)))
+
+    def ensemble(self, rows: slice = slice(None)) -> RaceEnsemble:
+        """Load a slice of the stored simulations into memory"""
+        chunk = EnsembleChunk(self, rows)
+        return RaceEnsemble(self.driver_names, chunk.grid.astype(np.int16), chunk.finish.astype(np.int16),
+                            chunk.dnf if self.has_dnf else None)
+
+    def outcomes(self, rows: slice = slice(None), teams: Optional[Dict[str, str]] = None):
+        """In-memory OutcomeQueries (f1_queries) over a slice of the finishing orders"""
+        from f1_queries import OutcomeQueries
+        return OutcomeQueries(self.driver_names, np.asarray(self.finish[rows]), teams)
+
+    def count(self, event: Event, chunk_size: int = QUERY_CHUNK) -> int:
+        """Number of simulations in which the event holds"""
+        return sum(int(event.evaluate(chunk).sum()) for chunk in self.chunks(chunk_size))
+
+    def probability(self, event: Event, given: Optional[Event] = None,
+                    chunk_size: int = QUERY_CHUNK) -> QueryResult:
+        """P(event) or P(event | given), reading the file one chunk at a time"""
+        count = total = 0
+        for chunk in self.chunks(chunk_size):
+            holds = event.evaluate(chunk)
+            if given is not None:
+                condition = given.evaluate(chunk)
+                holds = holds & condition
+                total += int(condition.sum())
+            else:
+                total += len(holds)
+            count += int(holds.sum())
+
+        probability = count / total if total else float("nan")
+        std_error = float(np.sqrt(probability * (1 - probability) / total)) if total else float("nan")
+        return QueryResult(event.description, given.description if given is not None else None,
+                           count, total, probability, std_error)
+
+    def position_distribution(self, driver: str, chunk_size: int = QUERY_CHUNK) -> np.ndarray:
+        """Probability of each finishing position for one driver"""
+        d = self._index(driver)
+        counts = np.zeros(self.num_drivers, dtype=np.int64)
+        for chunk in self.chunks(chunk_size):
+            counts += np.bincount(chunk.finish_position[:, d], minlength=self.num_drivers)
+        return counts / max(self.num_simulations, 1)
+
+def _packed_width(num_drivers: int) -> int:
+    return (num_drivers + 7) // 8
+
+class EnsembleWriter:
+    """Create an ensemble file of known size and fill it in slices"""
+
+    def __init__(self, path: str, driver_names: List[str], num_simulations: int, has_dnf: bool = True,
+                 metadata: Optional[Dict] = None):
+        if len(driver_names) > np.iinfo(np.int8).max:
+            raise ValueError("Ensemble files hold at most 127 drivers")
+        self.path = path
+        self.num_simulations = num_simulations
+        self.written = 0
+        num_drivers = len(driver_names)
+
+        header = {
+            "format_version": FORMAT_VERSION,
+            "driver_names": list(driver_names),
+            "num_simulations": num_simulations,
+            "has_dnf": has_dnf,
+            "created": datetime.now().isoformat(),
+            **(metadata or {}),
+        }
+        # Offsets depend on the header length, so size the header with placeholders first
+        header["offsets"] = {"grid": 0, "finish": 0, "dnf": 0}
+        header_length = len(json.dumps(header)) + 64
+        grid_offset = _align(len(MAGIC) + 4 + header_length)
+        order_bytes = num_simulations * num_drivers
+        header["offsets"] = {
+            "grid": grid_offset,
+            "finish": _align(grid_offset + order_bytes),
+            "dnf": _align(grid_offset + order_bytes) + _align(order_bytes),
+        }
+        encoded = json.dumps(header).encode().ljust(header_length)
+        end = header["offsets"]["dnf"] + num_simulations * _packed_width(num_drivers)
+
+        with open(path, "wb") as f:
+            f.write(MAGIC)
+            f.write(np.uint32(len(encoded)).astype("<u4").tobytes())
+            f.write(encoded)
+            f.truncate(max(end, 1))
+
+        shape = (num_simulations, num_drivers)
+        self.grid = np.memmap(path, dtype=np.int8, mode="r+", offset=header["offsets"]["grid"], shape=shape)
+        self.finish = np.memmap(path, dtype=np.int8, mode="r+", offset=header["offsets"]["finish"], shape=shape)
+        self.dnf_bits = np.memmap(path, dtype=np.uint8, mode="r+", offset=header["offsets"]["dnf"],
+                                  shape=(num_simulations, _packed_width(num_drivers)))
+
+    def append(self, ensemble: RaceEnsemble):
+        """Write the next block of simulations"""
+        rows = slice(self.written, self.written + ensemble.num_simulations)
+        if rows.stop > self.num_simulations:
+            raise ValueError("More simulations than the file was created for")
+        self.grid[rows] = ensemble.grid
+        self.finish[rows] = ensemble.finish
+        if ensemble.dnf is not None:
+            self.dnf_bits[rows] = np.packbits(ensemble.dnf, axis=1)
+        self.written = rows.stop
+
+    def close(self) -> EnsembleStore:
+        if self.written != self.num_simulations:
+            raise ValueError(f"Only {self.written} of {self.num_simulations} simulations were written")
+        for array in (self.grid, self.finish, self.dnf_bits):
+            array.flush()
+        del self.grid, self.finish, self.dnf_bits
+        return EnsembleStore(self.path)
+
+def _align(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+def save_ensemble(path: str, ensemble: RaceEnsemble, metadata: Optional[Dict] = None) -> EnsembleStore:
+    """Write an in-memory ensemble to disk"""
+    writer = EnsembleWriter(path, ensemble.driver_names, ensemble.num_simulations,
+                            has_dnf=ensemble.dnf is not None, metadata=metadata)
+    writer.append(ensemble)
+    return writer.close()
+
+def simulate_to_store(model: MonteCarloEngine, path: str, track_name: str, num_simulations: int,
+                      backend: Optional[str] = None, seed: Optional[int] = None,
+                      chunk_size: int = 500_000, **options) -> EnsembleStore:
+    """Simulate straight to disk in chunks, so the ensemble never has to fit in memory
+
+    Chunk k is simulated with the k-th child of SeedSequence(seed).
+    """
+    if num_simulations <= 0:
+        raise ValueError("num_simulations must be positive")
+    engine = get_backend(backend)
+    sizes = [min(chunk_size, num_simulations - start) for start in range(0, num_simulations, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    metadata = {
+        "model": type(model).__name__,
+        "track": track_name,
+        "backend": engine.name,
+        "seed": seed,
+        "chunk_size": chunk_size,
+        "options": {key: value for key, value in options.items() if isinstance(value, (bool, int, float, str))},
+    }
+
+    writer = None
+    try:
+        for size, chunk_seed in zip(sizes, seeds):
+            ensemble = engine.run(model, track_name, size, int(chunk_seed.generate_state(1)[0]), **options)
+            if writer is None:
+                writer = EnsembleWriter(path, ensemble.driver_names, num_simulations,
+                                        has_dnf=ensemble.dnf is not None, metadata=metadata)
+            writer.append(ensemble)
+        return writer.close()
+    except BaseException:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
@@ -0,0 +1,184 @@
+import argparse
+import sys
+import time
+import numpy as np
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence
+
+from scipy import stats
+
+from f1_engines import MODELS, MonteCarloEngine, load_model
+from f1_vectorized import position_counts
+
+# Tracks checked by default: one street circuit and one permanent circuit per model
+DEFAULT_TRACKS = ("Monaco", "Spain")
+
+@dataclass
+class DriverComparison:
+    """Position distribution test for one driver at one stage (grid or finish)"""
+    stage: str
+    driver: str
+    chi2: float
+    dof: int
+    p_value: float
+    ks_statistic: float
+    ks_p_value: float
+
+@dataclass
+class CellDivergence:
+    """A driver/position probability that differs between the two engines"""
+    stage: str
+    driver: str
+    position: int  # 1-based
+    reference_prob: float
+    candidate_prob: float
+    z: float
+
+@dataclass
+class EquivalenceReport:
+    """Outcome of comparing a candidate engine against the reference on one track"""
+    model: str
+    track: str
+    reference: str
+    candidate: str
+    reference_simulations: int
+    candidate_simulations: int
+    alpha: float  # Family-wise error rate for this report
+    drivers: List[DriverComparison] = field(default_factory=list)
+    cells: List[CellDivergence] = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def failures(self) -> List[DriverComparison]:
+        """Driver distributions rejected after Bonferroni correction"""
+        threshold = self.alpha / max(len(self.drivers), 1)
+        return [c for c in self.drivers if c.p_value < threshold or c.ks_p_value < threshold]
+
+    @property
+    def passed(self) -> bool:
+        return not self.failures and not self.cells
+
+    def format(self) -> str:
+        """Readable report listing any diverging drivers and cells"""
+        status = "PASS" if self.passed else "FAIL"
+        lines = [f"{status} {self.model} / {self.track}: {self.candidate} ({self.candidate_simulations:,}) vs "
+                 f"{self.reference} ({self.reference_simulations:,}) in {self.seconds:.1f}s"]
+        for comparison in self.failures:
+            lines.append(f"  {comparison.stage:6s} {comparison.driver:20s} chi2={comparison.chi2:.1f} "
+                         f"(dof {comparison.dof}) p={comparison.p_value:.2e} "
+                         f"KS={comparison.ks_statistic:.3f} p={comparison.ks_p_value:.2e}")
+        for cell in self.cells:
+            lines.append(f"  {cell.stage:6s} {cell.driver:20s} P{cell.position:<2d} "
+                         f"reference {cell.reference_prob:.3%} candidate {cell.candidate_prob:.3%} z={cell.z:+.1f}")
+        return "\n".join(lines)
+
+def _pool_sparse(reference: np.ndarray, candidate: np.ndarray, min_count: int):
+    """Merge positions with fewer than min_count expected outcomes into one bin"""
+    total = reference + candidate
+    expected = np.minimum(total * reference.sum(), total * candidate.sum()) / max(total.sum(), 1)
+    keep = expected >= min_count
+    table = np.array([reference[keep], candidate[keep]])
+    rest = np.array([[reference[~keep].sum()], [candidate[~keep].sum()]])
+    if rest.sum() > 0:
+        table = np.hstack([table, rest])
+    return table[:, table.sum(axis=0) > 0]
+
+def _ks_discrete(reference: np.ndarray, candidate: np.ndarray):
+    """Two-sample KS statistic and asymptotic p-value on position counts"""
+    n, m = reference.sum(), candidate.sum()
+    statistic = float(np.abs(np.cumsum(reference) / n - np.cumsum(candidate) / m).max())
+    # Ties make the test conservative on discrete data
+    return statistic, float(stats.kstwobign.sf(statistic * np.sqrt(n * m / (n + m))))
+
+def compare_counts(stage: str, driver_names: Sequence[str], reference: np.ndarray, candidate: np.ndarray,
+                   alpha: float, min_count: int = 5):
+    """Per-driver distribution tests and per-cell two-proportion tests
+
+    reference and candidate are (drivers, positions) count matrices.
+    """
+    n, m = reference[0].sum(), candidate[0].sum()
+    comparisons = []
+    for d, driver in enumerate(driver_names):
+        table = _pool_sparse(reference[d], candidate[d], min_count)
+        if table.shape[1] < 2:
+            chi2, p_value, dof = 0.0, 1.0, 0
+        else:
+            chi2, p_value, dof, _ = stats.chi2_contingency(table, correction=False)
+        ks_statistic, ks_p_value = _ks_discrete(reference[d], candidate[d])
+        comparisons.append(DriverComparison(stage, driver, float(chi2), int(dof), float(p_value),
+                                            ks_statistic, ks_p_value))
+
+    # Cells: pooled two-proportion z-test, Bonferroni over every cell
+    p_ref, p_cand = reference / n, candidate / m
+    pooled = (reference + candidate) / (n + m)
+    se = np.sqrt(pooled * (1 - pooled) * (1 / n + 1 / m))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = np.where(se > 0, (p_cand - p_ref) / se, 0.0)
+    critical = stats.norm.isf(alpha / (2 * reference.size))
+    cells = [CellDivergence(stage, driver_names[d], int(position) + 1, float(p_ref[d, position]),
+                            float(p_cand[d, position]), float(z[d, position]))
+             for d, position in zip(*np.nonzero(np.abs(z) > critical))]
+    return comparisons, cells
+
+def compare_engines(model: MonteCarloEngine, track_name: str, reference: str = "reference",
+                    candidate: str = "numpy", reference_simulations: int = 2000,
+                    candidate_simulations: int = 20000, seed: int = 0, alpha: float = 1e-3,
+                    model_name: Optional[str] = None) -> EquivalenceReport:
+    """Run both engines on independent seeds and test grid and finishing distributions"""
+    start = time.time()
+    seeds = np.random.SeedSequence(seed).generate_state(2)
+    reference_ensemble = model.run_ensemble(track_name, reference_simulations, reference, int(seeds[0]))
+    candidate_ensemble = model.run_ensemble(track_name, candidate_simulations, candidate, int(seeds[1]))
+
+    report = EquivalenceReport(
+        model=model_name or type(model).__name__,
+        track=track_name,
+        reference=reference,
+        candidate=candidate,
+        reference_simulations=reference_simulations,
+        candidate_simulations=candidate_simulations,
+        alpha=alpha
+    )
+    num_drivers = len(model.driver_names)
+    stages = {
+        "grid": (reference_ensemble.grid, candidate_ensemble.grid),
+        "finish": (reference_ensemble.finish, candidate_ensemble.finish),
+    }
+    for stage, (reference_orders, candidate_orders) in stages.items():
+        # Split alpha between the two stages
+        drivers, cells = compare_counts(stage, model.driver_names,
+                                        position_counts(reference_orders, num_drivers),
+                                        position_counts(candidate_orders, num_drivers), alpha / len(stages))
+        report.drivers.extend(drivers)
+        report.cells.extend(cells)
+
+    report.seconds = time.time() - start
+    return report
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Check that a fast engine reproduces the reference position distributions")
+    parser.add_argument("--models", nargs="+", choices=MODELS, default=list(MODELS))
+    parser.add_argument("--tracks", nargs="+", default=list(DEFAULT_TRACKS))
+    parser.add_argument("--reference", default="reference", help="Trusted backend")
+    parser.add_argument("--candidate", default="numpy", help="Backend under test")
+    parser.add_argument("--reference-sims", type=int, default=2000)
+    parser.add_argument("--candidate-sims", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--alpha", type=float, default=1e-3, help="Family-wise error rate over the whole run")
+    args = parser.parse_args(argv)
+
+    runs = [(name, track) for name in args.models for track in args.tracks]
+    failed = 0
+    for name, track in runs:
+        model = load_model(name)
+        report = compare_engines(model, track, args.reference, args.candidate, args.reference_sims,
+                                 args.candidate_sims, args.seed, args.alpha / len(runs), model_name=name)
+        print(report.format())
+        failed += not report.passed
+
+    print(f"\n{len(runs) - failed}/{len(runs)} model/track pairs equivalent")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+import csv
+import io
+import json
+import zlib
+from typing import Dict, Iterable, Iterator
+
+import numpy as np
+
+from f1_ensemble_store import EnsembleStore
+
+FORMATS = ("json", "csv", "binary")
+CONTENTS = ("summary", "ensemble")
+FILE_CHUNK = 1 << 16  # Bytes read per step when streaming a file
+CSV_CHUNK = 50_000  # Simulations formatted per step when streaming an ensemble as CSV
+
+MIMETYPES = {"json": "application/json", "csv": "text/csv", "binary": "application/octet-stream"}
+EXTENSIONS = {"json": "json", "csv": "csv", "binary": "f1e"}
+
+def iter_json(results: Dict) -> Iterator[str]:
+    """A stored results dict as compact JSON, encoded piece by piece"""
+    return json.JSONEncoder(separators=(",", ":"), default=str).iterencode(results)
+
+def iter_summary_csv(results: Dict) -> Iterator[str]:
+    """One row per driver: win, podium and points probabilities"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["driver", "win", "podium", "points"])
+    for driver, win in results["win_probabilities"].items():
+        writer.writerow([driver, win, results["podium_probabilities"][driver],
+                         results["points_probabilities"][driver]])
+    yield buffer.getvalue()
+
+def iter_ensemble_csv(store: EnsembleStore, chunk_size: int = CSV_CHUNK) -> Iterator[str]:
+    """Every simulated finishing order, one row per simulation, read from the memory map in chunks"""
+    names = np.array(store.driver_names, dtype=object)
+    yield ",".join(["simulation"] + [f"P{position + 1}" for position in range(store.num_drivers)]) + "\n"
+    for chunk in store.chunks(chunk_size):
+        start = chunk.rows.start
+        lines = [",".join([str(start + i), *row]) for i, row in enumerate(names[chunk.finish])]
+        yield "\n".join(lines) + "\n"
+
+def iter_file(path: str, chunk_size: int = FILE_CHUNK) -> Iterator[bytes]:
+    """A file's bytes in chunks; the file is opened on the call, so a missing one fails before streaming starts"""
+    f = open(path, "rb")
+
+    def chunks():
+        with f:
+            while True:
+                data = f.read(chunk_size)
+                if not data:
+                    return
+                yield data
+    return chunks()
+
+def encode(chunks: Iterable) -> Iterator[bytes]:
+    for chunk in chunks:
+        yield chunk.encode() if isinstance(chunk, str) else chunk
+
+def gzip_stream(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """Compress a byte stream incrementally into a gzip file"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+def export_stream(results: Dict, fmt: str = "json", content: str = "summary",
+                  compress: bool = False) -> Iterator[bytes]:
+    """Bytes of a stored run in the requested format, produced lazily with bounded memory
+
+    json/csv summaries come from the stored results dict; the ensemble content
+    and the binary format (the ensemble file as written by f1_ensemble_store)
+    need the run to have an ensemble_path.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format '{fmt}'. Available formats: {', '.join(FORMATS)}")
+    if content not in CONTENTS:
+        raise ValueError(f"Unknown content '{content}'. Available: {', '.join(CONTENTS)}")
+    if fmt == "binary":
+        content = "ensemble"
+    if content == "ensemble" and not results.get("ensemble_path"):
+        raise LookupError(f"Run {results.get('run_id')} has no stored ensemble")
+    if fmt == "json" and content == "ensemble":
+        raise ValueError("Ensembles download as csv or binary")
+
+    if fmt == "binary":
+        chunks = iter_file(results["ensemble_path"])
+    elif fmt == "csv" and content == "ensemble":
+        chunks = encode(iter_ensemble_csv(EnsembleStore(results["ensemble_path"])))
+    elif fmt == "csv":
+        chunks = encode(iter_summary_csv(results))
+    else:
+        chunks = encode(iter_json(results))
+    return gzip_stream(chunks) if compress else chunks
+
+def export_filename(results: Dict, fmt: str, content: str, compress: bool) -> str:
+    content = "ensemble" if fmt == "binary" else content
+    name = f"f1_{results['track'].lower().replace(' ', '_')}_run{results.get('run_id')}"
+    if content == "ensemble" and fmt != "binary":
+        name += "_ensemble"
+    return f"{name}.{EXTENSIONS[fmt]}" + (".gz" if compress else "")
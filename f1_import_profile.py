@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Cold-start import profiling: how long each module takes to import in a fresh interpreter, and why
+
+    python f1_import_profile.py                 # every entry point
+    python f1_import_profile.py app --top 15
+    python f1_import_profile.py --check         # fail if a worker module pulls in plotting/statistics libraries
+"""
+import argparse
+import os
+import subprocess
+import sys
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+# Modules loaded by every worker process; these should cost little more than NumPy
+WORKER_MODULES = ("f1_engines", "f1_vectorized", "f1_realistic_simulation", "f1_simulation_2025",
+                  "f1_tires", "f1_weather", "f1_warmup", "f1_batch")
+ENTRY_POINTS = WORKER_MODULES + ("app",)
+HEAVY_PACKAGES = ("matplotlib", "seaborn", "scipy", "pandas", "plotly", "sklearn")
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))  # Profiled imports run here, wherever this is run from
+
+@dataclass
+class ImportProfile:
+    module: str
+    seconds: float  # Cumulative import time of the module itself
+    packages: Dict[str, float] = field(default_factory=dict)  # Top-level package -> seconds in its own modules
+
+    @property
+    def heavy(self) -> List[str]:
+        return [package for package in HEAVY_PACKAGES if package in self.packages]
+
+def profile_import(module: str) -> ImportProfile:
+    """Import module in a fresh interpreter under -X importtime and total the report"""
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                               capture_output=True, text=True, cwd=REPO_DIR)
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{completed.stderr.strip().splitlines()[-1]}")
+
+    profile = ImportProfile(module, 0.0)
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        if name == module:
+            profile.seconds = int(cumulative) / 1e6
+        root = name.split(".")[0]
+        if root not in sys.stdlib_module_names and root != module:
+            # Summing self times charges each package for its own modules only, however it was reached
+            profile.packages[root] = profile.packages.get(root, 0.0) + int(own) / 1e6
+    return profile
+
+def format_profile(profile: ImportProfile, top: int = 8) -> str:
+    lines = [f"{profile.module}: {profile.seconds:.3f}s"]
+    ranked = sorted(profile.packages.items(), key=lambda item: -item[1])
+    for package, seconds in [(package, seconds) for package, seconds in ranked if seconds >= 0.001][:top]:
+        lines.append(f"    {package:<28}{seconds:>8.3f}s")
+    if profile.heavy:
+        lines.append(f"    heavy: {', '.join(profile.heavy)}")
+    return "\n".join(lines)
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Profile cold-start import times")
+    parser.add_argument("modules", nargs="*", default=list(ENTRY_POINTS))
+    parser.add_argument("--top", type=int, default=8, help="Heaviest packages to list per module")
+    parser.add_argument("--check", action="store_true",
+                        help=f"Exit non-zero if a worker module imports any of: {', '.join(HEAVY_PACKAGES)}")
+    args = parser.parse_args(argv)
+
+    failed = []
+    for module in args.modules:
+        profile = profile_import(module)
+        print(format_profile(profile, args.top))
+        if module in WORKER_MODULES and profile.heavy:
+            failed.append(module)
+
+    if args.check and failed:
+        print(f"\nWorker modules importing heavy packages: {', '.join(failed)}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+import numpy as np
+from typing import Dict, List, Optional
+
+from f1_engines import RaceEnsemble
+
+# How far the target's odds are tilted; see ImportanceTilt
+OVERTAKE_TILT = 3.0  # Factor on the odds of the target passing the car ahead
+DEFEND_TILT = 3.0  # Divisor of the odds of the target being passed
+TILT_BELOW = 0.1  # Only checks less likely than this are tilted; likelier ones need no help and add weight noise
+DNF_TILT = 0.25  # Factor on the target's chance of retiring on a lap
+AHEAD_DNF_TILT = 10.0  # Factor on the chance of a car running ahead of the target retiring on a lap
+QUALIFYING_SHIFT = 0.5  # Standard deviations the target's qualifying draw is moved toward a faster lap
+
+class ImportanceTilt:
+    """Tilts one driver's race in their favour, including the reliability of the cars ahead, and tracks the likelihood ratio
+
+    The batched engines hand every random event that involves the target to
+    this object instead of deciding it themselves. An unlikely overtake (p
+    below TILT_BELOW) the target attempts has its odds p / (1 - p)
+    multiplied by OVERTAKE_TILT and one against the target has them divided
+    by DEFEND_TILT; the target retires with DNF_TILT times the usual
+    chance and every car ahead of them with AHEAD_DNF_TILT times it, and the
+    standard normal behind the target's qualifying time has its mean moved
+    by -QUALIFYING_SHIFT where qualifying is random. In the dry the grid is
+    fixed, so passes and retirements ahead are what lift the target. Each
+    simulation's log_weight accumulates log(p(event) / q(event)), so weighting outcomes by
+    exp(log_weight) gives unbiased estimates under the untilted model.
+
+    The tilt pays off for rare outcomes; for a driver who is already likely
+    to score, the weights spread out and plain sampling is more precise.
+    """
+
+    def __init__(self, target: int, num_simulations: int, overtake_tilt: float = OVERTAKE_TILT,
+                 defend_tilt: float = DEFEND_TILT, dnf_tilt: float = DNF_TILT,
+                 ahead_dnf_tilt: float = AHEAD_DNF_TILT, qualifying_shift: float = QUALIFYING_SHIFT):
+        self.target = target
+        self.overtake_tilt = overtake_tilt
+        self.defend_tilt = defend_tilt
+        self.dnf_tilt = dnf_tilt
+        self.ahead_dnf_tilt = ahead_dnf_tilt
+        self.qualifying_shift = qualifying_shift
+        self.log_weight = np.zeros(num_simulations)
+
+    @property
+    def weights(self) -> np.ndarray:
+        return np.exp(self.log_weight)
+
+    def _reweight(self, involved: np.ndarray, p: np.ndarray, q: np.ndarray, happened: np.ndarray):
+        """Add log(p / q) for events that happened and log((1 - p) / (1 - q)) for ones that did not"""
+        p, q, happened = p[involved], q[involved], happened[involved]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratio = np.where(happened, p / q, (1 - p) / (1 - q))
+        rows = np.nonzero(involved)[0]
+        np.add.at(self.log_weight, rows, np.log(np.where(np.isfinite(ratio), ratio, 1.0)))
+
+    def qualifying_noise(self, noise: np.ndarray, active) -> np.ndarray:
+        """Shift the target's standard normal qualifying draw in the simulations where it counts"""
+        active = np.broadcast_to(active, noise.shape[:1])
+        shifted = noise[:, self.target] - self.qualifying_shift
+        # log N(z; 0, 1) - log N(z; -shift, 1)
+        self.log_weight += np.where(active, self.qualifying_shift * shifted + self.qualifying_shift ** 2 / 2, 0.0)
+        noise[:, self.target] = np.where(active, shifted, noise[:, self.target])
+        return noise
+
+    def retirements(self, order: np.ndarray, probability: np.ndarray, draws: np.ndarray) -> np.ndarray:
+        """Which drivers retire this lap (flagged by position), with the target's and the cars ahead's chances tilted"""
+        probability = np.clip(probability, 0.0, 1.0)
+        target = order == self.target
+        ahead = np.arange(order.shape[1]) < np.argmax(target, axis=1)[:, None]
+        tilted = np.where(target, probability * self.dnf_tilt,
+                          np.where(ahead, np.minimum(probability * self.ahead_dnf_tilt, 1.0), probability))
+        retiring = draws < tilted
+        self._reweight(target | ahead, probability, tilted, retiring)
+        return retiring
+
+    def overtakes(self, order: np.ndarray, swap_prob, draws: np.ndarray, boost: Optional[np.ndarray] = None
+                  ) -> np.ndarray:
+        """One lap of adjacent-pair overtakes, front to back, like f1_vectorized.sweep_overtakes
+
+        draws are uniforms already divided by boost (the safety car factor),
+        so a pair passes with probability min(1, swap_prob * boost).
+        """
+        boost = np.ones_like(draws) if boost is None else boost
+        rows = np.arange(order.shape[0])
+        for i in range(order.shape[1] - 1):
+            ahead = order[:, i].copy()
+            behind = order[:, i + 1].copy()
+            p = np.clip(swap_prob(rows, ahead, behind) * boost[:, i], 0.0, 1.0)
+            attacking = behind == self.target
+            defending = ahead == self.target
+            odds = np.where(p >= TILT_BELOW, 1.0,
+                            np.where(attacking, self.overtake_tilt, np.where(defending, 1 / self.defend_tilt, 1.0)))
+            q = odds * p / (1 - p + odds * p)
+            swap = draws[:, i] * boost[:, i] < q
+            self._reweight(attacking | defending, p, q, swap)
+            order[swap, i] = behind[swap]
+            order[swap, i + 1] = ahead[swap]
+        return order
+
+def importance_report(ensemble: RaceEnsemble, target: str) -> Dict:
+    """Target's weighted win, podium and points estimates with their standard errors and effective sample sizes
+
+    effective_sample_size is the number of plain simulations that would give
+    the same standard error; weight_effective_sample_size is Kish's
+    (sum w)^2 / sum w^2, which drops when a few simulations dominate.
+    """
+    weights = ensemble.weights
+    num_simulations = ensemble.num_simulations
+    position = np.argmax(ensemble.finish == ensemble.driver_names.index(target), axis=1)
+    report = {"target": target, "num_simulations": num_simulations,
+              "weight_effective_sample_size": round(float(weights.sum() ** 2 / (weights ** 2).sum()), 1)}
+    for kind, top in (("win", 1), ("podium", 3), ("points", 10)):
+        weighted = weights * (position < top)
+        estimate = float(weighted.mean())
+        standard_error = float(weighted.std() / np.sqrt(num_simulations))
+        plain_variance = estimate * (1 - estimate)
+        report[kind] = {
+            "probability": estimate,
+            "standard_error": standard_error,
+            "effective_sample_size": (round(plain_variance / standard_error ** 2, 1) if standard_error > 0
+                                      else float(num_simulations))
+        }
+    return report
+
+def check_target(driver_names: List[str], target: str) -> int:
+    if target not in driver_names:
+        raise ValueError(f"Unknown importance target '{target}'. Available: {', '.join(driver_names)}")
+    return driver_names.index(target)
@@ -0,0 +1,164 @@
+import time
+import numpy as np
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from f1_realistic_simulation import F1RealisticSimulation, TireCompound, TireStrategy, WeatherCondition
+from f1_scheduler import COST_SMOOTHING
+from f1_vectorized import position_counts, probabilities_from_counts
+
+LIVE_LATENCY = 0.03  # Seconds an update aims to take when its ensemble size is left to the simulator
+MIN_LIVE_SIMULATIONS = 200
+MAX_LIVE_SIMULATIONS = 20000
+CALIBRATION_SIMULATIONS = 500  # Warm-up run that gives the first cost estimate
+CALIBRATION_LAPS = 4
+
+@dataclass
+class RaceState:
+    """A race underway, after `lap` completed laps
+
+    order is the running order, leader first; retired drivers may be left
+    out of it and are placed behind the runners in the order given. Drivers
+    missing from tires are on new tires of the class the weather calls for.
+    weather_forecast, if given, lets conditions change over the remaining
+    laps as in f1_weather.sample_weather; otherwise the current weather
+    holds. total_laps defaults to the track's race_laps.
+    """
+    lap: int
+    order: List[str]
+    tires: Dict[str, TireStrategy] = field(default_factory=dict)
+    retired: List[str] = field(default_factory=list)
+    weather: WeatherCondition = WeatherCondition.DRY
+    weather_forecast: Optional[Dict] = None
+    total_laps: Optional[int] = None
+
+    @classmethod
+    def parse(cls, data: Dict) -> "RaceState":
+        """From JSON such as {"lap": 30, "order": [...], "retired": [...], "weather": "light_rain",
+        "tires": {"Max Verstappen": {"compound": "medium", "age": 12, "wear": 0.4}}}"""
+        unknown = sorted(set(data) - {"lap", "order", "tires", "retired", "weather", "weather_forecast",
+                                      "total_laps"})
+        if unknown:
+            raise ValueError(f"Unknown race state keys: {', '.join(unknown)}")
+        return cls(
+            lap=int(data["lap"]),
+            order=list(data["order"]),
+            tires={name: TireStrategy(compound=TireCompound(tire["compound"]), age=int(tire.get("age", 0)),
+                                      wear=float(tire.get("wear", 0.0)),
+                                      temperature=float(tire.get("temperature", 0.0)))
+                   for name, tire in data.get("tires", {}).items()},
+            retired=list(data.get("retired", [])),
+            weather=WeatherCondition(data.get("weather", WeatherCondition.DRY.value)),
+            weather_forecast=data.get("weather_forecast"),
+            total_laps=int(data["total_laps"]) if data.get("total_laps") is not None else None
+        )
+
+class LiveSimulator:
+    """Conditional odds for one race as it runs
+
+    The track tables are compiled once, so each update only simulates the
+    remaining laps from the given state. The batched race kernel uses tire
+    wear and the tire class (slicks, intermediates, wets); a TireStrategy's
+    age and temperature do not enter the model.
+
+    Unless an update asks for a number of simulations, the ensemble is sized
+    to finish in about `latency` seconds: the cost per simulated lap is
+    measured by a small warm-up run and refined after every update, so late
+    in the race, with few laps left, updates get larger ensembles.
+    """
+
+    def __init__(self, model: F1RealisticSimulation, track_name: str, latency: float = LIVE_LATENCY):
+        self.model = model
+        self.track_name = track_name
+        self.track = model.tracks[track_name]
+        self.tables = model.compile_tables(track_name)
+        self.index = {name: i for i, name in enumerate(self.tables.driver_names)}
+        self.latency = latency
+        self.seconds_per_simulation_lap: Dict[bool, float] = {}  # By whether the weather model runs
+        order = list(self.index)
+        self.update(RaceState(lap=max(0, self.track.race_laps - CALIBRATION_LAPS), order=order),
+                    CALIBRATION_SIMULATIONS)
+
+    def ensemble_size(self, laps_remaining: int, weather: bool = False) -> int:
+        """Simulations an update over laps_remaining laps can run within the latency target"""
+        if laps_remaining <= 0:
+            return MIN_LIVE_SIMULATIONS
+        cost = self.seconds_per_simulation_lap.get(weather, self.seconds_per_simulation_lap[False])
+        affordable = self.latency / (cost * laps_remaining)
+        return int(np.clip(affordable, MIN_LIVE_SIMULATIONS, MAX_LIVE_SIMULATIONS))
+
+    def default_simulations(self, state: RaceState) -> int:
+        """Ensemble size update() picks for this state when none is given"""
+        from f1_weather import REQUIRED_TIRES, TIRE_CLASSES
+        laps_remaining = (state.total_laps or self.track.race_laps) - state.lap
+        wet = (bool(state.weather_forecast) or REQUIRED_TIRES[state.weather] > 0
+               or any(TIRE_CLASSES[tire.compound] for tire in state.tires.values()))
+        return self.ensemble_size(laps_remaining, wet)
+
+    def _driver_order(self, state: RaceState) -> List[int]:
+        unknown = [name for name in state.order + state.retired + list(state.tires) if name not in self.index]
+        if unknown:
+            raise ValueError(f"Unknown drivers: {', '.join(dict.fromkeys(unknown))}")
+        running = [name for name in state.order if name not in state.retired]
+        names = running + state.retired
+        if len(set(names)) != len(names):
+            raise ValueError("Each driver may appear only once in the running order and once in retired")
+        missing = [name for name in self.index if name not in names]
+        if missing:
+            raise ValueError(f"Drivers missing from the running order: {', '.join(missing)}")
+        return [self.index[name] for name in names]
+
+    def update(self, state: RaceState, num_simulations: Optional[int] = None, seed: Optional[int] = None) -> Dict:
+        """Win, podium, points and retirement probabilities from the state to the flag"""
+        from f1_weather import REQUIRED_TIRES, TIRE_CLASSES, WeatherForecast, continue_weather
+        start = time.perf_counter()
+        total_laps = state.total_laps or self.track.race_laps
+        if not 0 <= state.lap <= total_laps:
+            raise ValueError(f"lap must be between 0 and {total_laps}")
+        order = self._driver_order(state)
+        num_drivers = len(order)
+        retired = np.zeros(num_drivers, dtype=bool)
+        retired[[self.index[name] for name in state.retired]] = True
+        wear = np.zeros(num_drivers)
+        tires = np.full(num_drivers, REQUIRED_TIRES[state.weather], dtype=np.int8)
+        for name, tire in state.tires.items():
+            wear[self.index[name]] = tire.wear
+            tires[self.index[name]] = TIRE_CLASSES[tire.compound]
+
+        forecast = WeatherForecast.parse(state.weather_forecast) if state.weather_forecast else None
+        # A dry race on slicks to the flag is the plain dry model, without the weather draws
+        wet = forecast is not None or state.weather != WeatherCondition.DRY or bool(tires.any())
+        laps_remaining = total_laps - state.lap
+        num_simulations = num_simulations or self.default_simulations(state)
+        if not 0 < num_simulations <= MAX_LIVE_SIMULATIONS:
+            raise ValueError(f"num_simulations must be between 1 and {MAX_LIVE_SIMULATIONS}")
+
+        rng = np.random.default_rng(seed)
+        weather = None
+        if wet:
+            weather = continue_weather(state.weather, state.lap, num_simulations, rng, forecast,
+                                       self.track.weather_sensitivity, total_laps)
+        else:
+            tires = None
+        grid = np.repeat(np.array(order)[None, :], num_simulations, axis=0)
+        finish, dnf = self.model.simulate_race_vectorized(
+            self.track_name, grid, rng, self.tables, weather=weather, start_lap=state.lap, wear=wear, tires=tires,
+            retired=retired, race_laps=total_laps, hold_retired=True)
+
+        seconds = time.perf_counter() - start
+        if laps_remaining:
+            measured = seconds / (num_simulations * laps_remaining)
+            previous = self.seconds_per_simulation_lap.get(wet)
+            self.seconds_per_simulation_lap[wet] = (measured if previous is None
+                                                    else previous + COST_SMOOTHING * (measured - previous))
+        names = self.tables.driver_names
+        return {
+            "track": self.track_name,
+            "lap": state.lap,
+            "laps_remaining": laps_remaining,
+            "num_simulations": num_simulations,
+            "seed": seed,
+            **probabilities_from_counts(position_counts(finish, num_drivers), names, num_simulations),
+            "dnf_probabilities": dict(zip(names, dnf.mean(axis=0).tolist())),
+            "seconds": seconds
+        }
@@ -0,0 +1,87 @@
+import warnings
+import numpy as np
+from typing import Dict, List
+
+from f1_engines import RaceEnsemble
+
+QMC_REPLICATES = 8  # Independent scrambles per run, for the randomised-QMC error estimate
+
+class SobolDraws:
+    """Generator wrapper that answers uniform and normal requests with scrambled Sobol points
+
+    Every call gets its own scrambled Sobol set with one dimension per column
+    (e.g. one per driver), so the rows of that call are spread evenly over
+    the unit cube instead of at random; normals go through the inverse normal
+    CDF. The scramble and a row shuffle are seeded from rng, so each point is
+    still uniformly distributed, separate calls are independent and averages
+    stay unbiased. Other methods fall through to rng.
+    """
+
+    def __init__(self, rng: np.random.Generator):
+        self.rng = rng
+
+    def __getattr__(self, name):
+        return getattr(self.rng, name)
+
+    def random(self, size):
+        from scipy.stats import qmc
+        size = (size,) if np.isscalar(size) else tuple(size)
+        sobol = qmc.Sobol(int(np.prod(size[1:], dtype=np.int64)), scramble=True, seed=self.rng)
+        with warnings.catch_warnings():
+            # Any prefix of the sequence is well spread; powers of two are only the best case
+            warnings.filterwarnings("ignore", message="The balance properties of Sobol")
+            points = sobol.random(size[0])
+        # Sets from separate calls share the unscrambled Sobol structure, so row i of two calls
+        # would be dependent; shuffling rows pairs them at random (Latin supercube padding)
+        return points[self.rng.permutation(size[0])].reshape(size)
+
+    def normal(self, loc=0.0, scale=1.0, size=None):
+        from scipy.special import ndtri
+        u = np.clip(self.random(size), np.finfo(float).tiny, 1 - np.finfo(float).epsneg)
+        return loc + scale * ndtri(u)
+
+def replicate_blocks(num_simulations: int, replicates: int = QMC_REPLICATES) -> List[slice]:
+    """Contiguous, nearly equal blocks of simulations, one per randomised-QMC replicate"""
+    replicates = max(1, min(replicates, num_simulations))
+    edges = np.linspace(0, num_simulations, replicates + 1).astype(int)
+    return [slice(start, end) for start, end in zip(edges[:-1], edges[1:])]
+
+def qmc_report(ensemble: RaceEnsemble) -> Dict:
+    """Pole, mean grid position and win estimates with randomised-QMC standard errors
+
+    Each replicate is an independently scrambled Sobol run, so the spread of
+    the replicate estimates gives the standard error. effective_sample_size
+    is the number of plain Monte Carlo simulations with the same standard
+    error. Where qualifying is not random (dry realistic runs) the backend
+    draws plain numbers instead, the grid never varies, and sampling is
+    "plain": the replicates are then ordinary Monte Carlo batches.
+    """
+    names = ensemble.driver_names
+    num_drivers = len(names)
+    replicates = np.unique(ensemble.replicate)
+    grid_position = np.empty((ensemble.num_simulations, num_drivers))
+    np.put_along_axis(grid_position, ensemble.grid.astype(np.intp), np.arange(ensemble.grid.shape[1])[None, :],
+                      axis=1)
+    measures = {
+        "pole": np.eye(num_drivers)[ensemble.grid[:, 0]],
+        "grid_position": grid_position + 1,
+        "win": np.eye(num_drivers)[ensemble.finish[:, 0]],
+    }
+
+    quasi_random = bool((ensemble.grid != ensemble.grid[0]).any())
+    report = {"replicates": len(replicates), "num_simulations": ensemble.num_simulations,
+              "sampling": "sobol" if quasi_random else "plain"}
+    for measure, values in measures.items():
+        per_replicate = np.array([values[ensemble.replicate == r].mean(axis=0) for r in replicates])
+        estimate = per_replicate.mean(axis=0)
+        standard_error = (per_replicate.std(axis=0, ddof=1) / np.sqrt(len(replicates)) if len(replicates) > 1
+                          else np.full(num_drivers, np.nan))
+        plain_variance = values.var(axis=0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            effective = np.where(standard_error > 0, plain_variance / standard_error ** 2, np.nan)
+        report[measure] = {
+            name: {"estimate": float(e), "standard_error": float(se),
+                   "effective_sample_size": None if np.isnan(ess) else round(float(ess), 1)}
+            for name, e, se, ess in zip(names, estimate, standard_error, effective)
+        }
+    return report
@@ -0,0 +1,140 @@
+import numpy as np
+from itertools import combinations
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from f1_engines import RaceEnsemble
+from f1_ensemble_store import ArrayChunk, Event, EventBuilders
+
+MAX_CODE = np.iinfo(np.int64).max  # Packed top-k orders must fit in an int64
+
+class OutcomeQueries(EventBuilders):
+    """Joint and conditional questions over an ensemble of finishing orders held in memory
+
+    Events come from the same builders as f1_ensemble_store.EnsembleStore
+    (wins, finishes_top, ahead, ...) and are evaluated once over the whole
+    ensemble. Orders are kept as int8 driver indices (simulations x
+    positions), and top-k orders are packed into one integer per simulation
+    on demand, so every query is a handful of array operations.
+    """
+
+    def __init__(self, driver_names: Sequence[str], finish: np.ndarray, teams: Optional[Dict[str, str]] = None,
+                 grid: Optional[np.ndarray] = None, dnf: Optional[np.ndarray] = None):
+        self.driver_names = list(driver_names)
+        self.finish = finish.astype(np.int8)
+        self.chunk = ArrayChunk(self.finish, grid.astype(np.int8) if grid is not None else None, dnf)
+        self.teams = teams or {}
+        self._codes = {}
+
+    @classmethod
+    def from_race_results(cls, driver_names: Sequence[str], race_results: List[List[str]],
+                          teams: Optional[Dict[str, str]] = None) -> "OutcomeQueries":
+        """Encode the name lists simulate_race returns"""
+        index = {name: i for i, name in enumerate(driver_names)}
+        finish = np.array([[index[name] for name in race] for race in race_results], dtype=np.int8)
+        return cls(driver_names, finish.reshape(len(race_results), len(driver_names)), teams)
+
+    @classmethod
+    def from_ensemble(cls, ensemble: RaceEnsemble, teams: Optional[Dict[str, str]] = None) -> "OutcomeQueries":
+        return cls(ensemble.driver_names, ensemble.finish, teams, ensemble.grid, ensemble.dnf)
+
+    @property
+    def num_simulations(self) -> int:
+        return len(self.finish)
+
+    @property
+    def position(self) -> np.ndarray:
+        """0-based finishing position of each driver, (simulations x drivers)"""
+        return self.chunk.finish_position
+
+    def top(self, driver: str, places: int) -> Event:
+        return self.finishes_top(driver, places)
+
+    def holds(self, event: Union[Event, np.ndarray]) -> np.ndarray:
+        """Per-simulation flags of an event (boolean arrays pass through)"""
+        return event.evaluate(self.chunk) if isinstance(event, Event) else event
+
+    def probability(self, event: Union[Event, np.ndarray], given: Optional[Union[Event, np.ndarray]] = None) -> float:
+        """P(event) or P(event | given) over the ensemble"""
+        holds = self.holds(event)
+        if given is None:
+            return float(holds.mean())
+        condition = self.holds(given)
+        total = condition.sum()
+        return float((holds & condition).sum() / total) if total else float("nan")
+
+    # Common questions
+    def head_to_head(self, driver: str, rival: str) -> float:
+        """Chance driver finishes ahead of rival"""
+        return self.probability(self.ahead(driver, rival))
+
+    def teammate_head_to_heads(self) -> Dict[Tuple[str, str], float]:
+        """Head-to-head for every pair of teammates, keyed (driver, teammate)"""
+        by_team = {}
+        for driver in self.driver_names:
+            if driver in self.teams:
+                by_team.setdefault(self.teams[driver], []).append(driver)
+        return {(a, b): self.head_to_head(a, b)
+                for drivers in by_team.values() for a, b in combinations(drivers, 2)}
+
+    def team_on_podium(self, team: str) -> float:
+        """Chance every driver of the team finishes in the top 3"""
+        drivers = [driver for driver in self.driver_names if self.teams.get(driver) == team]
+        if not drivers:
+            raise ValueError(f"No drivers for team '{team}'")
+        return self.probability(self.all_top(drivers, 3))
+
+    def exact_forecast(self, order: Sequence[str]) -> float:
+        """Chance the first len(order) finishers are exactly these drivers in this order"""
+        return self.probability(self.top_codes(len(order)) == self._encode(order))
+
+    def combination_forecast(self, drivers: Sequence[str]) -> float:
+        """Chance the first len(drivers) finishers are these drivers in any order"""
+        return self.probability(self.all_top(drivers, len(drivers)))
+
+    def order_distribution(self, places: int = 3, limit: Optional[int] = 10) -> List[Tuple[Tuple[str, ...], float]]:
+        """Most likely orders for the first `places` finishers, with probabilities"""
+        codes, counts = np.unique(self.top_codes(places), return_counts=True)
+        ranked = np.argsort(counts, kind="stable")[::-1][:limit]
+        return [(self._decode(int(codes[i]), places), float(counts[i] / self.num_simulations)) for i in ranked]
+
+    def position_matrix(self) -> np.ndarray:
+        """Probability of each (driver, position), shape (drivers, positions)"""
+        num_drivers = len(self.driver_names)
+        flat = self.finish.astype(np.int64) * num_drivers + np.arange(num_drivers)
+        counts = np.bincount(flat.ravel(), minlength=num_drivers * num_drivers)
+        return counts.reshape(num_drivers, num_drivers) / self.num_simulations
+
+    # Packed top-k orders: driver indices as base-num_drivers digits
+    def max_places(self) -> int:
+        """Deepest order whose packed code fits in an int64
+
+        The largest code for k places is num_drivers ** k - 1. For 20 drivers
+        that allows 14 places (20 ** 14 is about 1.6e18, below 2 ** 63, about
+        9.2e18); 20 ** 15 would overflow.
+        """
+        num_drivers = len(self.driver_names)
+        places = 1
+        while places < num_drivers and num_drivers ** (places + 1) - 1 <= MAX_CODE:
+            places += 1
+        return places
+
+    def top_codes(self, places: int) -> np.ndarray:
+        if not 1 <= places <= self.max_places():
+            raise ValueError(f"Orders can be packed for 1 to {self.max_places()} places, not {places}")
+        if places not in self._codes:
+            weights = len(self.driver_names) ** np.arange(places - 1, -1, -1, dtype=np.int64)
+            self._codes[places] = self.finish[:, :places].astype(np.int64) @ weights
+        return self._codes[places]
+
+    def _encode(self, order: Sequence[str]) -> int:
+        code = 0
+        for driver in order:
+            code = code * len(self.driver_names) + self._index(driver)
+        return code
+
+    def _decode(self, code: int, places: int) -> Tuple[str, ...]:
+        names = []
+        for _ in range(places):
+            code, digit = divmod(code, len(self.driver_names))
+            names.append(self.driver_names[digit])
+        return tuple(reversed(names))
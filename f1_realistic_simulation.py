@@ -1,10 +1,28 @@
 import numpy as np
-import pandas as pd
-from dataclasses import dataclass
-from typing import Dict, List, Tuple, Optional
+import copy
+from dataclasses import dataclass, replace
+from typing import Dict, List, Tuple, Optional, TYPE_CHECKING
 from enum import Enum
 import random
-from datetime import datetime
+
+from f1_engines import MonteCarloEngine, RaceEnsemble
+from f1_vectorized import (grid_from_times, position_counts, probabilities_from_counts, resolve_overtakes,
+                           retire_to_back)
+
+if TYPE_CHECKING:
+    from f1_importance import ImportanceTilt
+    from f1_tires import StintPlans
+    from f1_weather import WeatherScenarios
+
+RACE_LAPS = 50  # Default race distance; Track.race_laps sets it per track
+
+# Event-driven race model
+PIT_WEAR_THRESHOLD = 0.8  # Tires are considered worn past this wear level
+PIT_CHANCE_WHEN_WORN = 0.3  # Per-lap chance to pit once tires are worn
+SAFETY_CAR_HAZARD = 0.015  # Per-lap chance of a safety car on a permanent circuit
+STREET_SAFETY_CAR_MULTIPLIER = 1.5  # Street circuits bring out the safety car more often
+SAFETY_CAR_DNF_TRIGGER = 0.5  # Chance that a retirement brings out the safety car
+SAFETY_CAR_LAPS = (3, 5)  # Min/max laps behind the safety car
 
 class TireCompound(Enum):
     SOFT = "soft"
@@ -71,6 +89,7 @@ class Track:
     weather: WeatherCondition = WeatherCondition.DRY
     temperature: float = 25.0  # Celsius
     humidity: float = 50.0  # Percentage
+    race_laps: int = RACE_LAPS
 
 @dataclass
 class TireStrategy:
@@ -79,7 +98,28 @@ class TireStrategy:
     wear: float  # 0-1, 1 = completely worn
     temperature: float  # Tire temperature
 
-class F1RealisticSimulation:
+@dataclass
+class TrackTables:
+    """Per-track quantities the batched engine computes once per run"""
+    driver_names: List[str]
+    qualifying_base: np.ndarray  # Deterministic part of each driver's qualifying time
+    qualifying_sd: np.ndarray  # Consistency spread per driver
+    wet: bool  # Qualifying times get the weather multiplier
+    dnf_prob: np.ndarray  # Per-lap retirement chance per driver
+    wear_rate: np.ndarray  # Per-lap tire wear per driver
+    overtake_base: np.ndarray  # Overtake term without tires, indexed [behind, ahead]
+    track_factor: float  # 1 - overtaking difficulty
+    # For tables stacked over scenarios (f1_scenarios), the leading table axis of each simulation
+    scenario: Optional[np.ndarray] = None
+    
+    def per_simulation(self, values: np.ndarray) -> np.ndarray:
+        """A per-driver table, broadcastable against (simulations, drivers)"""
+        return values if self.scenario is None else values[self.scenario]
+
+class F1RealisticSimulation(MonteCarloEngine):
+    summary_title = "Realistic F1 2025 Race Prediction"
+    run_banner = "realistic F1"
+    
     def __init__(self):
         self.drivers = self._initialize_drivers()
         self.cars = self._initialize_cars()
@@ -403,9 +443,31 @@ class F1RealisticSimulation:
         return qualifying_results
     
     def simulate_race(self, track_name: str, qualifying_results: List[List[Tuple[str, float]]], 
-                     num_simulations: int = 1000) -> List[List[str]]:
-        """Realistic race simulation with tire strategy, pit stops, DNFs, etc."""
+                     num_simulations: int = 1000, event_driven: bool = False,
+                     stint_plans: Optional["StintPlans"] = None,
+                     wear_spread: Optional[float] = None) -> List[List[str]]:
+        """Realistic race simulation with tire strategy, pit stops, DNFs, etc.
+        
+        With event_driven=True the race is advanced from event to event (DNFs,
+        pit stops, safety car periods, overtakes) instead of lap by lap. Passing
+        stint_plans from f1_tires.plan_stints replaces the per-lap tire model with
+        lookups into the precomputed wear arrays.
+        
+        The event-driven kernel draws overtakes under an envelope that grows
+        with the spread of tire wear in each race. wear_spread fixes that
+        spread instead (it must bound the real one), so races that differ only
+        in stint plans use the same random numbers; see
+        StintPlans.max_wear_spread.
+        """
         track = self.tracks[track_name]
+        if event_driven:
+            return self._simulate_race_event_driven(track, qualifying_results, num_simulations, stint_plans,
+                                                    wear_spread)
+        
+        plan_index = {}
+        if stint_plans is not None:
+            plan_index = {name: i for i, name in enumerate(stint_plans.driver_names)}
+        
         race_results = []
         
         for sim in range(num_simulations):
@@ -415,18 +477,20 @@ class F1RealisticSimulation:
             
             # Initialize tire strategies for each driver
             tire_strategies = {}
-            for driver_name in final_positions:
-                # Random tire strategy (soft/medium/hard)
-                compounds = [TireCompound.SOFT, TireCompound.MEDIUM, TireCompound.HARD]
-                tire_strategies[driver_name] = TireStrategy(
-                    compound=random.choice(compounds),
-                    age=0,
-                    wear=0.0,
-                    temperature=track.temperature
-                )
+            lap_wear = None
+            if stint_plans is None:
+                for driver_name in final_positions:
+                    # Random tire strategy (soft/medium/hard)
+                    compounds = [TireCompound.SOFT, TireCompound.MEDIUM, TireCompound.HARD]
+                    tire_strategies[driver_name] = TireStrategy(
+                        compound=random.choice(compounds),
+                        age=0,
+                        wear=0.0,
+                        temperature=track.temperature
+                    )
             
-            # Race simulation (50 laps)
-            for lap in range(50):
+            # Race simulation
+            for lap in range(track.race_laps):
                 # Check for DNFs
                 for i, driver_name in enumerate(final_positions):
                     if driver_name in self.drivers:
@@ -441,24 +505,27 @@ class F1RealisticSimulation:
                             final_positions.append(driver_name)  # Move to back
                 
                 # Tire wear and pit stops
-                for driver_name in final_positions:
-                    if driver_name in tire_strategies:
-                        tire = tire_strategies[driver_name]
-                        driver = self.drivers[driver_name]
-                        car = self.cars[driver.team]
+                if stint_plans is not None:
+                    lap_wear = stint_plans.wear[sim, lap].tolist()
+                else:
+                    for driver_name in final_positions:
+                        if driver_name in tire_strategies:
+                            tire = tire_strategies[driver_name]
+                            driver = self.drivers[driver_name]
+                            car = self.cars[driver.team]
                         
-                        # Increase tire wear
-                        tire.age += 1
-                        wear_rate = track.tire_wear_rate * car.tire_degradation * (1 - driver.tire_management / 100)
-                        tire.wear += wear_rate
+                            # Increase tire wear
+                            tire.age += 1
+                            wear_rate = track.tire_wear_rate * car.tire_degradation * (1 - driver.tire_management / 100)
+                            tire.wear += wear_rate
                         
-                        # Pit stop if tires are worn
-                        if tire.wear > 0.8 and np.random.random() < 0.3:  # 30% chance to pit when worn
-                            # Change tires
-                            new_compounds = [TireCompound.SOFT, TireCompound.MEDIUM, TireCompound.HARD]
-                            tire.compound = random.choice(new_compounds)
-                            tire.age = 0
-                            tire.wear = 0.0
+                            # Pit stop if tires are worn
+                            if tire.wear > PIT_WEAR_THRESHOLD and np.random.random() < PIT_CHANCE_WHEN_WORN:
+                                # Change tires
+                                new_compounds = [TireCompound.SOFT, TireCompound.MEDIUM, TireCompound.HARD]
+                                tire.compound = random.choice(new_compounds)
+                                tire.age = 0
+                                tire.wear = 0.0
                 
                 # Overtaking simulation
                 for i in range(len(final_positions) - 1):
@@ -487,6 +554,9 @@ class F1RealisticSimulation:
                         tire_advantage = 0
                         if tire_ahead and tire_behind:
                             tire_advantage = (tire_ahead.wear - tire_behind.wear) * 0.5
+                        elif lap_wear is not None:
+                            tire_advantage = (lap_wear[plan_index[driver_ahead_name]] -
+                                              lap_wear[plan_index[driver_behind_name]]) * 0.5
                         
                         # Overtaking probability
                         base_overtake_prob = 0.02  # 2% base chance
@@ -510,96 +580,451 @@ class F1RealisticSimulation:
         
         return race_results
     
-    def run_monte_carlo_simulation(self, track_name: str, num_simulations: int = 10000) -> Dict:
-        """Run complete Monte Carlo simulation"""
-        print(f"Running realistic F1 simulation for {track_name}...")
-        print(f"Number of simulations: {num_simulations}")
-        
-        # Simulate qualifying
-        qualifying_results = self.simulate_qualifying(track_name, num_simulations)
-        
-        # Simulate race
-        race_results = self.simulate_race(track_name, qualifying_results, num_simulations)
-        
-        # Calculate probabilities
-        win_probabilities = self._calculate_win_probabilities(race_results)
-        podium_probabilities = self._calculate_podium_probabilities(race_results)
-        points_probabilities = self._calculate_points_probabilities(race_results)
-        
-        results = {
-            "track": track_name,
-            "num_simulations": num_simulations,
-            "timestamp": datetime.now().isoformat(),
-            "win_probabilities": win_probabilities,
-            "podium_probabilities": podium_probabilities,
-            "points_probabilities": points_probabilities,
-            "race_results": race_results[:100]  # Store first 100 for analysis
-        }
+    def _simulate_race_event_driven(self, track: Track, qualifying_results: List[List[Tuple[str, float]]],
+                                    num_simulations: int,
+                                    stint_plans: Optional["StintPlans"] = None,
+                                    wear_spread: Optional[float] = None) -> List[List[str]]:
+        """Event-driven race simulation
+        
+        Instead of testing every driver and every pair on every lap, DNF laps are
+        drawn from geometric distributions, pit laps from the lap the tires wear
+        out, safety cars are sampled as race-level periods lasting several laps,
+        and overtakes are drawn by thinning over (lap, pair) slots. Laps where
+        nothing happens are skipped entirely.
+        """
+        names = list(self.drivers.keys())
+        index = {name: i for i, name in enumerate(names)}
+        drivers = [self.drivers[name] for name in names]
+        cars = [self.cars[driver.team] for driver in drivers]
+        
+        # Per-lap DNF probability and per-lap tire wear, as in simulate_race
+        dnf_prob = np.array([(1 - car.reliability) * 0.001 + (1 - driver.physical_fitness / 100) * 0.0005
+                             for driver, car in zip(drivers, cars)])
+        wear_rate = np.array([track.tire_wear_rate * car.tire_degradation * (1 - driver.tire_management / 100)
+                              for driver, car in zip(drivers, cars)])
+        
+        # Overtake probability without the tire term, indexed [behind, ahead]
+        pace = np.array([driver.raw_pace for driver in drivers]) / 100
+        aero = np.array([car.aero_efficiency for car in cars]) / 100
+        craft = np.array([driver.race_craft for driver in drivers]) / 100
+        pair_base = (0.02 + ((pace[:, None] - pace[None, :]) + (aero[:, None] - aero[None, :])) * 0.1
+                     + (craft[:, None] - craft[None, :]) * 0.05)
+        
+        plan_columns = None
+        if stint_plans is not None:
+            plan_columns = [stint_plans.driver_names.index(name) for name in names]
+        
+        race_results = []
+        for sim in range(num_simulations):
+            order = [index[driver] for driver, _ in qualifying_results[sim]]
+            wear = stint_plans.wear[sim][:, plan_columns] if stint_plans is not None else None
+            order = self._run_event_driven_race(track, order, dnf_prob, wear_rate, pair_base, wear, wear_spread)
+            race_results.append([names[i] for i in order])
+        
+        return race_results
+    
+    def _run_event_driven_race(self, track: Track, order: List[int], dnf_prob: np.ndarray,
+                               wear_rate: np.ndarray, pair_base: np.ndarray,
+                               wear: Optional[np.ndarray] = None,
+                               wear_spread: Optional[float] = None) -> List[int]:
+        """Run one event-driven race over driver indices and return the finishing order"""
+        num_pairs = len(order) - 1
+        track_factor = 1 - track.overtaking_difficulty
+        laps = track.race_laps
+        
+        # First lap on which the per-lap DNF test would fire (0-based)
+        dnf_lap = np.random.geometric(dnf_prob) - 1
+        retirements = {}
+        for driver in np.flatnonzero(dnf_lap < laps):
+            retirements.setdefault(int(dnf_lap[driver]), []).append(driver)
+        
+        if wear is None:
+            wear = self._sample_tire_wear(wear_rate, laps)
+        under_safety_car, restarts = self._sample_safety_cars(track, dnf_lap)
+        
+        # Candidate overtakes on green-flag laps, drawn at an upper bound on the
+        # overtake probability and accepted with probability p / p_max
+        if wear_spread is None:
+            wear_spread = wear.max() - wear.min()
+        p_max = min(1.0, max(0.0, (pair_base.max() + wear_spread * 0.05) * track_factor))
+        slots = self._sample_candidate_slots(p_max, laps * num_pairs)
+        candidate_laps, candidate_pairs = slots // num_pairs, slots % num_pairs
+        green = ~(under_safety_car[candidate_laps] | restarts[candidate_laps])
+        candidate_laps, candidate_pairs = candidate_laps[green], candidate_pairs[green]
+        acceptance = np.random.random(len(candidate_laps)) * p_max
+        
+        retired = np.zeros(len(order), dtype=bool)
+        event_laps = sorted(set(retirements) | set(candidate_laps.tolist()) | set(np.flatnonzero(restarts).tolist()))
+        candidate = 0
+        
+        for lap in event_laps:
+            # Retirements move to the back in running order
+            for driver in sorted(retirements.get(lap, []), key=order.index):
+                order.remove(driver)
+                order.append(driver)
+                retired[driver] = True
+            
+            lap_wear = wear[lap]
+            
+            # Bunched-up field on the restart lap: every pair gets a go, at double the odds
+            if restarts[lap]:
+                draws = np.random.random(num_pairs)
+                for i in range(num_pairs):
+                    ahead, behind = order[i], order[i + 1]
+                    if retired[behind]:
+                        break
+                    prob = (pair_base[behind, ahead] + (lap_wear[ahead] - lap_wear[behind]) * 0.05) * track_factor
+                    if draws[i] < prob * 2:
+                        order[i], order[i + 1] = behind, ahead
+            
+            while candidate < len(candidate_laps) and candidate_laps[candidate] == lap:
+                i = candidate_pairs[candidate]
+                ahead, behind = order[i], order[i + 1]
+                if not retired[behind]:
+                    prob = (pair_base[behind, ahead] + (lap_wear[ahead] - lap_wear[behind]) * 0.05) * track_factor
+                    if acceptance[candidate] < prob:
+                        order[i], order[i + 1] = behind, ahead
+                candidate += 1
+        
+        return order
+    
+    def _sample_tire_wear(self, wear_rate: np.ndarray, race_laps: int = RACE_LAPS) -> np.ndarray:
+        """Per-lap tire wear (laps x drivers) with pit laps sampled per stint
         
-        self.results.append(results)
+        Wear grows linearly through a stint, so the lap the tires pass the pit
+        threshold is known; the pit lap is that lap plus a geometric delay.
+        """
+        num_drivers = len(wear_rate)
+        with np.errstate(divide="ignore"):
+            laps_to_worn = np.minimum(np.floor(PIT_WEAR_THRESHOLD / wear_rate), race_laps).astype(int) + 1
+        
+        pit_laps = np.zeros((race_laps, num_drivers), dtype=bool)
+        last_pit = np.full(num_drivers, -1)
+        active = np.ones(num_drivers, dtype=bool)
+        while active.any():
+            pit = last_pit + laps_to_worn + np.random.geometric(PIT_CHANCE_WHEN_WORN, size=num_drivers) - 1
+            active &= pit < race_laps
+            pit_laps[pit[active], np.flatnonzero(active)] = True
+            last_pit = np.where(active, pit, last_pit)
+        
+        laps = np.arange(race_laps)[:, None]
+        stint_start = np.maximum.accumulate(np.where(pit_laps, laps, -1), axis=0)
+        return (laps - stint_start) * wear_rate
+    
+    def _sample_safety_cars(self, track: Track, dnf_lap: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Sample safety car periods for one race
+        
+        Returns per-lap flags for laps run behind the safety car and for restart laps.
+        """
+        hazard = SAFETY_CAR_HAZARD
+        if track.track_type == "street":
+            hazard *= STREET_SAFETY_CAR_MULTIPLIER
+        
+        deployments = []
+        lap = np.random.geometric(hazard) - 1
+        while lap < track.race_laps:
+            deployments.append(lap)
+            lap += np.random.geometric(hazard)
+        
+        retirement_laps = dnf_lap[dnf_lap < track.race_laps]
+        if len(retirement_laps):
+            triggered = np.random.random(len(retirement_laps)) < SAFETY_CAR_DNF_TRIGGER
+            deployments.extend(retirement_laps[triggered].tolist())
+        
+        under_safety_car = np.zeros(track.race_laps, dtype=bool)
+        restarts = np.zeros(track.race_laps, dtype=bool)
+        if not deployments:
+            return under_safety_car, restarts
+        
+        durations = np.random.randint(SAFETY_CAR_LAPS[0], SAFETY_CAR_LAPS[1] + 1, size=len(deployments))
+        for start, duration in sorted(zip(deployments, durations)):
+            if not under_safety_car[start]:
+                under_safety_car[start:start + duration] = True
+        
+        restarts[1:] = under_safety_car[:-1] & ~under_safety_car[1:]
+        return under_safety_car, restarts
+    
+    @staticmethod
+    def _sample_candidate_slots(p_max: float, num_slots: int) -> np.ndarray:
+        """Sample slots that each hold an event with probability p_max, via geometric gaps"""
+        if p_max <= 0:
+            return np.empty(0, dtype=int)
+        
+        expected = p_max * num_slots
+        batch = int(expected + 4 * np.sqrt(expected)) + 8
+        slots = np.cumsum(np.random.geometric(p_max, size=batch)) - 1
+        while slots[-1] < num_slots - 1:
+            more = slots[-1] + np.cumsum(np.random.geometric(p_max, size=batch))
+            slots = np.concatenate([slots, more])
+        
+        return slots[slots < num_slots]
+    
+    def plan_stints(self, track_name: str, num_simulations: int, rng=None) -> "StintPlans":
+        """Precompute every driver's stint plan for a batch of races"""
+        from f1_tires import plan_stints
+        track = self.tracks[track_name]
+        return plan_stints(list(self.drivers.values()), self.cars, track, num_simulations, track.race_laps, rng)
+    
+    def with_weather(self, track_name: str, weather: WeatherCondition) -> "F1RealisticSimulation":
+        """Copy of the model with one track's weather replaced; drivers and cars are shared"""
+        model = copy.copy(self)
+        model.tracks = dict(self.tracks)
+        model.tracks[track_name] = replace(self.tracks[track_name], weather=weather)
+        model.results = []
+        return model
+    
+    def prepare_race_options(self, track_name: str, num_simulations: int, rng, planned_tires: bool = False,
+                             weather_forecast=None, **options) -> Dict:
+        """Swap planned_tires=True for precomputed stint plans before the race runs
+        
+        weather_forecast (a WeatherForecast, a dict like {"dry": 0.7,
+        "light_rain": 0.3}, or True for f1_weather.default_forecast) samples the
+        weather of every simulation up front, so one run gives forecast-weighted
+        probabilities.
+        """
+        if planned_tires and weather_forecast is not None:
+            raise ValueError("planned_tires cannot be combined with weather_forecast")
+        if planned_tires:
+            options["stint_plans"] = self.plan_stints(track_name, num_simulations, rng)
+        if weather_forecast is not None:
+            from f1_weather import WeatherForecast, default_forecast, sample_weather
+            track = self.tracks[track_name]
+            forecast = default_forecast(track) if weather_forecast is True else WeatherForecast.parse(weather_forecast)
+            options["weather"] = sample_weather(forecast, track.weather_sensitivity, num_simulations, rng,
+                                                track.race_laps)
+        return options
+    
+    def qualifying_options(self, race_options: Dict) -> Dict:
+        if "weather" in race_options:
+            return {"weather": race_options["weather"].qualifying}
+        return {}
+    
+    def random_qualifying(self, tables: TrackTables, qualifying_options: Dict) -> bool:
+        # Dry grids ignore the random terms (see simulate_qualifying_vectorized)
+        return tables.wet or "weather" in qualifying_options
+    
+    def summarise_ensemble(self, track_name: str, ensemble: RaceEnsemble, backend_name: str,
+                           seed: Optional[int] = None) -> Dict:
+        """Results dict, plus probabilities by race-start weather for weather scenario runs"""
+        results = super().summarise_ensemble(track_name, ensemble, backend_name, seed)
+        if ensemble.weather is not None:
+            from f1_weather import WEATHER_CONDITIONS
+            breakdown = {}
+            for index, condition in enumerate(WEATHER_CONDITIONS):
+                sims = ensemble.weather == index
+                if sims.any():
+                    weights = ensemble.weights[sims] if ensemble.weights is not None else None
+                    counts = position_counts(ensemble.finish[sims], len(ensemble.driver_names), weights)
+                    breakdown[condition.value] = {"share": float(sims.mean()),
+                                                  **probabilities_from_counts(counts, ensemble.driver_names,
+                                                                              int(sims.sum()))}
+            results["weather_breakdown"] = breakdown
         return results
     
-    def _calculate_win_probabilities(self, race_results: List[List[str]]) -> Dict[str, float]:
-        """Calculate win probabilities"""
-        win_counts = {driver: 0 for driver in self.drivers.keys()}
-        total_races = len(race_results)
-        
-        for race in race_results:
-            if race:
-                winner = race[0]
-                if winner in win_counts:
-                    win_counts[winner] += 1
-        
-        return {driver: count / total_races for driver, count in win_counts.items()}
+    def compile_tables(self, track_name: str) -> TrackTables:
+        """Precompute per-driver qualifying, reliability, tire and overtaking terms for the batched engine"""
+        if track_name not in self.tracks:
+            raise ValueError(f"Unknown track '{track_name}'. Available tracks: {', '.join(self.tracks)}")
+        track = self.tracks[track_name]
+        drivers = list(self.drivers.values())
+        cars = [self.cars[driver.team] for driver in drivers]
+        
+        # Same terms as simulate_qualifying, minus the random draws
+        raw_pace = np.array([driver.raw_pace for driver in drivers])
+        car_performance = np.array([(car.aero_efficiency + car.engine_power) / 2 for car in cars])
+        experience = np.array([driver.experience for driver in drivers])
+        experience_bonus = experience * 0.05 if track.track_type == "street" else np.zeros(len(drivers))
+        current_form = np.array([driver.current_form for driver in drivers])
+        recent_avg = np.array([np.mean(driver.recent_results) for driver in drivers])
+        upgrade = np.array([car.car_upgrade_factor for car in cars])
+        qualifying_base = (track.base_qualifying_time + (100 - raw_pace) * 0.03 + (100 - car_performance) * 0.02
+                           - experience_bonus + (current_form - 1.0) + (recent_avg - 10) * 0.1 + (1.0 - upgrade))
+        
+        # Same terms as simulate_race: DNF chance, tire wear and overtaking without the tire term
+        pace = raw_pace / 100
+        aero = np.array([car.aero_efficiency for car in cars]) / 100
+        craft = np.array([driver.race_craft for driver in drivers]) / 100
+        overtake_base = (0.02 + ((pace[:, None] - pace[None, :]) + (aero[:, None] - aero[None, :])) * 0.1
+                         + (craft[:, None] - craft[None, :]) * 0.05)
+        
+        return TrackTables(
+            driver_names=list(self.drivers.keys()),
+            qualifying_base=qualifying_base,
+            qualifying_sd=np.array([(1 - driver.consistency) * 2.0 for driver in drivers]),
+            wet=track.weather != WeatherCondition.DRY,
+            dnf_prob=np.array([(1 - car.reliability) * 0.001 + (1 - driver.physical_fitness / 100) * 0.0005
+                               for driver, car in zip(drivers, cars)]),
+            wear_rate=np.array([track.tire_wear_rate * car.tire_degradation * (1 - driver.tire_management / 100)
+                                for driver, car in zip(drivers, cars)]),
+            overtake_base=overtake_base,
+            track_factor=1 - track.overtaking_difficulty
+        )
     
-    def _calculate_podium_probabilities(self, race_results: List[List[str]]) -> Dict[str, float]:
-        """Calculate podium probabilities"""
-        podium_counts = {driver: 0 for driver in self.drivers.keys()}
-        total_races = len(race_results)
+    def simulate_qualifying_vectorized(self, track_name: str, num_simulations: int = 1000,
+                                       rng=None, tables: Optional[TrackTables] = None,
+                                       weather: Optional[np.ndarray] = None,
+                                       importance: Optional["ImportanceTilt"] = None) -> np.ndarray:
+        """Batched qualifying; returns starting grids as driver indices (simulations x positions)
         
-        for race in race_results:
-            for i, driver in enumerate(race[:3]):
-                if driver in podium_counts:
-                    podium_counts[driver] += 1
+        weather gives each simulation its own condition (indices into
+        f1_weather.WEATHER_CONDITIONS) in place of the track's. importance
+        (f1_importance.ImportanceTilt) tilts the target driver's weather draw.
         
-        return {driver: count / total_races for driver, count in podium_counts.items()}
+        track.weather_sensitivity does not scale the wet multiplier: it acts
+        through the forecast the qualifying condition is drawn from (see
+        f1_weather.default_forecast), as it does for the race, whose laps take
+        their conditions from the same chain. The N(1, 0.5) multiplier is the
+        one simulate_qualifying applies, so both engines agree.
+        """
+        rng = rng if rng is not None else np.random.default_rng()
+        tables = tables or self.compile_tables(track_name)
+        shape = (num_simulations, len(tables.driver_names))
+        times = (tables.per_simulation(tables.qualifying_base)
+                 + rng.normal(0, 1, shape) * tables.per_simulation(tables.qualifying_sd))
+        # simulate_qualifying scales the whole time by the weather draw, which is 0 in the dry
+        if weather is not None:
+            from f1_weather import WEATHER_CONDITIONS
+            wet = weather != WEATHER_CONDITIONS.index(WeatherCondition.DRY)
+        else:
+            wet = np.full(num_simulations, tables.wet)
+        if weather is None and not tables.wet:
+            return grid_from_times(times * 0)
+        # The weather draw dominates wet grids, so that is the draw importance sampling tilts
+        weather_draw = rng.normal(0, 1, shape)
+        if importance is not None:
+            weather_draw = importance.qualifying_noise(weather_draw, wet)
+        times *= np.where(wet[:, None], 1.0 + 0.5 * weather_draw, 0)
+        return grid_from_times(times)
     
-    def _calculate_points_probabilities(self, race_results: List[List[str]]) -> Dict[str, float]:
-        """Calculate points probabilities (top 10)"""
-        points_counts = {driver: 0 for driver in self.drivers.keys()}
-        total_races = len(race_results)
+    def simulate_race_vectorized(self, track_name: str, grid: np.ndarray, rng=None,
+                                 tables: Optional[TrackTables] = None,
+                                 stint_plans: Optional["StintPlans"] = None,
+                                 weather: Optional["WeatherScenarios"] = None,
+                                 importance: Optional["ImportanceTilt"] = None, start_lap: int = 0,
+                                 wear: Optional[np.ndarray] = None, tires: Optional[np.ndarray] = None,
+                                 retired: Optional[np.ndarray] = None, race_laps: Optional[int] = None,
+                                 hold_retired: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """Batched lap-by-lap race from starting grids
+        
+        Mirrors simulate_race: DNFs move to the back, worn tires pit with
+        PIT_CHANCE_WHEN_WORN (or follow stint_plans), and every adjacent pair gets
+        one overtake check per lap, doubled by the per-pair safety car draw.
+        Returns finishing orders (simulations x positions) and DNF flags
+        (simulations x drivers).
+        
+        With weather (from f1_weather.sample_weather) each lap has its own
+        condition per simulation: rain raises the DNF chance, drivers on the
+        wrong tires pit for slicks, intermediates or wets with
+        WEATHER_PIT_CHANCE, and until they do they are easier to pass.
+        
+        importance (f1_importance.ImportanceTilt) decides the target driver's
+        retirements and overtakes, tilted in their favour.
+        
+        To continue a race already underway (f1_live), grid is the running
+        order after start_lap completed laps, and wear, tires (tire classes,
+        with weather) and retired give each driver's state at that point,
+        by driver index. Only the remaining laps, up to race_laps (default:
+        the track's), are simulated. Like simulate_race, the kernel lets cars
+        that have retired keep swapping places at the back; hold_retired
+        leaves them out of every overtake, so no retired car passes a
+        running one.
+        """
+        rng = rng if rng is not None else np.random.default_rng()
+        tables = tables or self.compile_tables(track_name)
+        order = grid.copy()
+        num_simulations, num_drivers = order.shape
+        shape = (num_simulations, num_drivers)
+        retired = (np.zeros(shape, dtype=bool) if retired is None
+                   else np.broadcast_to(retired, shape).copy())
+        rows = np.arange(num_simulations)[:, None]
+        wear = np.zeros(shape) if wear is None else np.broadcast_to(wear, shape).astype(float)
+        
+        plan_columns = None
+        if stint_plans is not None:
+            plan_columns = [stint_plans.driver_names.index(name) for name in tables.driver_names]
         
-        for race in race_results:
-            for i, driver in enumerate(race[:10]):
-                if driver in points_counts:
-                    points_counts[driver] += 1
+        dnf_prob = tables.per_simulation(tables.dnf_prob)
+        wear_rate = tables.per_simulation(tables.wear_rate)
+        overtake_flat = tables.overtake_base.ravel()
+        if tables.scenario is not None:
+            # Offset of each simulation's scenario block in the flattened stacked table
+            overtake_offset = tables.scenario * num_drivers * num_drivers
+        dnf_scale = np.ones((num_simulations, 1))
+        tire_gap = None
+        if weather is not None:
+            from f1_weather import (DNF_MULTIPLIER, REQUIRED_TIRES, WEATHER_PIT_CHANCE, WRONG_TIRE_PENALTY,
+                                    condition_table)
+            dnf_multiplier = condition_table(DNF_MULTIPLIER)
+            required_tires = condition_table(REQUIRED_TIRES, np.int8)
+            if tires is None:
+                # Everyone starts on the tires the opening laps call for
+                tires = np.repeat(required_tires[weather.race[:, start_lap]][:, None], num_drivers, axis=1)
+            else:
+                tires = np.broadcast_to(tires, shape).astype(np.int8)
         
-        return {driver: count / total_races for driver, count in points_counts.items()}
+        for lap in range(start_lap, race_laps or self.tracks[track_name].race_laps):
+            if weather is not None:
+                dnf_scale = dnf_multiplier[weather.race[:, lap]][:, None]
+            position_dnf = dnf_prob[order] if dnf_prob.ndim == 1 else np.take_along_axis(dnf_prob, order, axis=1)
+            if importance is not None:
+                retiring = importance.retirements(order, position_dnf * dnf_scale, rng.random(order.shape))
+            else:
+                retiring = rng.random(order.shape) < position_dnf * dnf_scale
+            if retiring.any():
+                retired[rows, order] |= retiring
+                order = retire_to_back(order, retiring)
+            
+            if stint_plans is not None:
+                wear = stint_plans.wear[:, lap][:, plan_columns]
+            else:
+                wear += wear_rate
+                pitting = (wear > PIT_WEAR_THRESHOLD) & (rng.random(wear.shape) < PIT_CHANCE_WHEN_WORN)
+                wear[pitting] = 0.0
+            
+            if weather is not None:
+                # Drivers on the wrong tires for this lap's conditions pit to change them
+                required = required_tires[weather.race[:, lap]][:, None]
+                changing = (tires != required) & (rng.random(tires.shape) < WEATHER_PIT_CHANCE)
+                tires = np.where(changing, required, tires)
+                wear[changing] = 0.0
+                tire_gap = np.abs(tires - required).astype(float) * WRONG_TIRE_PENALTY
+            
+            # The per-pair safety car draw doubles the odds, i.e. halves the overtake draw
+            boost = np.where(rng.random((num_simulations, num_drivers - 1)) < 0.05, 2.0, 1.0)
+            draws = rng.random((num_simulations, num_drivers - 1)) / boost
+            
+            def swap_prob(rows, ahead, behind):
+                tire_advantage = (wear[rows, ahead] - wear[rows, behind]) * 0.5
+                cell = behind * num_drivers + ahead
+                if tables.scenario is not None:
+                    cell = cell + overtake_offset[rows]
+                base = overtake_flat[cell]
+                probability = base + tire_advantage * 0.1
+                if tire_gap is not None:
+                    probability = probability + tire_gap[rows, ahead] - tire_gap[rows, behind]
+                probability = probability * tables.track_factor
+                if hold_retired:
+                    probability = np.where(retired[rows, ahead] | retired[rows, behind], 0.0, probability)
+                return probability
+            
+            if importance is not None:
+                order = importance.overtakes(order, swap_prob, draws, boost)
+            else:
+                order = resolve_overtakes(order, swap_prob, draws)
+        
+        return order, retired
     
-    def get_prediction_summary(self, results: Dict) -> str:
-        """Generate summary of simulation results"""
-        win_probs = results["win_probabilities"]
-        podium_probs = results["podium_probabilities"]
-        
-        # Top 5 most likely winners
-        sorted_winners = sorted(win_probs.items(), key=lambda x: x[1], reverse=True)[:5]
-        
-        summary = f"Realistic F1 2025 Race Prediction - {results['track']}\n"
-        summary += f"Based on {results['num_simulations']:,} Monte Carlo simulations\n\n"
-        summary += "Top 5 Most Likely Winners:\n"
-        
-        for i, (driver, prob) in enumerate(sorted_winners, 1):
-            podium_prob = podium_probs[driver]
-            team = self.drivers[driver].team
-            championship_pos = self.drivers[driver].championship_position
-            points = self.drivers[driver].championship_points
-            summary += f"{i}. {driver} ({team}): {prob:.1%} win, {podium_prob:.1%} podium\n"
-            summary += f"   Championship: #{championship_pos} ({points} pts)\n"
-        
-        return summary
-
 # Example usage
 if __name__ == "__main__":
+    import argparse
+    from f1_engines import available_backends
+    
+    parser = argparse.ArgumentParser(description="Realistic F1 Monte Carlo predictions")
+    parser.add_argument("--backend", choices=list(available_backends()), default=None,
+                        help="Simulation backend (default: $F1_SIM_BACKEND or reference)")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    
     # Create simulation instance
     f1_sim = F1RealisticSimulation()
     
@@ -608,7 +1033,8 @@ if __name__ == "__main__":
     
     for track in upcoming_races:
         print(f"\n{'='*60}")
-        results = f1_sim.run_monte_carlo_simulation(track, num_simulations=5000)
+        results = f1_sim.run_monte_carlo_simulation(track, num_simulations=5000, backend=args.backend,
+                                                    seed=args.seed)
         
         # Print summary
         summary = f1_sim.get_prediction_summary(results)
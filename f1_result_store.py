@@ -0,0 +1,163 @@
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence
+
+DEFAULT_DB_PATH = os.environ.get("F1_RESULTS_DB", "f1_results.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    model TEXT NOT NULL,
+    model_hash TEXT NOT NULL,
+    track TEXT NOT NULL,
+    num_simulations INTEGER NOT NULL,
+    backend TEXT,
+    seed INTEGER,
+    created TEXT NOT NULL,
+    ensemble_path TEXT,
+    options TEXT,
+    race_results TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_track_created ON runs (track, created);
+CREATE INDEX IF NOT EXISTS runs_model_hash ON runs (model_hash);
+CREATE INDEX IF NOT EXISTS runs_seed ON runs (seed);
+CREATE INDEX IF NOT EXISTS runs_created ON runs (created);
+
+CREATE TABLE IF NOT EXISTS probabilities (
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    driver TEXT NOT NULL,
+    win REAL NOT NULL,
+    podium REAL NOT NULL,
+    points REAL NOT NULL,
+    PRIMARY KEY (run_id, driver)
+);
+"""
+
+# Keys of a results dict that live in their own columns or tables
+_RUN_COLUMNS = ("model", "model_hash", "track", "num_simulations", "backend", "seed", "ensemble_path")
+_STORED_KEYS = set(_RUN_COLUMNS) | {"timestamp", "race_results", "win_probabilities",
+                                    "podium_probabilities", "points_probabilities", "run_id"}
+
+class ResultStore:
+    """SQLite store of finished runs: metadata, aggregated probabilities and ensemble file references"""
+
+    def __init__(self, path: str = DEFAULT_DB_PATH):
+        self.path = path
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # One short-lived connection per call keeps the store safe to share between request threads
+        db = sqlite3.connect(self.path)
+        db.row_factory = sqlite3.Row
+        db.execute("PRAGMA foreign_keys = ON")
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def save(self, results: Dict) -> int:
+        """Store a run_monte_carlo_simulation results dict and return its run id"""
+        options = {key: value for key, value in results.items() if key not in _STORED_KEYS}
+        with self._connect() as db:
+            cursor = db.execute(
+                "INSERT INTO runs (model, model_hash, track, num_simulations, backend, seed, created, "
+                "ensemble_path, options, race_results) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (results.get("model", ""), results.get("model_hash", ""), results["track"],
+                 results["num_simulations"], results.get("backend"), results.get("seed"), results["timestamp"],
+                 results.get("ensemble_path"), json.dumps(options, default=str),
+                 json.dumps(results.get("race_results", [])))
+            )
+            run_id = cursor.lastrowid
+            db.executemany(
+                "INSERT INTO probabilities (run_id, driver, win, podium, points) VALUES (?, ?, ?, ?, ?)",
+                [(run_id, driver, win, results["podium_probabilities"][driver],
+                  results["points_probabilities"][driver])
+                 for driver, win in results["win_probabilities"].items()]
+            )
+        return run_id
+
+    def get(self, run_id: int) -> Optional[Dict]:
+        """A stored run in the same shape run_monte_carlo_simulation returned it"""
+        with self._connect() as db:
+            run = db.execute("SELECT * FROM runs WHERE id = ?", (run_id,)).fetchone()
+            if run is None:
+                return None
+            rows = db.execute("SELECT driver, win, podium, points FROM probabilities WHERE run_id = ? "
+                              "ORDER BY rowid", (run_id,)).fetchall()
+
+        results = {"run_id": run["id"], **{column: run[column] for column in _RUN_COLUMNS},
+                   "timestamp": run["created"], **json.loads(run["options"] or "{}")}
+        results["win_probabilities"] = {row["driver"]: row["win"] for row in rows}
+        results["podium_probabilities"] = {row["driver"]: row["podium"] for row in rows}
+        results["points_probabilities"] = {row["driver"]: row["points"] for row in rows}
+        results["race_results"] = json.loads(run["race_results"] or "[]")
+        return results
+
+    def find(self, track: Optional[str] = None, model_hash: Optional[str] = None, seed: Optional[int] = None,
+             since: Optional[str] = None, until: Optional[str] = None, limit: int = 50) -> List[Dict]:
+        """Run metadata, newest first; since/until are ISO timestamps or dates"""
+        clauses, params = [], []
+        for column, value in (("track", track), ("model_hash", model_hash), ("seed", seed)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            clauses.append("created >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("created < ?")
+            params.append(until)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        with self._connect() as db:
+            rows = db.execute(
+                f"SELECT id, {', '.join(_RUN_COLUMNS)}, created FROM runs {where} "
+                f"ORDER BY created DESC, id DESC LIMIT ?", (*params, limit)
+            ).fetchall()
+        return [{"run_id": row["id"], **{column: row[column] for column in _RUN_COLUMNS},
+                 "timestamp": row["created"]} for row in rows]
+
+    def latest(self, track: str, model_hash: Optional[str] = None, num_simulations: Optional[int] = None,
+               seed: Optional[int] = None) -> Optional[Dict]:
+        """Most recent stored run matching the filters, with probabilities"""
+        clauses, params = ["track = ?"], [track]
+        for column, value in (("model_hash", model_hash), ("num_simulations", num_simulations), ("seed", seed)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        with self._connect() as db:
+            row = db.execute(f"SELECT id FROM runs WHERE {' AND '.join(clauses)} "
+                             f"ORDER BY created DESC, id DESC LIMIT 1", params).fetchone()
+        return self.get(row["id"]) if row else None
+
+    def compare(self, run_ids: Sequence[int]) -> Dict:
+        """Side-by-side probabilities for several runs, with changes against the first"""
+        runs = [self.get(run_id) for run_id in run_ids]
+        missing = [run_id for run_id, run in zip(run_ids, runs) if run is None]
+        if missing:
+            raise ValueError(f"Unknown run ids: {', '.join(map(str, missing))}")
+
+        base = runs[0]
+        drivers = {}
+        for driver in base["win_probabilities"]:
+            drivers[driver] = [{
+                "run_id": run["run_id"],
+                "win": run["win_probabilities"].get(driver),
+                "podium": run["podium_probabilities"].get(driver),
+                "points": run["points_probabilities"].get(driver),
+                "win_delta": run["win_probabilities"].get(driver, 0) - base["win_probabilities"][driver],
+            } for run in runs]
+        return {
+            "runs": [{key: run[key] for key in ("run_id", "track", "model", "model_hash", "num_simulations",
+                                                 "backend", "seed", "timestamp")} for run in runs],
+            "drivers": drivers
+        }
+
+    def delete(self, run_id: int):
+        with self._connect() as db:
+            db.execute("DELETE FROM runs WHERE id = ?", (run_id,))
@@ -0,0 +1,167 @@
+import copy
+import numpy as np
+from dataclasses import dataclass, field, fields, replace
+from typing import Dict, List, Optional, Sequence
+
+from f1_realistic_simulation import Car, Driver, F1RealisticSimulation, TrackTables
+from f1_vectorized import position_counts, probabilities_from_counts
+
+MAX_SCENARIOS = 50
+SCENARIO_OPTIONS = frozenset({"weather_forecast"})
+
+# Numeric attributes a scenario may override
+DRIVER_FIELDS = frozenset(f.name for f in fields(Driver) if f.type in (float, int))
+CAR_FIELDS = frozenset(f.name for f in fields(Car) if f.type in (float, int))
+# Attributes that only feed qualifying times, so they change nothing on a dry grid
+QUALIFYING_DRIVER_FIELDS = frozenset({"consistency", "experience", "current_form"})
+QUALIFYING_CAR_FIELDS = frozenset({"engine_power", "car_upgrade_factor"})
+
+@dataclass
+class Scenario:
+    """A named set of driver and car attribute overrides, e.g.
+
+    {"name": "Red Bull unreliable", "cars": {"Red Bull Racing": {"reliability": 0.9}},
+     "drivers": {"Max Verstappen": {"race_craft": 85}}}
+    """
+    name: str
+    drivers: Dict[str, Dict[str, float]] = field(default_factory=dict)
+    cars: Dict[str, Dict[str, float]] = field(default_factory=dict)
+
+    @classmethod
+    def parse(cls, data: Dict, default_name: str = "scenario") -> "Scenario":
+        unknown = sorted(set(data) - {"name", "drivers", "cars"})
+        if unknown:
+            raise ValueError(f"Unknown scenario keys: {', '.join(unknown)}")
+        return cls(name=str(data.get("name", default_name)),
+                   drivers={name: {key: float(value) for key, value in overrides.items()}
+                            for name, overrides in data.get("drivers", {}).items()},
+                   cars={team: {key: float(value) for key, value in overrides.items()}
+                         for team, overrides in data.get("cars", {}).items()})
+
+    def to_dict(self) -> Dict:
+        return {"name": self.name, "drivers": self.drivers, "cars": self.cars}
+
+    def qualifying_overrides(self) -> List[str]:
+        """The overrides that only act through qualifying, as "<driver or team>.<attribute>\""""
+        return ([f"{name}.{key}" for name, values in self.drivers.items()
+                 for key in values if key in QUALIFYING_DRIVER_FIELDS]
+                + [f"{team}.{key}" for team, values in self.cars.items()
+                   for key in values if key in QUALIFYING_CAR_FIELDS])
+
+def _apply(records: Dict, overrides: Dict[str, Dict[str, float]], allowed: frozenset, kind: str) -> Dict:
+    records = dict(records)
+    for key, values in overrides.items():
+        if key not in records:
+            raise ValueError(f"Unknown {kind} '{key}'. Available: {', '.join(records)}")
+        bad = sorted(set(values) - allowed)
+        if bad:
+            raise ValueError(f"Cannot override {kind} attributes: {', '.join(bad)}. "
+                             f"Allowed: {', '.join(sorted(allowed))}")
+        records[key] = replace(records[key], **values)
+    return records
+
+def apply_scenario(model: F1RealisticSimulation, scenario: Scenario) -> F1RealisticSimulation:
+    """Copy of the model with the scenario's overrides; untouched drivers, cars and tracks are shared"""
+    variant = copy.copy(model)
+    variant.drivers = _apply(model.drivers, scenario.drivers, DRIVER_FIELDS, "driver")
+    variant.cars = _apply(model.cars, scenario.cars, CAR_FIELDS, "team")
+    variant.results = []
+    return variant
+
+class SharedDraws:
+    """Generator wrapper that hands every scenario block the same random draws
+
+    Simulations are laid out scenario-major, so a request for (copies * n, ...)
+    values draws (n, ...) and tiles it: simulation i of every scenario sees
+    identical random numbers (common random numbers).
+    """
+
+    def __init__(self, rng: np.random.Generator, copies: int):
+        self.rng = rng
+        self.copies = copies
+
+    def _block(self, size):
+        size = (size,) if np.isscalar(size) else tuple(size)
+        if size[0] % self.copies:
+            raise ValueError("Draw size is not a whole number of scenario blocks")
+        return (size[0] // self.copies,) + size[1:]
+
+    def _tile(self, values: np.ndarray) -> np.ndarray:
+        return np.tile(values, (self.copies,) + (1,) * (values.ndim - 1))
+
+    def random(self, size):
+        return self._tile(self.rng.random(self._block(size)))
+
+    def normal(self, loc=0.0, scale=1.0, size=None):
+        return self._tile(self.rng.normal(loc, scale, self._block(size)))
+
+    def choice(self, a, size=None, p=None):
+        return self._tile(self.rng.choice(a, size=self._block(size), p=p))
+
+def stack_tables(tables: Sequence[TrackTables], num_simulations: int) -> TrackTables:
+    """One TrackTables whose per-driver arrays gain a leading scenario axis"""
+    first = tables[0]
+    return replace(
+        first,
+        qualifying_base=np.stack([t.qualifying_base for t in tables]),
+        qualifying_sd=np.stack([t.qualifying_sd for t in tables]),
+        dnf_prob=np.stack([t.dnf_prob for t in tables]),
+        wear_rate=np.stack([t.wear_rate for t in tables]),
+        overtake_base=np.stack([t.overtake_base for t in tables]),
+        scenario=np.repeat(np.arange(len(tables)), num_simulations)
+    )
+
+def run_scenarios(model: F1RealisticSimulation, track_name: str, scenarios: Sequence[Scenario],
+                  num_simulations: int = 5000, seed: Optional[int] = None, **options) -> Dict:
+    """Evaluate the baseline and every scenario in one batched run on shared random draws
+
+    Returns the baseline probabilities and, per scenario, its probabilities and
+    their change against the baseline. Because every scenario sees the same
+    draws, the deltas reflect the overrides rather than sampling noise.
+
+    Qualifying is deterministic in the dry, so overrides that only act
+    through qualifying (QUALIFYING_DRIVER_FIELDS, QUALIFYING_CAR_FIELDS)
+    have zero deltas there; each scenario's warnings lists them unless the
+    track is wet or a weather_forecast is given.
+    """
+    if len(scenarios) > MAX_SCENARIOS:
+        raise ValueError(f"At most {MAX_SCENARIOS} scenarios per run")
+    unsupported = sorted(set(options) - SCENARIO_OPTIONS)
+    if unsupported:
+        raise ValueError(f"Scenario runs do not support: {', '.join(unsupported)}")
+
+    variants = [model] + [apply_scenario(model, scenario) for scenario in scenarios]
+    copies = len(variants)
+    total = copies * num_simulations
+    tables = stack_tables([variant.compile_tables(track_name) for variant in variants], num_simulations)
+    dry = not tables.wet and options.get("weather_forecast") is None
+
+    draws = SharedDraws(np.random.default_rng(seed), copies)
+    race_options = model.prepare_race_options(track_name, total, draws, **options)
+    grid = model.simulate_qualifying_vectorized(track_name, total, draws, tables,
+                                                **model.qualifying_options(race_options))
+    finish, _ = model.simulate_race_vectorized(track_name, grid, draws, tables, **race_options)
+
+    names = model.driver_names
+    tables_by_scenario = []
+    for block in range(copies):
+        rows = slice(block * num_simulations, (block + 1) * num_simulations)
+        tables_by_scenario.append(probabilities_from_counts(position_counts(finish[rows], len(names)), names))
+
+    baseline = tables_by_scenario[0]
+    return {
+        "track": track_name,
+        "num_simulations": num_simulations,
+        "seed": seed,
+        "model_hash": model.model_hash(),
+        "baseline": baseline,
+        "scenarios": [{
+            **scenario.to_dict(),
+            **probabilities,
+            "deltas": {kind: {driver: probabilities[kind][driver] - baseline[kind][driver] for driver in names}
+                       for kind in probabilities},
+            "warnings": [f"{override} only changes qualifying, which is deterministic in the dry; "
+                         "it has no effect without rain or a weather_forecast"
+                         for override in (scenario.qualifying_overrides() if dry else [])]
+        } for scenario, probabilities in zip(scenarios, tables_by_scenario[1:])]
+    }
@@ -0,0 +1,267 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional, Tuple
+
+# Seconds per simulation measured on one core; refined per backend and track as runs complete
+# "live" is an in-race update (f1_live), which simulates only the laps still to run
+DEFAULT_SECONDS_PER_SIMULATION = {"reference": 5e-3, "numpy": 1e-4, "multiprocess": 1e-4, "live": 1e-4}
+COST_SMOOTHING = 0.3  # Weight of the newest observation in the running cost estimate
+
+MAX_SIMULATIONS = 200_000  # Hard cap on one request; larger asks are reduced to this
+MIN_SIMULATIONS = 1000  # Below this a degraded run is not worth serving
+CLIENT_BUDGET = 60.0  # Compute seconds a client may use per BUDGET_WINDOW
+GLOBAL_BUDGET = 600.0  # Compute seconds all clients together may use per BUDGET_WINDOW
+BUDGET_WINDOW = 60.0
+MAX_QUEUE_WAIT = 10.0  # Past this expected wait, new work is degraded
+SHED_COST = 2.0  # Cost a degraded request is cut down to under load
+
+PRIORITIES = {"interactive": 0, "batch": 1}
+
+class CostModel:
+    """Estimated seconds of compute per simulation, per backend and track"""
+
+    def __init__(self, defaults: Optional[Dict[str, float]] = None, workers: Optional[int] = None):
+        self.defaults = dict(defaults or DEFAULT_SECONDS_PER_SIMULATION)
+        self.workers = workers or os.cpu_count() or 1
+        self._observed: Dict[Tuple[str, str], float] = {}
+        self._lock = threading.Lock()
+
+    def seconds_per_simulation(self, backend: str, track: str) -> float:
+        with self._lock:
+            if (backend, track) in self._observed:
+                return self._observed[(backend, track)]
+        per_simulation = self.defaults.get(backend, max(self.defaults.values()))
+        # The process pool spreads one run's simulations over the cores
+        return per_simulation / self.workers if backend == "multiprocess" else per_simulation
+
+    def estimate(self, backend: str, track: str, num_simulations: int) -> float:
+        return self.seconds_per_simulation(backend, track) * num_simulations
+
+    def observe(self, backend: str, track: str, num_simulations: int, seconds: float):
+        """Fold a finished run's wall time into the estimate"""
+        if num_simulations <= 0:
+            return
+        measured = seconds / num_simulations
+        with self._lock:
+            previous = self._observed.get((backend, track))
+            self._observed[(backend, track)] = (measured if previous is None
+                                                else previous + COST_SMOOTHING * (measured - previous))
+
+class Budget:
+    """Compute seconds spent over a sliding window"""
+
+    def __init__(self, limit: float, window: float = BUDGET_WINDOW):
+        self.limit = limit
+        self.window = window
+        self._spent = deque()  # (time, seconds)
+
+    def _expire(self, now: float):
+        while self._spent and self._spent[0][0] <= now - self.window:
+            self._spent.popleft()
+
+    def remaining(self, now: Optional[float] = None) -> float:
+        now = time.monotonic() if now is None else now
+        self._expire(now)
+        return self.limit - sum(seconds for _, seconds in self._spent)
+
+    def charge(self, seconds: float, now: Optional[float] = None):
+        self._spent.append((time.monotonic() if now is None else now, seconds))
+
+@dataclass
+class Admission:
+    """What the scheduler will do with a request"""
+    num_simulations: int  # Count to run, possibly reduced
+    estimated_seconds: float
+    requested: int
+    action: str = "run"  # run, or serve_cached when a cached result should be used instead
+    reasons: list = field(default_factory=list)
+
+    @property
+    def degraded(self) -> bool:
+        return bool(self.reasons)
+
+    def to_dict(self) -> Dict:
+        return {"action": self.action, "requested": self.requested, "num_simulations": self.num_simulations,
+                "estimated_seconds": round(self.estimated_seconds, 3), "reasons": self.reasons}
+
+class Overloaded(Exception):
+    """The request cannot be served within budget; retry_after is a hint in seconds"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+@dataclass(order=True)
+class _Job:
+    sort_key: Tuple
+    fn: Callable = field(compare=False)
+    future: Future = field(compare=False)
+    estimated_seconds: float = field(compare=False)
+    queued_at: float = field(compare=False)
+
+class Scheduler:
+    """Admission control plus a priority queue feeding a fixed number of worker threads
+
+    admit() decides how much work a request may do: requests past
+    MAX_SIMULATIONS are capped; a client past its budget, an exhausted global
+    budget or a long queue reduces the count (or asks for a cached result
+    when the cut would fall below MIN_SIMULATIONS), and raises Overloaded when
+    neither works. run() queues admitted work by priority class, then by
+    estimated cost, and blocks until a worker has run it.
+    """
+
+    def __init__(self, slots: Optional[int] = None, cost_model: Optional[CostModel] = None,
+                 client_budget: float = CLIENT_BUDGET, global_budget: float = GLOBAL_BUDGET,
+                 max_queue_wait: float = MAX_QUEUE_WAIT):
+        self.slots = slots or max(1, (os.cpu_count() or 1) // 2)
+        self.cost_model = cost_model or CostModel()
+        self.client_budget = client_budget
+        self.global_budget = Budget(global_budget)
+        self.max_queue_wait = max_queue_wait
+        self._clients: Dict[str, Budget] = {}
+        self._last_prune = time.monotonic()
+        self._queue = []
+        self._sequence = itertools.count()
+        self._lock = threading.Condition()
+        self._running = 0
+        self._running_seconds = 0.0
+        self._workers = []
+        self._waits = deque(maxlen=500)
+        self.completed = 0
+        self.degraded = 0
+        self.rejected = 0
+
+    def _client(self, client: str) -> Budget:
+        now = time.monotonic()
+        if now - self._last_prune > BUDGET_WINDOW:
+            # A budget with nothing left in its window is the same as a new one, so drop it
+            self._clients = {name: budget for name, budget in self._clients.items()
+                             if budget.remaining(now) < budget.limit}
+            self._last_prune = now
+        if client not in self._clients:
+            self._clients[client] = Budget(self.client_budget)
+        return self._clients[client]
+
+    def expected_wait(self) -> float:
+        """Seconds new work would wait for a slot, from the queued and running estimates"""
+        with self._lock:
+            return self._expected_wait()
+
+    def _expected_wait(self) -> float:
+        queued = sum(job.estimated_seconds for job in self._queue)
+        return (queued + self._running_seconds) / self.slots if self._running >= self.slots or queued else 0.0
+
+    def admit(self, client: str, track: str, num_simulations: int, backend: str,
+              cached_available: bool = False) -> Admission:
+        if num_simulations <= 0:
+            raise ValueError("Number of simulations must be positive")
+        per_simulation = self.cost_model.seconds_per_simulation(backend, track)
+        admission = Admission(num_simulations, per_simulation * num_simulations, num_simulations)
+
+        def cut(simulations: int, reason: str):
+            if simulations < admission.num_simulations:
+                admission.num_simulations = simulations
+                admission.reasons.append(reason)
+
+        cut(MAX_SIMULATIONS, f"capped at {MAX_SIMULATIONS} simulations")
+        with self._lock:
+            client_remaining = self._client(client).remaining()
+            global_remaining = self.global_budget.remaining()
+            wait = self._expected_wait()
+        if client_remaining < admission.num_simulations * per_simulation:
+            cut(int(max(client_remaining, 0) / per_simulation), "client compute budget")
+        if global_remaining < admission.num_simulations * per_simulation:
+            cut(int(max(global_remaining, 0) / per_simulation), "global compute budget")
+        if wait > self.max_queue_wait:
+            cut(int(SHED_COST / per_simulation), f"queue wait {wait:.0f}s")
+
+        admission.estimated_seconds = admission.num_simulations * per_simulation
+        if admission.num_simulations < min(MIN_SIMULATIONS, num_simulations):
+            with self._lock:
+                self.rejected += not cached_available
+                self.degraded += cached_available
+            if cached_available:
+                admission.action = "serve_cached"
+                return admission
+            raise Overloaded("Simulation capacity exhausted, try again shortly",
+                             retry_after=max(wait, BUDGET_WINDOW / 4))
+        if admission.degraded:
+            with self._lock:
+                self.degraded += 1
+        return admission
+
+    def run(self, client: str, admission: Admission, fn: Callable, priority: str = "interactive",
+            backend: Optional[str] = None, track: Optional[str] = None):
+        """Charge the budgets, queue fn and block until a worker has run it"""
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{priority}'. Available: {', '.join(PRIORITIES)}")
+        future = Future()
+        now = time.monotonic()
+        with self._lock:
+            self._client(client).charge(admission.estimated_seconds, now)
+            self.global_budget.charge(admission.estimated_seconds, now)
+            job = _Job((PRIORITIES[priority], admission.estimated_seconds, next(self._sequence)),
+                       fn, future, admission.estimated_seconds, now)
+            heapq.heappush(self._queue, job)
+            self._start_workers()
+            self._lock.notify()
+
+        result = future.result()
+        if backend is not None and track is not None:
+            self.cost_model.observe(backend, track, admission.num_simulations, future.elapsed)
+        return result
+
+    def _start_workers(self):
+        while len(self._workers) < self.slots:
+            worker = threading.Thread(target=self._work, name=f"simulation-worker-{len(self._workers)}",
+                                      daemon=True)
+            self._workers.append(worker)
+            worker.start()
+
+    def _work(self):
+        while True:
+            with self._lock:
+                while not self._queue:
+                    self._lock.wait()
+                job = heapq.heappop(self._queue)
+                self._running += 1
+                self._running_seconds += job.estimated_seconds
+                self._waits.append(time.monotonic() - job.queued_at)
+
+            start = time.monotonic()
+            try:
+                result = job.fn()
+            except BaseException as e:
+                job.future.elapsed = time.monotonic() - start
+                job.future.set_exception(e)
+            else:
+                job.future.elapsed = time.monotonic() - start
+                job.future.set_result(result)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._running_seconds -= job.estimated_seconds
+                    self.completed += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            waits = sorted(self._waits)
+            return {
+                "slots": self.slots,
+                "running": self._running,
+                "queue_depth": len(self._queue),
+                "queued_seconds": round(sum(job.estimated_seconds for job in self._queue), 3),
+                "expected_wait_seconds": round(self._expected_wait(), 3),
+                "mean_wait_seconds": round(sum(waits) / len(waits), 3) if waits else 0.0,
+                "p95_wait_seconds": round(waits[int(0.95 * (len(waits) - 1))], 3) if waits else 0.0,
+                "global_budget_remaining": round(self.global_budget.remaining(), 3),
+                "completed": self.completed,
+                "degraded": self.degraded,
+                "rejected": self.rejected,
+            }
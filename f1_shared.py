@@ -0,0 +1,186 @@
+import copy
+import dataclasses
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from f1_engines import NumpyBackend, RaceEnsemble
+
+ALIGNMENT = 64  # Byte alignment of each array inside the block
+Layout = Dict[str, Tuple[Tuple[int, ...], str]]  # name -> (shape, dtype)
+
+class SharedArrays:
+    """Named NumPy arrays laid out in one shared memory block
+
+    The creating process owns the block and unlinks it; workers attach by
+    spec() and get views onto the same memory, so nothing is pickled but
+    the block's name and layout.
+    """
+
+    def __init__(self, layout: Layout, name: Optional[str] = None):
+        self.layout = {key: (tuple(shape), dtype) for key, (shape, dtype) in layout.items()}
+        offsets, size = {}, 0
+        for key, (shape, dtype) in self.layout.items():
+            offsets[key] = size
+            nbytes = int(np.prod(shape, dtype=np.int64)) * np.dtype(dtype).itemsize
+            size += -(-nbytes // ALIGNMENT) * ALIGNMENT
+        self.owner = name is None
+        self.memory = shared_memory.SharedMemory(name=name, create=self.owner, size=max(size, 1))
+        self.arrays = {key: np.ndarray(shape, dtype=dtype, buffer=self.memory.buf, offset=offsets[key])
+                       for key, (shape, dtype) in self.layout.items()}
+
+    @classmethod
+    def attach(cls, spec: Tuple[str, Layout]) -> "SharedArrays":
+        name, layout = spec
+        return cls(layout, name=name)
+
+    def spec(self) -> Tuple[str, Layout]:
+        return self.memory.name, self.layout
+
+    def __getitem__(self, key: str) -> np.ndarray:
+        return self.arrays[key]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.arrays
+
+    def close(self):
+        """Drop the views and detach; the owner also frees the block"""
+        self.arrays = {}
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+    def __enter__(self) -> "SharedArrays":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def publish_tables(tables) -> Tuple[SharedArrays, Dict]:
+    """Copy a compiled tables dataclass's arrays into shared memory; returns the block and a picklable spec"""
+    arrays, scalars = {}, {}
+    for field in dataclasses.fields(tables):
+        value = getattr(tables, field.name)
+        (arrays if isinstance(value, np.ndarray) else scalars)[field.name] = value
+    shared = SharedArrays({name: (value.shape, value.dtype.str) for name, value in arrays.items()})
+    for name, value in arrays.items():
+        shared[name][...] = value
+    return shared, {"type": type(tables), "arrays": shared.spec(), "scalars": scalars}
+
+def attach_tables(spec: Dict):
+    """Rebuild published tables as read-only views onto the shared block; returns (tables, block)"""
+    shared = SharedArrays.attach(spec["arrays"])
+    views = {}
+    for name in shared.layout:
+        views[name] = shared[name]
+        views[name].flags.writeable = False
+    return spec["type"](**spec["scalars"], **views), shared
+
+def ensemble_layout(num_simulations: int, num_drivers: int, options: Dict, keep_ensemble: bool = True,
+                    num_shards: int = 1) -> Layout:
+    """Shared result buffers for a run: per-shard position counts plus, optionally, the ensemble arrays"""
+    weighted = options.get("importance_target") is not None
+    layout = {"counts": ((num_shards, num_drivers, num_drivers), "float64" if weighted else "int64")}
+    if not keep_ensemble:
+        return layout
+    rows = (num_simulations, num_drivers)
+    layout.update({"grid": (rows, "int16"), "finish": (rows, "int16"), "dnf": (rows, "bool")})
+    if options.get("weather_forecast") is not None:
+        layout["weather"] = ((num_simulations,), "int8")
+    if options.get("antithetic"):
+        layout["partner"] = ((num_simulations,), "int64")
+    if weighted:
+        layout["weights"] = ((num_simulations,), "float64")
+    if options.get("qmc"):
+        layout["replicate"] = ((num_simulations,), "int64")
+    return layout
+
+_worker = {}  # Model and shared tables, set once per worker process
+
+def _init_worker(model, tables_spec: Dict):
+    _worker["model"] = model
+    _worker["tables"], _worker["block"] = attach_tables(tables_spec)
+
+def _run_shared_shard(track_name: str, shard: int, start: int, num_simulations: int,
+                      seed: np.random.SeedSequence, options: Dict, output_spec) -> Dict[str, float]:
+    """Simulate one shard on the shared tables and write its results into the shared buffers"""
+    backend = NumpyBackend(tables=_worker["tables"])
+    ensemble = backend.run(_worker["model"], track_name, num_simulations, seed, **options)
+    output = SharedArrays.attach(output_spec)
+    try:
+        output["counts"][shard] = ensemble.position_counts()
+        rows = slice(start, start + num_simulations)
+        for name in output.layout:
+            if name != "counts":
+                output[name][rows] = getattr(ensemble, name)
+    finally:
+        output.close()
+    return backend.timings
+
+def run_shared_shards(model, track_name: str, sizes: Sequence[int], seeds: Sequence[np.random.SeedSequence],
+                      options: Dict, workers: int, keep_ensemble: bool = True
+                      ) -> Tuple[np.ndarray, Optional[RaceEnsemble], List[Dict[str, float]]]:
+    """Run seeded shards on a process pool that shares the model tables and result buffers
+
+    Each worker process receives the model once (without its run history)
+    and maps the compiled tables; each shard writes its position counts and,
+    with keep_ensemble, its rows of the ensemble into buffers allocated up
+    front. Returns the summed counts, the ensemble (or None) and per-shard
+    timings.
+    """
+    worker_model = copy.copy(model)
+    worker_model.results = []
+    worker_model.last_outcomes = None
+    names = model.driver_names
+    starts = np.cumsum([0] + list(sizes[:-1])).tolist()
+    layout = ensemble_layout(sum(sizes), len(names), options, keep_ensemble, len(sizes))
+
+    tables, tables_spec = publish_tables(model.compile_tables(track_name))
+    output = SharedArrays(layout)
+    try:
+        with ProcessPoolExecutor(max_workers=min(workers, len(sizes)), initializer=_init_worker,
+                                 initargs=(worker_model, tables_spec)) as pool:
+            futures = [pool.submit(_run_shared_shard, track_name, shard, start, size, seed, options, output.spec())
+                       for shard, (start, size, seed) in enumerate(zip(starts, sizes, seeds))]
+            timings = [future.result() for future in futures]
+
+        counts = output["counts"].sum(axis=0)
+        ensemble = None
+        if keep_ensemble:
+            fields = {name: output[name].copy() for name in layout if name != "counts"}
+            for start, size in zip(starts, sizes):
+                rows = slice(start, start + size)
+                if "partner" in fields:
+                    # Shards pair simulations within themselves
+                    fields["partner"][rows] = np.where(fields["partner"][rows] >= 0, fields["partner"][rows] + start, -1)
+            if "replicate" in fields:
+                # Replicates of different shards are independent, so they keep separate indices
+                offset = 0
+                for start, size in zip(starts, sizes):
+                    rows = slice(start, start + size)
+                    fields["replicate"][rows] += offset
+                    offset = int(fields["replicate"][rows].max()) + 1
+            ensemble = RaceEnsemble(names, **fields)
+    finally:
+        output.close()
+        tables.close()
+    return counts, ensemble, timings
+
+def parallel_position_counts(model, track_name: str, num_simulations: int, seed: Optional[int] = None,
+                             workers: int = 1, shard_size: int = 25000, **options) -> np.ndarray:
+    """Finishing position counts (drivers x positions) from shared-memory shards, without keeping the ensemble
+
+    Shards and seeds match the multiprocess backend, so the counts equal
+    that backend's ensemble counts for the same seed.
+    """
+    sizes = shard_sizes(num_simulations, shard_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    counts, _, _ = run_shared_shards(model, track_name, sizes, seeds, options, workers, keep_ensemble=False)
+    return counts
+
+def shard_sizes(num_simulations: int, shard_size: int) -> List[int]:
+    sizes = [shard_size] * (num_simulations // shard_size)
+    if num_simulations % shard_size:
+        sizes.append(num_simulations % shard_size)
+    return sizes
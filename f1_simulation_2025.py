@@ -1,13 +1,12 @@
 import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-from scipy import stats
 from typing import Dict, List, Tuple
 import random
 from dataclasses import dataclass
-from datetime import datetime
-import json
+
+from f1_engines import MonteCarloEngine
+from f1_vectorized import grid_from_times, resolve_overtakes, retire_to_back
+
+RACE_LAPS = 50
 
 @dataclass
 class Driver2025:
@@ -27,11 +26,27 @@ class Driver2025:
     car_news_factor: float  # New: car design news impact (0.9-1.1, 1.0 neutral)
     engine_news_factor: float  # New: engine news impact (0.9-1.1, 1.0 neutral)
 
-class F1MonteCarloSimulation2025:
+@dataclass
+class TrackTables2025:
+    """Per-track quantities the batched engine computes once per run"""
+    driver_names: List[str]
+    qualifying_base: np.ndarray  # Deterministic part of each driver's qualifying time
+    qualifying_sd: np.ndarray  # Consistency spread per driver
+    dnf_prob: np.ndarray  # Per-lap retirement chance per driver
+    overtake_prob: np.ndarray  # Chance per lap that [behind] passes [ahead]
+
+class F1MonteCarloSimulation2025(MonteCarloEngine):
+    summary_title = "F1 2025 Race Prediction"
+    
     def __init__(self):
         self.drivers = self._initialize_2025_drivers()
         self.tracks = self._initialize_2025_tracks()
-        self.simulation_results = []
+        self.results = []
+    
+    @property
+    def simulation_results(self) -> List[Dict]:
+        """Past runs; older name for self.results"""
+        return self.results
         
     def _initialize_2025_drivers(self) -> Dict[str, Driver2025]:
         """Initialize 2025 F1 drivers with current performance data"""
@@ -338,9 +353,98 @@ class F1MonteCarloSimulation2025:
         }
         return tracks
     
+    def _get_track(self, track_name: str) -> Dict:
+        """Look up a track, refusing unknown names instead of silently using Bahrain"""
+        if track_name not in self.tracks:
+            raise ValueError(f"Unknown track '{track_name}'. Available tracks: {', '.join(self.tracks)}")
+        return self.tracks[track_name]
+    
+    def compile_tables(self, track_name: str) -> TrackTables2025:
+        """Precompute per-driver means, news factors and track factors for the batched engine"""
+        track = self._get_track(track_name)
+        drivers = list(self.drivers.values())
+        
+        qualifying_pace = np.array([d.qualifying_pace for d in drivers])
+        consistency = np.array([d.consistency for d in drivers])
+        experience = np.array([d.experience for d in drivers])
+        current_form = np.array([d.current_form for d in drivers])
+        recent_avg = np.array([np.mean(d.recent_performance) if d.recent_performance else 10 for d in drivers])
+        news = np.array([d.car_news_factor + d.engine_news_factor for d in drivers])
+        race_pace = np.array([d.race_pace for d in drivers])
+        reliability = np.array([d.reliability for d in drivers])
+        
+        # Same terms as simulate_qualifying, minus the two random draws
+        experience_bonus = experience * 0.05 if track["type"] == "street_circuit" else np.zeros(len(drivers))
+        qualifying_base = (80 - qualifying_pace * 0.6 + (current_form - 1.0) * 1 - experience_bonus
+                           - (recent_avg - 10) * 0.2 - (2.0 - news) * 2.0)
+        
+        # Same terms as the simulate_race overtake check, indexed [behind, ahead]
+        pace_diff = race_pace[:, None] - race_pace[None, :]
+        overtake_prob = (np.maximum(0, pace_diff * 0.01 * (1 - track["overtaking_difficulty"]))
+                         + (recent_avg[:, None] - recent_avg[None, :]) * 0.02
+                         + (news[:, None] - news[None, :]) * 0.5)
+        
+        return TrackTables2025(
+            driver_names=list(self.drivers.keys()),
+            qualifying_base=qualifying_base,
+            qualifying_sd=(1 - consistency) * 3,
+            dnf_prob=(1 - reliability) * 0.001,
+            overtake_prob=overtake_prob
+        )
+    
+    def simulate_qualifying_vectorized(self, track_name: str, num_simulations: int = 1000,
+                                       rng=None, tables: TrackTables2025 = None,
+                                       importance=None) -> np.ndarray:
+        """Batched qualifying; returns starting grids as driver indices (simulations x positions)
+        
+        importance (f1_importance.ImportanceTilt) tilts the target driver's consistency draw.
+        """
+        rng = rng if rng is not None else np.random.default_rng()
+        tables = tables or self.compile_tables(track_name)
+        shape = (num_simulations, len(tables.driver_names))
+        noise = rng.normal(0, 1, shape)
+        if importance is not None:
+            noise = importance.qualifying_noise(noise, True)
+        times = tables.qualifying_base + noise * tables.qualifying_sd + rng.normal(0, 2, shape)
+        return grid_from_times(times)
+    
+    def simulate_race_vectorized(self, track_name: str, grid: np.ndarray, rng=None,
+                                 tables: TrackTables2025 = None, importance=None) -> Tuple[np.ndarray, np.ndarray]:
+        """Batched race from starting grids
+        
+        Returns finishing orders (simulations x positions) and DNF flags
+        (simulations x drivers). importance (f1_importance.ImportanceTilt)
+        decides the target driver's retirements and overtakes.
+        """
+        rng = rng if rng is not None else np.random.default_rng()
+        tables = tables or self.compile_tables(track_name)
+        order = grid.copy()
+        num_simulations, num_drivers = order.shape
+        retired = np.zeros((num_simulations, num_drivers), dtype=bool)
+        rows = np.arange(num_simulations)[:, None]
+        
+        def swap_prob(rows, ahead, behind):
+            return tables.overtake_prob[behind, ahead]
+        
+        for lap in range(RACE_LAPS):
+            if importance is not None:
+                retiring = importance.retirements(order, tables.dnf_prob[order], rng.random(order.shape))
+            else:
+                retiring = rng.random(order.shape) < tables.dnf_prob[order]
+            if retiring.any():
+                retired[rows, order] |= retiring
+                order = retire_to_back(order, retiring)
+            draws = rng.random((num_simulations, num_drivers - 1))
+            if importance is not None:
+                order = importance.overtakes(order, swap_prob, draws)
+            else:
+                order = resolve_overtakes(order, swap_prob, draws)
+        
+        return order, retired
+    
     def simulate_qualifying(self, track_name: str, num_simulations: int = 1000) -> List[Tuple[str, float]]:
         """Simulate qualifying session with 2025 data and car/engine news factors"""
-        track = self.tracks.get(track_name, self.tracks["Bahrain"])
+        track = self._get_track(track_name)
         qualifying_results = []
         for _ in range(num_simulations):
             driver_times = []
@@ -367,12 +471,12 @@ class F1MonteCarloSimulation2025:
     def simulate_race(self, track_name: str, qualifying_results: List[Tuple[str, float]], 
                      num_simulations: int = 1000) -> List[List[str]]:
         """Simulate race based on qualifying results with 2025 data and car/engine news factors"""
-        track = self.tracks.get(track_name, self.tracks["Bahrain"])
+        track = self._get_track(track_name)
         race_results = []
         for sim in range(num_simulations):
             starting_grid = [driver for driver, _ in qualifying_results[sim]]
             final_positions = starting_grid.copy()
-            for lap in range(50):
+            for lap in range(RACE_LAPS):
                 for i, driver_name in enumerate(final_positions):
                     if driver_name in self.drivers:
                         driver = self.drivers[driver_name]
@@ -397,108 +501,20 @@ class F1MonteCarloSimulation2025:
             race_results.append(final_positions)
         return race_results
     
-    def run_monte_carlo_simulation(self, track_name: str, num_simulations: int = 10000) -> Dict:
-        """Run complete Monte Carlo simulation for a race"""
-        print(f"Running Monte Carlo simulation for {track_name}...")
-        print(f"Number of simulations: {num_simulations}")
-        
-        # Simulate qualifying
-        qualifying_results = self.simulate_qualifying(track_name, num_simulations)
-        
-        # Simulate race
-        race_results = self.simulate_race(track_name, qualifying_results, num_simulations)
-        
-        # Analyze results
-        win_probabilities = self._calculate_win_probabilities(race_results)
-        podium_probabilities = self._calculate_podium_probabilities(race_results)
-        points_probabilities = self._calculate_points_probabilities(race_results)
-        
-        results = {
-            "track": track_name,
-            "num_simulations": num_simulations,
-            "timestamp": datetime.now().isoformat(),
-            "win_probabilities": win_probabilities,
-            "podium_probabilities": podium_probabilities,
-            "points_probabilities": points_probabilities,
-            "race_results": race_results[:100]  # Store first 100 results for analysis
-        }
-        
-        self.simulation_results.append(results)
-        return results
-    
-    def _calculate_win_probabilities(self, race_results: List[List[str]]) -> Dict[str, float]:
-        """Calculate probability of each driver winning"""
-        win_counts = {}
-        total_races = len(race_results)
-        
-        for driver_name in self.drivers.keys():
-            win_counts[driver_name] = 0
-        
-        for race in race_results:
-            if race:  # Check if race has results
-                winner = race[0]
-                if winner in win_counts:
-                    win_counts[winner] += 1
-        
-        win_probabilities = {driver: count / total_races for driver, count in win_counts.items()}
-        return win_probabilities
-    
-    def _calculate_podium_probabilities(self, race_results: List[List[str]]) -> Dict[str, float]:
-        """Calculate probability of each driver finishing on the podium"""
-        podium_counts = {}
-        total_races = len(race_results)
-        
-        for driver_name in self.drivers.keys():
-            podium_counts[driver_name] = 0
-        
-        for race in race_results:
-            for i, driver in enumerate(race[:3]):  # Top 3 positions
-                if driver in podium_counts:
-                    podium_counts[driver] += 1
-        
-        podium_probabilities = {driver: count / total_races for driver, count in podium_counts.items()}
-        return podium_probabilities
-    
-    def _calculate_points_probabilities(self, race_results: List[List[str]]) -> Dict[str, float]:
-        """Calculate probability of each driver scoring points (top 10)"""
-        points_counts = {}
-        total_races = len(race_results)
-        
-        for driver_name in self.drivers.keys():
-            points_counts[driver_name] = 0
-        
-        for race in race_results:
-            for i, driver in enumerate(race[:10]):  # Top 10 positions
-                if driver in points_counts:
-                    points_counts[driver] += 1
-        
-        points_probabilities = {driver: count / total_races for driver, count in points_counts.items()}
-        return points_probabilities
+    def _championship_points(self, driver: Driver2025) -> int:
+        return driver.points
     
-    def get_prediction_summary(self, results: Dict) -> str:
-        """Generate a text summary of the simulation results"""
-        win_probs = results["win_probabilities"]
-        podium_probs = results["podium_probabilities"]
-        
-        # Top 5 most likely winners
-        sorted_winners = sorted(win_probs.items(), key=lambda x: x[1], reverse=True)[:5]
-        
-        summary = f"F1 2025 Race Prediction - {results['track']}\n"
-        summary += f"Based on {results['num_simulations']:,} Monte Carlo simulations\n\n"
-        summary += "Top 5 Most Likely Winners:\n"
-        
-        for i, (driver, prob) in enumerate(sorted_winners, 1):
-            podium_prob = podium_probs[driver]
-            team = self.drivers[driver].team
-            championship_pos = self.drivers[driver].championship_position
-            points = self.drivers[driver].points
-            summary += f"{i}. {driver} ({team}): {prob:.1%} win, {podium_prob:.1%} podium\n"
-            summary += f"   Championship: #{championship_pos} ({points} pts)\n"
-        
-        return summary
-
 # Example usage
 if __name__ == "__main__":
+    import argparse
+    from f1_engines import available_backends
+    
+    parser = argparse.ArgumentParser(description="F1 2025 Monte Carlo predictions")
+    parser.add_argument("--backend", choices=list(available_backends()), default=None,
+                        help="Simulation backend (default: $F1_SIM_BACKEND or reference)")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    
     # Create simulation instance
     f1_sim_2025 = F1MonteCarloSimulation2025()
     
@@ -507,7 +523,8 @@ if __name__ == "__main__":
     
     for track in upcoming_races:
         print(f"\n{'='*50}")
-        results = f1_sim_2025.run_monte_carlo_simulation(track, num_simulations=5000)
+        results = f1_sim_2025.run_monte_carlo_simulation(track, num_simulations=5000, backend=args.backend,
+                                                         seed=args.seed)
         
         # Print summary
         summary = f1_sim_2025.get_prediction_summary(results)
@@ -0,0 +1,267 @@
+import itertools
+import os
+import random
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from f1_realistic_simulation import F1RealisticSimulation, TireCompound, RACE_LAPS
+from f1_tires import COMPOUNDS, DRY_COMPOUNDS, StintPlans, driver_wear_rates, tire_life
+
+MIN_STINT_LAPS = 5  # Shortest stint worth planning
+
+@dataclass(frozen=True)
+class CandidateStrategy:
+    """A stint plan: compounds in order and the (0-based) lap of each stop"""
+    compounds: Tuple[TireCompound, ...]
+    pit_laps: Tuple[int, ...]
+
+    @property
+    def stops(self) -> int:
+        return len(self.pit_laps)
+
+    @property
+    def name(self) -> str:
+        """Readable form, e.g. 'medium-hard (pit 22)'"""
+        laps = ", ".join(str(lap + 1) for lap in self.pit_laps)
+        return f"{'-'.join(compound.value for compound in self.compounds)} (pit {laps})"
+
+    def stint_ages(self, laps: int = RACE_LAPS) -> List[int]:
+        """Oldest tire age reached in each stint (a stop gives fresh tires on the pit lap)"""
+        bounds = (-1,) + self.pit_laps + (laps,)
+        return [end - start - 1 for start, end in zip(bounds, bounds[1:])]
+
+    def overrun(self, life: Dict[TireCompound, int], laps: int = RACE_LAPS) -> int:
+        """Laps driven past the wear threshold over the whole race"""
+        return sum(max(0, age - life[compound] + 1)
+                   for compound, age in zip(self.compounds, self.stint_ages(laps)))
+
+@dataclass
+class StrategyResult:
+    """Expected finishing position of one strategy over the shared ensemble"""
+    strategy: CandidateStrategy
+    expected_position: float
+    std_error: float
+    races: int
+    pruned: bool  # Dropped early as dominated by the leading strategy
+
+def candidate_strategies(max_stops: int = 2, laps: int = RACE_LAPS, lap_step: int = 2,
+                         min_stint: int = MIN_STINT_LAPS) -> List[CandidateStrategy]:
+    """Enumerate one- to max_stops-stop plans on a grid of pit laps"""
+    pit_window = range(min_stint, laps - min_stint, lap_step)
+    candidates = []
+    for stops in range(1, max_stops + 1):
+        for compounds in itertools.product(DRY_COMPOUNDS, repeat=stops + 1):
+            if len(set(compounds)) < 2:
+                continue  # Dry races must use two different compounds
+            for pit_laps in itertools.combinations(pit_window, stops):
+                if any(later - earlier <= min_stint for earlier, later in zip(pit_laps, pit_laps[1:])):
+                    continue
+                candidates.append(CandidateStrategy(compounds, pit_laps))
+    return candidates
+
+def _evaluate_strategies(simulation: F1RealisticSimulation, track_name: str, driver_name: str,
+                         qualifying_results: List[List[Tuple[str, float]]], plans: StintPlans,
+                         strategies: Sequence[CandidateStrategy], seed: int, event_driven: bool,
+                         wear_spread: float) -> np.ndarray:
+    """Finishing position of the driver for each strategy in each race
+
+    Every strategy is raced with the same seed, so all of them see the same
+    DNFs, safety cars and overtaking dice (common random numbers). wear_spread
+    bounds the wear spread under every candidate, so the event-driven kernel
+    draws overtakes under the same envelope whatever the strategy.
+    """
+    positions = np.empty((len(strategies), len(qualifying_results)))
+    for k, strategy in enumerate(strategies):
+        strategy_plans = plans.with_strategy(driver_name, strategy.compounds, strategy.pit_laps)
+        np.random.seed(seed)
+        random.seed(seed)
+        races = simulation.simulate_race(track_name, qualifying_results, len(qualifying_results),
+                                         event_driven=event_driven, stint_plans=strategy_plans,
+                                         wear_spread=wear_spread)
+        positions[k] = [race.index(driver_name) + 1 for race in races]
+    return positions
+
+class PitStrategyOptimizer:
+    """Search one- and two-stop plans for a driver against a shared race ensemble
+
+    The search starts from a coarse grid of pit laps and repeatedly halves the
+    grid spacing around the beam_width best strategies still in contention,
+    racing everything on the same screening races. Survivors then race off over fresh batches.
+    After every step, strategies whose paired position deficit to the leader
+    exceeds prune_z standard errors are dropped as dominated, and at most
+    `finalists` strategies go through to the race-off.
+
+    Races run on the event-driven kernel by default; with event_driven=False
+    they use the lap-by-lap kernel, which is roughly ten times slower. Both
+    keep the random streams of all candidates aligned.
+    """
+
+    def __init__(self, simulation: Optional[F1RealisticSimulation] = None, workers: Optional[int] = None,
+                 races_per_round: int = 48, max_rounds: int = 3, prune_z: float = 2.5,
+                 coarse_step: int = 8, lap_step: int = 1, beam_width: int = 6, finalists: int = 12,
+                 event_driven: bool = True, seed: int = 0):
+        self.simulation = simulation or F1RealisticSimulation()
+        self.workers = workers or os.cpu_count() or 1
+        self.races_per_round = races_per_round
+        self.max_rounds = max_rounds
+        self.prune_z = prune_z
+        self.coarse_step = coarse_step
+        self.lap_step = lap_step
+        self.beam_width = beam_width
+        self.finalists = finalists
+        self.event_driven = event_driven
+        self.seed = seed
+
+    def tire_life(self, track_name: str, driver_name: str) -> Dict[TireCompound, int]:
+        """Laps each dry compound lasts for this driver before passing the wear threshold"""
+        driver = self.simulation.drivers[driver_name]
+        track = self.simulation.tracks[track_name]
+        life = tire_life(driver_wear_rates([driver], self.simulation.cars, track), track.race_laps)
+        return {compound: int(life[COMPOUNDS.index(compound), 0]) for compound in DRY_COMPOUNDS}
+
+    def optimise(self, track_name: str, driver_name: str, max_stops: int = 2) -> List[StrategyResult]:
+        """Expected finishing position by strategy, best first"""
+        sim = self.simulation
+        life = self.tire_life(track_name, driver_name)
+        laps = sim.tracks[track_name].race_laps
+
+        # Never plan a set past its wear threshold; drivers who cannot make any
+        # one- or two-stop plan work keep the plans with the least overrun
+        coarse = candidate_strategies(max_stops, laps, lap_step=self.coarse_step)
+        max_overrun = min(candidate.overrun(life, laps) for candidate in coarse)
+        frontier = [candidate for candidate in coarse if candidate.overrun(life, laps) <= max_overrun]
+
+        # Shared ensemble: one set of grids and rival strategies for every candidate
+        total_races = self.races_per_round * self.max_rounds
+        np.random.seed(self.seed)
+        random.seed(self.seed)
+        qualifying_results = sim.simulate_qualifying(track_name, total_races)
+        plans = sim.plan_stints(track_name, total_races)
+        # No candidate runs a set more than max_overrun laps past its life
+        wear_spread = plans.max_wear_spread(driver_name, {compound: laps_to_worn - 1 + max_overrun
+                                                          for compound, laps_to_worn in life.items()})
+
+        positions = {}
+        pruned = set()
+        alive = []
+        step = self.coarse_step
+
+        with ProcessPoolExecutor(max_workers=self.workers) if self.workers > 1 else _InlineExecutor() as pool:
+            def race(strategies: List[CandidateStrategy], round_index: int):
+                races = slice(round_index * self.races_per_round, (round_index + 1) * self.races_per_round)
+                seed = int(np.random.SeedSequence([self.seed, round_index]).generate_state(1)[0])
+                batches = [strategies[i::self.workers] for i in range(min(self.workers, len(strategies)))]
+                futures = [pool.submit(_evaluate_strategies, sim, track_name, driver_name,
+                                       qualifying_results[races], plans.take(races), batch, seed,
+                                       self.event_driven, wear_spread)
+                           for batch in batches]
+                for batch, future in zip(batches, futures):
+                    for strategy, row in zip(batch, future.result()):
+                        positions.setdefault(strategy, []).append(row)
+
+            # Coarse-to-fine search on the screening races
+            while frontier:
+                race(frontier, 0)
+                alive = self._prune(alive + frontier, positions, pruned)
+                if step <= self.lap_step:
+                    break
+                step = max(self.lap_step, step // 2)
+                leaders = sorted(alive, key=lambda strategy: np.concatenate(positions[strategy]).mean())
+                frontier = [neighbour for strategy in leaders[:self.beam_width]
+                            for neighbour in self._neighbours(strategy, step, laps)
+                            if neighbour not in positions and neighbour.overrun(life, laps) <= max_overrun]
+                frontier = list(dict.fromkeys(frontier))
+
+            # Race-off between the best survivors on fresh races
+            alive = sorted(alive, key=lambda strategy: np.concatenate(positions[strategy]).mean())
+            pruned.update(alive[self.finalists:])
+            alive = alive[:self.finalists]
+            for round_index in range(1, self.max_rounds):
+                if len(alive) <= 1:
+                    break
+                race(alive, round_index)
+                alive = self._prune(alive, positions, pruned)
+
+        results = []
+        for strategy, rows in positions.items():
+            finishes = np.concatenate(rows)
+            results.append(StrategyResult(
+                strategy=strategy,
+                expected_position=float(finishes.mean()),
+                std_error=float(finishes.std(ddof=1) / np.sqrt(len(finishes))) if len(finishes) > 1 else 0.0,
+                races=len(finishes),
+                pruned=strategy in pruned
+            ))
+
+        # Strategies that survived every round rank ahead of pruned ones
+        return sorted(results, key=lambda result: (result.pruned, result.expected_position))
+
+    def _neighbours(self, strategy: CandidateStrategy, step: int,
+                    laps: int = RACE_LAPS) -> List[CandidateStrategy]:
+        """Same compounds with one stop moved by +/- step laps"""
+        neighbours = []
+        for stop in range(strategy.stops):
+            for delta in (-step, step):
+                pit_laps = list(strategy.pit_laps)
+                pit_laps[stop] += delta
+                candidate = CandidateStrategy(strategy.compounds, tuple(pit_laps))
+                if min(candidate.stint_ages(laps)) >= MIN_STINT_LAPS:
+                    neighbours.append(candidate)
+        return neighbours
+
+    def _prune(self, alive: List[CandidateStrategy], positions: Dict[CandidateStrategy, List[np.ndarray]],
+               pruned: set) -> List[CandidateStrategy]:
+        """Drop strategies significantly worse than the leader on the races they share"""
+        finishes = {strategy: np.concatenate(positions[strategy]) for strategy in alive}
+        leader = min(alive, key=lambda strategy: finishes[strategy].mean())
+        survivors = []
+        for strategy in alive:
+            diff = finishes[strategy] - finishes[leader]
+            se = diff.std(ddof=1) / np.sqrt(len(diff))
+            if diff.mean() > 0 and diff.mean() > self.prune_z * se:
+                pruned.add(strategy)
+            else:
+                survivors.append(strategy)
+        return survivors
+
+    def best_by_start_compound(self, results: List[StrategyResult]) -> Dict[TireCompound, Dict[int, StrategyResult]]:
+        """Best one- and two-stop strategy for each starting compound"""
+        best = {}
+        for result in results:
+            by_stops = best.setdefault(result.strategy.compounds[0], {})
+            current = by_stops.get(result.strategy.stops)
+            if current is None or (current.pruned, current.expected_position) > (result.pruned, result.expected_position):
+                by_stops[result.strategy.stops] = result
+        return best
+
+class _InlineExecutor:
+    """Executor stand-in that runs work in the calling process"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def submit(self, fn, *args):
+        return _CompletedFuture(fn(*args))
+
+class _CompletedFuture:
+    def __init__(self, value):
+        self._value = value
+
+    def result(self):
+        return self._value
+
+# Example usage
+if __name__ == "__main__":
+    optimizer = PitStrategyOptimizer()
+
+    for driver in ["Max Verstappen", "Charles Leclerc"]:
+        results = optimizer.optimise("Spain", driver)
+        print(f"\n{driver} - Spain ({len(results)} strategies)")
+        for result in results[:5]:
+            print(f"  {result.strategy.name:40s} P{result.expected_position:.2f} "
+                  f"± {result.std_error:.2f} ({result.races} races)")
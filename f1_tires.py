@@ -0,0 +1,192 @@
+import numpy as np
+from dataclasses import dataclass
+from typing import Dict, List, Sequence
+
+from f1_realistic_simulation import (
+    Car, Driver, Track, TireCompound, RACE_LAPS, PIT_WEAR_THRESHOLD
+)
+
+# Compound lookup table: (wear multiplier, wear curve exponent, grip)
+# Wear after `age` laps is rate * multiplier * age ** exponent, where rate comes
+# from track.tire_wear_rate, car.tire_degradation and driver.tire_management as
+# in simulate_race. Grip is subtracted from wear, so a fresh soft is worth a
+# little more than a fresh hard when two cars fight for position.
+COMPOUND_WEAR = {
+    TireCompound.SOFT: (1.4, 1.15, 0.15),
+    TireCompound.MEDIUM: (1.0, 1.0, 0.05),
+    TireCompound.HARD: (0.7, 1.0, 0.0),
+    TireCompound.INTERMEDIATE: (1.2, 1.05, 0.0),
+    TireCompound.WET: (1.0, 1.0, 0.0),
+}
+
+COMPOUNDS = list(COMPOUND_WEAR.keys())
+DRY_COMPOUNDS = [TireCompound.SOFT, TireCompound.MEDIUM, TireCompound.HARD]  # Softest first
+PIT_WINDOW_LAPS = 3  # Teams pit up to this many laps before the tires are worn
+
+@dataclass
+class StintPlans:
+    """Precomputed stint plans for an ensemble of races"""
+    driver_names: List[str]
+    wear_rate: np.ndarray  # (drivers,) base wear per lap
+    compounds: np.ndarray  # (sims, drivers, stints) index into COMPOUNDS, -1 after the last stint
+    pit_laps: np.ndarray  # (sims, drivers, stints - 1) lap of each stop, RACE_LAPS if unused
+    wear: np.ndarray  # (sims, laps, drivers) effective wear the race kernel indexes into
+
+    @property
+    def num_stops(self) -> np.ndarray:
+        """Number of pit stops per simulation and driver"""
+        return (self.pit_laps < self.wear.shape[1]).sum(axis=-1)
+
+    def take(self, sims) -> "StintPlans":
+        """Plans for a subset of the simulations (slice or index array)"""
+        return StintPlans(self.driver_names, self.wear_rate, self.compounds[sims],
+                          self.pit_laps[sims], self.wear[sims])
+
+    def with_strategy(self, driver_name: str, compounds: Sequence[TireCompound],
+                      pit_laps: Sequence[int]) -> "StintPlans":
+        """Copy of these plans with one driver on the same fixed strategy in every race"""
+        d = self.driver_names.index(driver_name)
+        num_sims, laps, num_drivers = self.wear.shape
+        stints = max(self.compounds.shape[2], len(compounds))
+
+        new_compounds = np.full((num_sims, num_drivers, stints), -1, dtype=np.int8)
+        new_compounds[:, :, :self.compounds.shape[2]] = self.compounds
+        new_compounds[:, d, :] = -1
+        new_compounds[:, d, :len(compounds)] = [COMPOUNDS.index(compound) for compound in compounds]
+
+        new_pit_laps = np.full((num_sims, num_drivers, stints - 1), laps, dtype=np.int16)
+        new_pit_laps[:, :, :self.pit_laps.shape[2]] = self.pit_laps
+        new_pit_laps[:, d, :] = laps
+        new_pit_laps[:, d, :len(pit_laps)] = pit_laps
+
+        wear = self.wear.copy()
+        column = build_wear(self.wear_rate[d:d + 1], new_compounds[:1, d:d + 1], new_pit_laps[:1, d:d + 1], laps)
+        wear[:, :, d] = column[0, :, 0]
+        return StintPlans(self.driver_names, self.wear_rate, new_compounds, new_pit_laps, wear)
+
+    def max_wear_spread(self, driver_name: str, max_ages: Dict[TireCompound, int]) -> float:
+        """Largest wear gap these plans can show with driver_name on any strategy
+
+        max_ages caps how old each compound may get in the driver's stints.
+        Unlike the spread of self.wear, the bound does not depend on which
+        strategy the driver runs, so it suits simulate_race(wear_spread=...)
+        when comparing strategies.
+        """
+        d = self.driver_names.index(driver_name)
+        laps = self.wear.shape[1]
+        curves, grip = wear_curves(laps), compound_grip()
+        rivals = np.delete(self.wear, d, axis=2)
+        most_worn = max(curves[COMPOUNDS.index(compound), min(age, laps)] * self.wear_rate[d]
+                        - grip[COMPOUNDS.index(compound)] for compound, age in max_ages.items())
+        freshest = -max(grip[COMPOUNDS.index(compound)] for compound in max_ages)
+        return float(max(rivals.max(), most_worn) - min(rivals.min(), freshest))
+
+    def strategy(self, sim: int, driver_name: str) -> List[str]:
+        """Readable stint plan, e.g. ['soft', 'pit lap 14', 'hard']"""
+        d = self.driver_names.index(driver_name)
+        plan = []
+        for stint, compound in enumerate(self.compounds[sim, d]):
+            if compound < 0:
+                break
+            if stint > 0:
+                plan.append(f"pit lap {self.pit_laps[sim, d, stint - 1] + 1}")
+            plan.append(COMPOUNDS[compound].value)
+        return plan
+
+def wear_curves(laps: int = RACE_LAPS) -> np.ndarray:
+    """Lookup table of unit-rate wear by compound and tire age, shape (compounds, laps + 1)"""
+    ages = np.arange(laps + 1, dtype=float)
+    return np.array([multiplier * ages ** exponent for multiplier, exponent, _ in COMPOUND_WEAR.values()])
+
+def compound_grip() -> np.ndarray:
+    """Grip offset per compound, indexed like COMPOUNDS"""
+    return np.array([grip for _, _, grip in COMPOUND_WEAR.values()])
+
+def driver_wear_rates(drivers: Sequence[Driver], cars: Dict[str, Car], track: Track) -> np.ndarray:
+    """Base tire wear per lap for each driver at this track"""
+    return np.array([
+        track.tire_wear_rate * cars[driver.team].tire_degradation * (1 - driver.tire_management / 100)
+        for driver in drivers
+    ])
+
+def tire_life(wear_rate: np.ndarray, laps: int = RACE_LAPS) -> np.ndarray:
+    """Laps until each compound passes the pit threshold, shape (compounds, drivers)"""
+    worn = wear_curves(laps)[:, :, None] * wear_rate[None, None, :] > PIT_WEAR_THRESHOLD
+    # Tires that never wear out within the race last laps + 1
+    return np.where(worn.any(axis=1), worn.argmax(axis=1), laps + 1)
+
+def build_wear(wear_rate: np.ndarray, compounds: np.ndarray, pit_laps: np.ndarray,
+               laps: int = RACE_LAPS) -> np.ndarray:
+    """Effective wear per simulation, lap and driver from stint plans
+
+    A stop on lap p resets the tires for that lap, matching simulate_race.
+    """
+    lap_index = np.arange(laps)[None, :, None]
+    shape = (compounds.shape[0], laps, compounds.shape[1])
+    stint = np.zeros(shape, dtype=np.int8)
+    last_pit = np.full(shape, -1, dtype=np.int16)
+    for stop in range(pit_laps.shape[2]):
+        pitted = pit_laps[:, None, :, stop] <= lap_index  # (sims, laps, drivers)
+        stint += pitted
+        last_pit = np.where(pitted, pit_laps[:, None, :, stop], last_pit)
+
+    age = lap_index - last_pit
+    compound = np.take_along_axis(compounds, stint.transpose(0, 2, 1), axis=2).transpose(0, 2, 1)
+
+    curves = wear_curves(laps).astype(np.float32)
+    grip = compound_grip().astype(np.float32)
+    return curves[compound, age] * wear_rate.astype(np.float32)[None, None, :] - grip[compound]
+
+def plan_stints(drivers: Sequence[Driver], cars: Dict[str, Car], track: Track, num_simulations: int,
+                laps: int = RACE_LAPS, rng=None) -> StintPlans:
+    """Plan every driver's strategy for an ensemble of races in one vectorized pass
+
+    Each driver starts on a random dry compound. Every stop falls inside the pit
+    window before the tires pass the wear threshold and switches to the softest
+    other dry compound that can reach the flag, or the longest lasting one if
+    none can.
+    """
+    rng = rng if rng is not None else np.random
+    num_drivers = len(drivers)
+    wear_rate = driver_wear_rates(drivers, cars, track)
+    life = tire_life(wear_rate, laps)
+    dry = np.array([COMPOUNDS.index(compound) for compound in DRY_COMPOUNDS])
+    dry_life = life[dry]  # (dry compounds, drivers), softest first
+    shape = (num_simulations, num_drivers)
+
+    current = (rng.random(shape) * len(dry)).astype(int)  # Position in DRY_COMPOUNDS
+    last_pit = np.full(shape, -1)
+    compounds = [dry[current]]
+    pit_laps = []
+
+    active = np.ones(shape, dtype=bool)
+    while True:
+        stint_life = dry_life[current, np.arange(num_drivers)[None, :]]
+        window = np.minimum(PIT_WINDOW_LAPS, stint_life - 1)
+        pit = last_pit + stint_life - np.floor(rng.random(shape) * (window + 1)).astype(int)
+        active &= last_pit + stint_life < laps  # No stop if these tires reach the flag
+        if not active.any():
+            break
+
+        # Softest other compound that reaches the flag, else the longest lasting one
+        remaining = laps - pit
+        candidates = np.arange(len(dry))[None, None, :] != current[:, :, None]
+        reaches = candidates & (dry_life.T[None, :, :] >= remaining[:, :, None])
+        longest = np.where(candidates, dry_life.T[None, :, :], -1).argmax(axis=2)
+        following = np.where(reaches.any(axis=2), reaches.argmax(axis=2), longest)
+
+        pit_laps.append(np.where(active, pit, laps))
+        compounds.append(np.where(active, dry[following], -1))
+        current = np.where(active, following, current)
+        last_pit = np.where(active, pit, last_pit)
+
+    compounds = np.stack(compounds, axis=2).astype(np.int8)
+    pit_laps = (np.stack(pit_laps, axis=2) if pit_laps
+                else np.full(shape + (0,), laps)).astype(np.int16)
+    return StintPlans(
+        driver_names=[driver.name for driver in drivers],
+        wear_rate=wear_rate,
+        compounds=compounds,
+        pit_laps=pit_laps,
+        wear=build_wear(wear_rate, compounds, pit_laps, laps),
+    )
@@ -0,0 +1,158 @@
+import numpy as np
+from typing import Dict, Iterable, Optional, Sequence, Tuple, Union
+
+from f1_engines import RaceEnsemble
+
+VARIANCE_METHODS = ("antithetic", "control_variate")
+PILOT_FACTOR = 4  # Pilot qualifying runs per simulation, for the control variate's mean
+PILOT_SEED_TAG = 45  # Keeps the pilot's stream apart from the run's own seed and shards
+TOP_FINISHES = {"win_probabilities": 1, "podium_probabilities": 3, "points_probabilities": 10}
+
+def parse_methods(methods: Union[None, str, Iterable[str]]) -> Tuple[str, ...]:
+    """Normalise a method name, comma-separated names or a list of names"""
+    if not methods:
+        return ()
+    if isinstance(methods, str):
+        methods = [method.strip() for method in methods.split(",") if method.strip()]
+    methods = tuple(dict.fromkeys(methods))
+    unknown = [method for method in methods if method not in VARIANCE_METHODS]
+    if unknown:
+        raise ValueError(f"Unknown variance reduction '{', '.join(unknown)}'. "
+                         f"Available: {', '.join(VARIANCE_METHODS)}")
+    return methods
+
+class AntitheticDraws:
+    """Generator wrapper that pairs every simulation with a mirrored one
+
+    A request for (n, ...) values draws the first ceil(n / 2) rows and fills
+    the rest with their mirror images: 1 - u for uniforms, 2 * loc - x for
+    normals and the opposite tail of the inverse CDF for choice. Simulation
+    i is paired with i + ceil(n / 2); partners() gives that pairing.
+    """
+
+    def __init__(self, rng: np.random.Generator):
+        self.rng = rng
+
+    @staticmethod
+    def _half(size) -> Tuple[int, Tuple]:
+        size = (size,) if np.isscalar(size) else tuple(size)
+        return size[0], ((size[0] + 1) // 2,) + size[1:]
+
+    @staticmethod
+    def partners(num_simulations: int) -> np.ndarray:
+        """Index of each simulation's antithetic partner, -1 for the unpaired middle one of an odd batch"""
+        half = (num_simulations + 1) // 2
+        partner = np.full(num_simulations, -1, dtype=np.int64)
+        paired = num_simulations - half
+        partner[:paired] = np.arange(half, num_simulations)
+        partner[half:] = np.arange(paired)
+        return partner
+
+    def random(self, size):
+        n, half = self._half(size)
+        u = self.rng.random(half)
+        return np.concatenate([u, 1 - u])[:n]
+
+    def normal(self, loc=0.0, scale=1.0, size=None):
+        n, half = self._half(size)
+        z = self.rng.normal(0, 1, half)
+        return loc + scale * np.concatenate([z, -z])[:n]
+
+    def choice(self, a, size=None, p=None):
+        n, half = self._half(size)
+        options = np.arange(a) if np.isscalar(a) else np.asarray(a)
+        cumulative = np.cumsum(p if p is not None else np.full(len(options), 1 / len(options)))
+        u = self.rng.random(half)
+        picks = np.searchsorted(cumulative, np.concatenate([u, 1 - u])[:n], side="right")
+        return options[np.minimum(picks, len(options) - 1)]
+
+def positions(order: np.ndarray, num_drivers: int) -> np.ndarray:
+    """Invert orders: (simulations x drivers) position of every driver, 0 for first"""
+    result = np.empty((len(order), num_drivers), dtype=np.int16)
+    np.put_along_axis(result, order.astype(np.intp), np.arange(order.shape[1], dtype=np.int16)[None, :], axis=1)
+    return result
+
+def expected_grid_positions(model, track_name: str, num_simulations: int, seed: Optional[int] = None,
+                            **options) -> np.ndarray:
+    """Mean starting position of every driver from a cheap qualifying-only pilot run"""
+    rng = np.random.default_rng(None if seed is None else [PILOT_SEED_TAG, seed])
+    race_options = model.prepare_race_options(track_name, num_simulations, rng, **options)
+    grid = model.simulate_qualifying_vectorized(track_name, num_simulations, rng, model.compile_tables(track_name),
+                                                **model.qualifying_options(race_options))
+    return positions(grid, len(model.driver_names)).mean(axis=0)
+
+def _estimator_variance(values: np.ndarray, partner: Optional[np.ndarray]) -> np.ndarray:
+    """Variance of the per-driver mean of values, averaging antithetic pairs first when they exist"""
+    if partner is None:
+        return values.var(axis=0) / len(values)
+    first = np.flatnonzero(partner > np.arange(len(partner)))
+    pair_means = (values[first] + values[partner[first]]) / 2
+    return pair_means.var(axis=0) / len(first)
+
+def reduce_variance(ensemble: RaceEnsemble, grid_means: Optional[np.ndarray] = None,
+                    pilot_simulations: Optional[int] = None) -> Tuple[Dict[str, Dict[str, float]], Dict]:
+    """Win, podium and points probabilities with variance reduction, plus the effective sample size gained
+
+    With grid_means (expected_grid_positions) every driver's finishing
+    indicator is adjusted by a control variate on their starting position:
+    Y - beta * (X - E[X]) with beta = cov(Y, X) / var(X). With the
+    ensemble's antithetic partners the estimator variance is measured on pair
+    averages. grid_means is itself estimated from pilot_simulations
+    independent runs, which adds beta^2 * var(X) / pilot_simulations to the
+    estimator variance; without pilot_simulations the means are taken as
+    exact. The effective sample size is the number of independent
+    simulations that would give the same standard error. Adjusted
+    probabilities are clipped to [0, 1], so a kind's probabilities need not
+    sum exactly to its number of places.
+    """
+    names = ensemble.driver_names
+    num_simulations = ensemble.num_simulations
+    finish_positions = positions(ensemble.finish, len(names))
+    grid_positions = None
+    if grid_means is not None:
+        grid_positions = positions(ensemble.grid, len(names)).astype(float)
+        centred = grid_positions - grid_positions.mean(axis=0)
+        grid_variance = (centred ** 2).mean(axis=0)
+
+    probabilities, standard_errors, effective = {}, {}, {}
+    gains = {}
+    for kind, top in TOP_FINISHES.items():
+        y = (finish_positions < top).astype(float)
+        adjusted = y
+        if grid_positions is not None:
+            covariance = (centred * (y - y.mean(axis=0))).mean(axis=0)
+            beta = np.divide(covariance, grid_variance, out=np.zeros_like(covariance), where=grid_variance > 0)
+            adjusted = y - beta * (grid_positions - grid_means)
+        plain = y.var(axis=0) / num_simulations
+        reduced = _estimator_variance(adjusted, ensemble.partner)
+        if grid_positions is not None and pilot_simulations:
+            reduced = reduced + beta ** 2 * grid_variance / pilot_simulations
+        estimate = np.clip(adjusted.mean(axis=0), 0.0, 1.0)
+        ess = np.divide(plain * num_simulations, reduced, out=np.full(len(names), float(num_simulations)),
+                        where=reduced > 0)
+        probabilities[kind] = dict(zip(names, estimate.tolist()))
+        standard_errors[kind] = dict(zip(names, np.sqrt(reduced).tolist()))
+        effective[kind] = dict(zip(names, np.round(ess, 1).tolist()))
+        gains[kind] = float(plain.sum() / reduced.sum()) if reduced.sum() > 0 else 1.0
+
+    methods = (["antithetic"] if ensemble.partner is not None else []) + \
+              (["control_variate"] if grid_means is not None else [])
+    return probabilities, {
+        "methods": methods,
+        "num_simulations": num_simulations,
+        "gain": {kind: round(gain, 3) for kind, gain in gains.items()},
+        "effective_sample_size": effective,
+        "standard_errors": standard_errors
+    }
+
+def apply_variance_reduction(model, track_name: str, ensemble: RaceEnsemble, results: Dict,
+                             methods: Sequence[str], seed: Optional[int] = None, **options) -> Dict:
+    """Replace a results dict's probabilities with the variance-reduced ones and add the report"""
+    grid_means, pilot_simulations = None, None
+    if "control_variate" in methods:
+        pilot_simulations = PILOT_FACTOR * ensemble.num_simulations
+        grid_means = expected_grid_positions(model, track_name, pilot_simulations, seed, **options)
+    probabilities, report = reduce_variance(ensemble, grid_means, pilot_simulations)
+    results.update(probabilities)
+    results["variance_reduction"] = report
+    return results
@@ -0,0 +1,121 @@
+import numpy as np
+from typing import Callable, Dict, List, Optional
+
+# Batched building blocks shared by the NumPy simulation paths. Every array is
+# laid out (simulations, ...) and orders hold driver indices by position.
+
+def grid_from_times(times: np.ndarray) -> np.ndarray:
+    """Starting grid (simulations x positions) from lap times (simulations x drivers)"""
+    return np.argsort(times, axis=1, kind="stable").astype(np.int16)
+
+def retire_to_back(order: np.ndarray, retiring: np.ndarray) -> np.ndarray:
+    """Move retiring drivers (flagged by position) to the back, keeping running order within both groups"""
+    rows = np.flatnonzero(retiring.any(axis=1))
+    if len(rows):
+        moved = np.argsort(retiring[rows], axis=1, kind="stable")
+        order[rows] = np.take_along_axis(order[rows], moved, axis=1)
+    return order
+
+def sweep_overtakes(order: np.ndarray, swap_prob: Callable[[np.ndarray, np.ndarray, np.ndarray], np.ndarray],
+                    draws: np.ndarray) -> np.ndarray:
+    """One lap of adjacent-pair overtakes, front to back, for every simulation at once
+
+    swap_prob(rows, ahead, behind) gives the chance that `behind` passes `ahead`
+    in simulations `rows`; pair i passes when draws[:, i] falls below it. Pairs
+    are resolved in order, so a driver who is passed can be passed again further
+    down the same lap, exactly as in the list-based loop.
+    """
+    rows = np.arange(order.shape[0])
+    for i in range(order.shape[1] - 1):
+        ahead = order[:, i].copy()
+        behind = order[:, i + 1].copy()
+        swap = draws[:, i] < swap_prob(rows, ahead, behind)
+        order[swap, i] = behind[swap]
+        order[swap, i + 1] = ahead[swap]
+    return order
+
+def resolve_overtakes(order: np.ndarray, swap_prob: Callable[[np.ndarray, np.ndarray, np.ndarray], np.ndarray],
+                      draws: np.ndarray) -> np.ndarray:
+    """Same lap as sweep_overtakes, without looping over grid positions
+
+    In the front-to-back sweep the driver checked at pair i is either the one
+    who started there or one carried down from above after being passed, and
+    each driver gains at most one place. So every pair is first tested against
+    the grid as it stood, and a driver passed at pair s keeps being tested
+    against the next car until a draw fails (looping only over how far drivers
+    drop, rarely more than a few places). Passes only count if no earlier run
+    in that race already carried a driver past s; that condition looks only at
+    earlier passes, so iterating it from "every pass counts" settles after a
+    couple of segmented prefix-max steps. Given the same draws the result is
+    identical to sweep_overtakes.
+    """
+    num_simulations, num_drivers = order.shape
+    num_pairs = num_drivers - 1
+
+    # Every pair against the grid as it stood, then follow passed drivers down
+    passed = draws < swap_prob(np.arange(num_simulations)[:, None], order[:, :-1], order[:, 1:])
+    rows, starts = np.nonzero(passed)  # Sorted by race, then position
+    if not len(rows):
+        return order
+    ends = starts + 1  # Where the passed driver ends up
+    falling = np.flatnonzero(ends < num_pairs)
+    while len(falling):
+        r, s, pair = rows[falling], starts[falling], ends[falling]
+        keep = draws[r, pair] < swap_prob(r, order[r, s], order[r, pair + 1])
+        falling = falling[keep]
+        ends[falling] += 1
+        falling = falling[ends[falling] < num_pairs]
+
+    # A pass counts unless an earlier counted run in the same race reaches it.
+    # Offsetting by race keeps one running maximum from leaking across races.
+    offset = rows * num_drivers
+    counted = np.ones(len(rows), dtype=bool)
+    while True:
+        reach = np.maximum.accumulate(np.where(counted, offset + ends, -1))
+        covered = np.zeros(len(rows), dtype=bool)
+        covered[1:] = reach[:-1] >= offset[1:] + starts[1:]
+        if (~covered == counted).all():
+            break
+        counted = ~covered
+    rows, starts, ends = rows[counted], starts[counted], ends[counted]
+
+    # Within a run [s, end] everyone moves up one place and the passed driver lands at the end
+    lengths = ends - starts + 1
+    first = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    run_rows = np.repeat(rows, lengths)
+    run_start = np.repeat(starts, lengths)
+    run_end = np.repeat(ends, lengths)
+    cells = run_start + np.arange(len(run_rows)) - first
+    source = np.where(cells == run_end, run_start, cells + 1)
+    order[run_rows, cells] = order[run_rows, source]
+    return order
+
+def position_counts(order: np.ndarray, num_drivers: int, weights: Optional[np.ndarray] = None) -> np.ndarray:
+    """How often each driver finished in each position, shape (drivers, positions)
+
+    With weights (one per simulation) each race counts its weight instead of one.
+    """
+    positions = np.broadcast_to(np.arange(order.shape[1]), order.shape)
+    flat = order.astype(np.int64) * order.shape[1] + positions
+    if weights is not None:
+        weights = np.repeat(weights, order.shape[1])
+    return np.bincount(flat.ravel(), weights=weights,
+                       minlength=num_drivers * order.shape[1]).reshape(num_drivers, order.shape[1])
+
+def probabilities_from_counts(counts: np.ndarray, driver_names: List[str],
+                              total: Optional[float] = None) -> Dict[str, Dict[str, float]]:
+    """Win, podium and points probabilities from a position count matrix
+
+    total defaults to the number of races counted; pass the simulation count for weighted counts.
+    """
+    total = total if total is not None else (counts[0].sum() if len(counts) else 0)
+    cumulative = np.cumsum(counts, axis=1) / max(total, 1)
+    return {
+        "win_probabilities": dict(zip(driver_names, cumulative[:, 0].tolist())),
+        "podium_probabilities": dict(zip(driver_names, cumulative[:, min(2, counts.shape[1] - 1)].tolist())),
+        "points_probabilities": dict(zip(driver_names, cumulative[:, min(9, counts.shape[1] - 1)].tolist())),
+    }
+
+def orders_to_names(order: np.ndarray, driver_names: List[str]) -> List[List[str]]:
+    """Convert index orders back to the list-of-names form used by simulate_race"""
+    return [[driver_names[i] for i in row] for row in order.tolist()]
@@ -0,0 +1,155 @@
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from f1_engines import DEFAULT_BACKEND, get_backend
+from f1_realistic_simulation import F1RealisticSimulation, WeatherCondition
+
+STANDARD_COUNTS = (1000, 5000, 10000)
+READY_COUNT = 5000  # The web form's default; traffic waits for these forecasts
+WARMUP_BACKEND = DEFAULT_BACKEND  # Warm what the app serves by default, so default traffic hits the cache
+
+CacheKey = Tuple[str, str, int, str, str]  # (track, weather, num_simulations, model_hash, backend)
+
+class ForecastCache:
+    """Thread-safe in-memory cache of results dicts for unseeded forecasts"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._results: Dict[CacheKey, Dict] = {}
+
+    @staticmethod
+    def key(model: F1RealisticSimulation, track_name: str, num_simulations: int,
+            weather: Optional[WeatherCondition] = None, backend: str = WARMUP_BACKEND) -> CacheKey:
+        weather = weather or model.tracks[track_name].weather
+        if weather != model.tracks[track_name].weather:
+            model = model.with_weather(track_name, weather)
+        return (track_name, weather.value, num_simulations, model.model_hash(), backend)
+
+    def get(self, key: CacheKey) -> Optional[Dict]:
+        with self._lock:
+            return self._results.get(key)
+
+    def put(self, key: CacheKey, results: Dict):
+        with self._lock:
+            self._results[key] = results
+
+    def nearest(self, key: CacheKey) -> Optional[Dict]:
+        """The cached result for the same track, weather, model and backend with the most simulations"""
+        with self._lock:
+            matches = [(other[2], results) for other, results in self._results.items()
+                       if other[:2] == key[:2] and other[3:] == key[3:]]
+        return max(matches, key=lambda match: match[0])[1] if matches else None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._results)
+
+@dataclass
+class WarmupTask:
+    track: str
+    weather: WeatherCondition
+    num_simulations: int
+    essential: bool  # Needed before the server reports ready
+
+@dataclass
+class WarmupStatus:
+    total: int = 0
+    essential: int = 0
+    completed: int = 0
+    essential_completed: int = 0
+    failed: List[str] = field(default_factory=list)
+    started: Optional[float] = None
+    finished: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.essential_completed >= self.essential
+
+    def to_dict(self) -> Dict:
+        elapsed = ((self.finished or time.time()) - self.started) if self.started else 0.0
+        return {
+            "ready": self.ready,
+            "running": self.started is not None and self.finished is None,
+            "total": self.total,
+            "completed": self.completed,
+            "essential": self.essential,
+            "essential_completed": self.essential_completed,
+            "failed": self.failed,
+            "elapsed_seconds": round(elapsed, 1),
+        }
+
+def warmup_tasks(model: F1RealisticSimulation, counts: Sequence[int] = STANDARD_COUNTS,
+                 weathers: Optional[Sequence[WeatherCondition]] = None) -> List[WarmupTask]:
+    """Every track x weather x count, with the forecasts traffic needs first at the front"""
+    weathers = list(weathers or WeatherCondition)
+    ready_count = READY_COUNT if READY_COUNT in counts else min(counts)
+    tasks = []
+    for track_name, track in model.tracks.items():
+        for weather in weathers:
+            for num_simulations in counts:
+                # The track's own weather at the web form's default count is what traffic asks for
+                essential = weather == track.weather and num_simulations == ready_count
+                tasks.append(WarmupTask(track_name, weather, num_simulations, essential))
+    return sorted(tasks, key=lambda task: (not task.essential, task.num_simulations))
+
+def _run_forecast(model: F1RealisticSimulation, task: WarmupTask, backend: str) -> Tuple[CacheKey, Dict]:
+    if task.weather != model.tracks[task.track].weather:
+        model = model.with_weather(task.track, task.weather)
+    ensemble = model.run_ensemble(task.track, task.num_simulations, backend)
+    results = model.summarise_ensemble(task.track, ensemble, backend)
+    results["weather"] = task.weather.value
+    return (task.track, task.weather.value, task.num_simulations, model.model_hash(), backend), results
+
+class Warmup:
+    """Fill a ForecastCache for every track in the background with a worker pool"""
+
+    def __init__(self, model: F1RealisticSimulation, cache: ForecastCache, counts: Sequence[int] = STANDARD_COUNTS,
+                 weathers: Optional[Sequence[WeatherCondition]] = None, backend: str = WARMUP_BACKEND,
+                 workers: Optional[int] = None):
+        get_backend(backend)  # Fail fast on unknown backends
+        self.model = model
+        self.cache = cache
+        self.backend = backend
+        self.workers = workers or os.cpu_count() or 1
+        self.tasks = warmup_tasks(model, counts, weathers)
+        self.status = WarmupStatus(total=len(self.tasks),
+                                   essential=sum(task.essential for task in self.tasks))
+        self._ready = threading.Event()
+        self._thread = None
+        if self.status.ready:
+            self._ready.set()
+
+    def start(self) -> "Warmup":
+        """Run in a daemon thread and return immediately"""
+        self._thread = threading.Thread(target=self.run, name="forecast-warmup", daemon=True)
+        self._thread.start()
+        return self
+
+    def wait_until_ready(self, timeout: Optional[float] = None) -> bool:
+        return self._ready.wait(timeout)
+
+    def run(self):
+        self.status.started = time.time()
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            futures = {pool.submit(_run_forecast, self.model, task, self.backend): task for task in self.tasks}
+            for future in as_completed(futures):
+                task = futures[future]
+                try:
+                    key, results = future.result()
+                    self.cache.put(key, results)
+                    self.status.completed += 1
+                    if task.essential:
+                        self.status.essential_completed += 1
+                except Exception as e:
+                    self.status.failed.append(f"{task.track}/{task.weather.value}/{task.num_simulations}: {e}")
+                    if task.essential:
+                        # A failed essential forecast will be computed on demand instead
+                        self.status.essential_completed += 1
+                if self.status.ready:
+                    self._ready.set()
+        self.status.finished = time.time()
+        self._ready.set()
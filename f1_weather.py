@@ -0,0 +1,133 @@
+import numpy as np
+from dataclasses import dataclass
+from typing import Dict, Optional, Union
+
+from f1_realistic_simulation import Track, TireCompound, WeatherCondition, RACE_LAPS
+
+# Conditions are stored as int8 indices into this list
+WEATHER_CONDITIONS = list(WeatherCondition)
+
+# Tire class of each compound: 0 slicks < 1 intermediates < 2 wets
+TIRE_CLASSES = {
+    TireCompound.SOFT: 0,
+    TireCompound.MEDIUM: 0,
+    TireCompound.HARD: 0,
+    TireCompound.INTERMEDIATE: 1,
+    TireCompound.WET: 2,
+}
+
+# Tire class each condition calls for
+REQUIRED_TIRES = {
+    WeatherCondition.DRY: 0,
+    WeatherCondition.DRIZZLE: 1,
+    WeatherCondition.LIGHT_RAIN: 1,
+    WeatherCondition.HEAVY_RAIN: 2,
+}
+
+# Per-lap DNF chance multiplier in each condition
+DNF_MULTIPLIER = {
+    WeatherCondition.DRY: 1.0,
+    WeatherCondition.DRIZZLE: 1.2,
+    WeatherCondition.LIGHT_RAIN: 1.5,
+    WeatherCondition.HEAVY_RAIN: 2.5,
+}
+
+WEATHER_SEGMENT_LAPS = 10  # Race weather is sampled per block of laps
+SEGMENT_CHANGE_RATE = 0.5  # Chance per segment, at weather_sensitivity 1, that conditions are redrawn
+FORECAST_UNCERTAINTY = 0.3  # Share of the default forecast, at weather_sensitivity 1, spread over other conditions
+WEATHER_PIT_CHANCE = 0.5  # Per-lap chance a driver on the wrong tires pits to change them
+WRONG_TIRE_PENALTY = 0.15  # Overtake probability swing per tire class away from what the track needs
+
+@dataclass
+class WeatherForecast:
+    """Probability of each weather condition over the race weekend"""
+    probabilities: Dict[WeatherCondition, float]
+
+    def __post_init__(self):
+        if any(p < 0 for p in self.probabilities.values()) or sum(self.probabilities.values()) <= 0:
+            raise ValueError("Forecast probabilities must be non-negative and not all zero")
+        total = sum(self.probabilities.values())
+        self.probabilities = {condition: self.probabilities.get(condition, 0.0) / total
+                              for condition in WEATHER_CONDITIONS}
+
+    @classmethod
+    def parse(cls, forecast: Union["WeatherForecast", Dict]) -> "WeatherForecast":
+        """Accept a forecast or a dict such as {"dry": 0.7, "light_rain": 0.3}"""
+        if isinstance(forecast, WeatherForecast):
+            return forecast
+        return cls({WeatherCondition(key) if isinstance(key, str) else key: float(value)
+                    for key, value in forecast.items()})
+
+    def weights(self) -> np.ndarray:
+        """Probabilities in WEATHER_CONDITIONS order"""
+        return np.array([self.probabilities[condition] for condition in WEATHER_CONDITIONS])
+
+    def to_dict(self) -> Dict[str, float]:
+        return {condition.value: p for condition, p in self.probabilities.items()}
+
+def default_forecast(track: Track) -> WeatherForecast:
+    """The track's recorded weather, less certain the more weather-sensitive the track is"""
+    spread = FORECAST_UNCERTAINTY * track.weather_sensitivity
+    others = len(WEATHER_CONDITIONS) - 1
+    return WeatherForecast({condition: 1 - spread if condition == track.weather else spread / others
+                            for condition in WEATHER_CONDITIONS})
+
+@dataclass
+class WeatherScenarios:
+    """Sampled weather for an ensemble, as indices into WEATHER_CONDITIONS"""
+    qualifying: np.ndarray  # (sims,)
+    race: np.ndarray  # (sims, laps)
+
+    def take(self, sims) -> "WeatherScenarios":
+        return WeatherScenarios(self.qualifying[sims], self.race[sims])
+
+def sample_weather(forecast: WeatherForecast, sensitivity: float, num_simulations: int, rng,
+                   laps: int = RACE_LAPS, segment_laps: int = WEATHER_SEGMENT_LAPS) -> WeatherScenarios:
+    """Sample qualifying and per-segment race weather for every simulation at once
+
+    Qualifying weather is drawn from the forecast. Each race segment keeps the
+    previous segment's weather unless, with probability sensitivity *
+    SEGMENT_CHANGE_RATE, it is redrawn from the forecast. The forecast is the
+    stationary distribution of that chain, so every segment's weather follows
+    the forecast while changes within a race stay correlated.
+    """
+    weights = forecast.weights()
+    change = min(1.0, sensitivity * SEGMENT_CHANGE_RATE)
+    segments = -(-laps // segment_laps)
+
+    qualifying = rng.choice(len(weights), size=num_simulations, p=weights).astype(np.int8)
+    current = qualifying
+    by_segment = np.empty((num_simulations, segments), dtype=np.int8)
+    for segment in range(segments):
+        redraw = rng.choice(len(weights), size=num_simulations, p=weights).astype(np.int8)
+        current = np.where(rng.random(num_simulations) < change, redraw, current)
+        by_segment[:, segment] = current
+
+    race = np.repeat(by_segment, segment_laps, axis=1)[:, :laps]
+    return WeatherScenarios(qualifying, race)
+
+def continue_weather(current: WeatherCondition, laps_done: int, num_simulations: int, rng,
+                     forecast: Optional[WeatherForecast] = None, sensitivity: float = 0.0,
+                     laps: int = RACE_LAPS, segment_laps: int = WEATHER_SEGMENT_LAPS) -> WeatherScenarios:
+    """Race weather for the rest of a race underway, starting from the current condition
+
+    Without a forecast the current condition holds to the flag. With one,
+    every segment still to start (from lap laps_done on) may be redrawn as
+    in sample_weather. Laps already run hold the current condition too; the
+    race kernel does not look at them.
+    """
+    race = np.full((num_simulations, laps), WEATHER_CONDITIONS.index(current), dtype=np.int8)
+    if forecast is not None:
+        weights = forecast.weights()
+        change = min(1.0, sensitivity * SEGMENT_CHANGE_RATE)
+        for start in range(segment_laps, laps, segment_laps):
+            if start < laps_done:
+                continue
+            redraw = rng.choice(len(weights), size=num_simulations, p=weights).astype(np.int8)
+            race[:, start:] = np.where((rng.random(num_simulations) < change)[:, None], redraw[:, None],
+                                       race[:, start:])
+    return WeatherScenarios(race[:, 0].copy(), race)
+
+def condition_table(values: Dict[WeatherCondition, float], dtype=float) -> np.ndarray:
+    """Lookup array indexed by condition index"""
+    return np.array([values[condition] for condition in WEATHER_CONDITIONS], dtype=dtype)
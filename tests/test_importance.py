@@ -0,0 +1,10 @@
+from f1_realistic_simulation import F1RealisticSimulation
+
+def test_dry_long_shot_outside_the_top_three_is_resolved():
+    model = F1RealisticSimulation()
+    results = model.run_monte_carlo_simulation("Monaco", 4000, backend="numpy", seed=3,
+                                               importance_target="Lance Stroll")
+    points = results["importance_sampling"]["points"]
+    # Fourteenth on the dry grid: points need four cars ahead to retire or be passed
+    assert points["probability"] > 0
+    assert points["standard_error"] < 0.25 * points["probability"]
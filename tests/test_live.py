@@ -0,0 +1,27 @@
+import numpy as np
+
+from f1_live import LiveSimulator, RaceState
+from f1_realistic_simulation import F1RealisticSimulation
+
+def test_retired_driver_never_passes_a_running_car():
+    model = F1RealisticSimulation()
+    live = LiveSimulator(model, "Austria")
+    order = list(live.index)
+    state = RaceState(lap=5, order=order, retired=["Max Verstappen"])
+    grid, retired = np.array([live._driver_order(state)] * 2000), np.zeros(len(order), dtype=bool)
+    retired[live.index["Max Verstappen"]] = True
+
+    finish, dnf = model.simulate_race_vectorized(
+        "Austria", grid, np.random.default_rng(1), live.tables, start_lap=state.lap, retired=retired,
+        hold_retired=True)
+
+    verstappen = live.index["Max Verstappen"]
+    position = np.argmax(finish == verstappen, axis=1)
+    # Everyone who is still running finishes ahead of him
+    running_behind = (~dnf) & (np.argsort(finish, axis=1) > position[:, None])
+    assert not running_behind.any()
+    assert dnf[:, verstappen].all()
+
+    results = live.update(state, num_simulations=2000, seed=1)
+    assert results["points_probabilities"]["Max Verstappen"] == 0.0
+    assert results["win_probabilities"]["Max Verstappen"] == 0.0
@@ -0,0 +1,12 @@
+from f1_qmc import qmc_report
+from f1_realistic_simulation import F1RealisticSimulation
+
+def test_dry_qmc_run_falls_back_to_plain_sampling():
+    model = F1RealisticSimulation()
+    quasi = model.run_ensemble("Spain", 1024, "numpy", 4, qmc=True)
+    plain = model.run_ensemble("Spain", 1024, "numpy", 4)
+
+    assert (quasi.finish == plain.finish).all()
+    assert qmc_report(quasi)["sampling"] == "plain"
+    wet = model.run_ensemble("Spain", 1024, "numpy", 4, qmc=True, weather_forecast={"light_rain": 1.0})
+    assert qmc_report(wet)["sampling"] == "sobol"
@@ -0,0 +1,16 @@
+from f1_realistic_simulation import F1RealisticSimulation
+from f1_scenarios import Scenario, run_scenarios
+
+def test_dry_run_flags_qualifying_only_overrides():
+    model = F1RealisticSimulation()
+    scenarios = [Scenario.parse({"name": "form", "drivers": {"Lando Norris": {"current_form": 1.2}}}),
+                 Scenario.parse({"name": "craft", "drivers": {"Lando Norris": {"race_craft": 98}}})]
+    form, craft = run_scenarios(model, "Spain", scenarios, 1000, seed=1)["scenarios"]
+
+    assert not any(form["deltas"]["podium_probabilities"].values())
+    assert form["warnings"] and "Lando Norris.current_form" in form["warnings"][0]
+    assert any(craft["deltas"]["podium_probabilities"].values())
+    assert craft["warnings"] == []
+
+    form, _ = run_scenarios(model, "Spain", scenarios, 1000, seed=1, weather_forecast=True)["scenarios"]
+    assert form["warnings"] == []
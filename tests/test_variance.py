@@ -0,0 +1,21 @@
+import numpy as np
+
+from f1_engines import get_backend
+from f1_realistic_simulation import F1RealisticSimulation
+from f1_variance import apply_variance_reduction
+
+def test_reported_standard_errors_match_the_spread_across_seeds():
+    model = F1RealisticSimulation()
+    forecast = {"dry": 0.5, "heavy_rain": 0.5}  # A random grid, so the control variate has work to do
+    estimates, variances = [], []
+    for seed in range(40):
+        ensemble = model.run_ensemble("Monaco", 400, get_backend("numpy"), seed, weather_forecast=forecast)
+        results = model.summarise_ensemble("Monaco", ensemble, "numpy", seed)
+        apply_variance_reduction(model, "Monaco", ensemble, results, ("control_variate",), seed,
+                                 weather_forecast=forecast)
+        estimates.append(list(results["podium_probabilities"].values()))
+        errors = results["variance_reduction"]["standard_errors"]["podium_probabilities"]
+        variances.append(np.square(list(errors.values())))
+
+    ratio = np.var(estimates, axis=0, ddof=1).sum() / np.mean(variances, axis=0).sum()
+    assert 0.8 < ratio < 1.25